@@ -0,0 +1,95 @@
+import argparse
+import random
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from matrix import WeekMatrix
+from utils import format_date_for_db
+
+
+def group_with_dicts(all_orders, dates, names):
+    """Прежний путь отчёта: вложенные defaultdict, итоги при обходе"""
+    date_index = {format_date_for_db(d): i for i, d in enumerate(dates)}
+    employees = defaultdict(lambda: defaultdict(lambda: [0] * 7))
+    for user_id, instructor_name, date, quantity in all_orders:
+        days = employees[names[user_id]][instructor_name]
+        if date in date_index:
+            days[date_index[date]] = quantity
+    
+    rows = []
+    day_totals = [0] * 7
+    for employee, instructors in sorted(employees.items()):
+        for instructor, days in sorted(instructors.items()):
+            rows.append((employee, instructor, sum(days)))
+            for i, qty in enumerate(days):
+                day_totals[i] += qty
+    return rows, day_totals
+
+
+def group_with_matrix(all_orders, dates, names):
+    """WeekMatrix: обход строк для отчёта + итоги по дням"""
+    matrix = WeekMatrix.from_orders(all_orders, dates)
+    row_totals = matrix.row_totals()
+    rows = [
+        (employee, instructor, row_totals[index])
+        for employee, instructors in matrix.grouped(names.get)
+        for instructor, index in instructors
+    ]
+    return rows, matrix.day_totals()
+
+
+def make_orders(count, employees, instructors, dates):
+    """Уникальные ячейки (сотрудник, инструктор, день), как в БД после save_order.
+       Возвращает (строки get_orders_between, {user_id: ФИО})"""
+    rng = random.Random(42)
+    date_keys = [format_date_for_db(d) for d in dates]
+    names = {e: f"Сотрудник {e}" for e in range(employees)}
+    cells = set()
+    while len(cells) < count:
+        cells.add((rng.randrange(employees), rng.randrange(instructors), rng.randrange(7)))
+    orders = [
+        (e, f"Инструктор {i}", date_keys[d], rng.choice((1, 2)))
+        for e, i, d in cells
+    ]
+    return orders, names
+
+
+def measure(fn, orders, dates, names, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(orders, dates, names)
+        best = min(best, time.perf_counter() - started)
+    tracemalloc.start()
+    result = fn(orders, dates, names)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WeekMatrix против группировки словарями")
+    parser.add_argument("--orders", type=int, default=100_000, help="заказов (100000)")
+    parser.add_argument("--employees", type=int, default=500, help="сотрудников (500)")
+    parser.add_argument("--instructors", type=int, default=60, help="инструкторов (60)")
+    parser.add_argument("--repeat", type=int, default=5, help="повторов, берётся лучший (5)")
+    args = parser.parse_args()
+
+    monday = datetime(2026, 10, 12)
+    dates = [monday + timedelta(days=i) for i in range(7)]
+    orders, names = make_orders(args.orders, args.employees, args.instructors, dates)
+
+    print(f"📦 Заказов: {len(orders)}, сотрудников: {args.employees}, инструкторов: {args.instructors}")
+    results = {}
+    for name, fn in (("dict", group_with_dicts), ("WeekMatrix", group_with_matrix)):
+        seconds, peak, results[name] = measure(fn, orders, dates, names, args.repeat)
+        print(f"   {name:<11} {seconds * 1000:8.1f} мс   пик памяти {peak / 1024 / 1024:6.1f} МиБ")
+
+    same = results["dict"] == results["WeekMatrix"]
+    print("✅ Результаты совпадают" if same else "❌ Результаты различаются")
+
+
+if __name__ == "__main__":
+    main()
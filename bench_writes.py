@@ -0,0 +1,132 @@
+import argparse
+import multiprocessing
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from database import Database
+from utils import format_date_for_db
+
+
+def fill_orders(db_file, count, employees, weeks):
+    """Тестовая БД: count заказов за weeks недель"""
+    rng = random.Random(42)
+    start = datetime(2026, 1, 5)
+    dates = [format_date_for_db(start + timedelta(days=i)) for i in range(weeks * 7)]
+    with sqlite3.connect(db_file) as conn:
+        conn.executemany(
+            'INSERT INTO orders (user_id, instructor_name, date, quantity) VALUES (?, ?, ?, ?)',
+            [(rng.randrange(employees), f"Инструктор {rng.randrange(60)}", rng.choice(dates), rng.choice((1, 2)))
+             for _ in range(count)]
+        )
+        conn.executemany(
+            'INSERT INTO employees (user_id, username, full_name) VALUES (?, ?, ?)',
+            [(i, f"user{i}", f"Сотрудник {i}") for i in range(employees)]
+        )
+        conn.commit()
+    return dates[0], dates[-1]
+
+
+def export_loop(db_file, start_date, end_date, snapshot, stop, reads, locked):
+    """Процесс выгрузки: полные выборки за весь период, пока не попросят остановиться.
+       snapshot=True - как create_range_report: сначала копия БД через backup API"""
+    db = Database(db_file)
+    while not stop.is_set():
+        try:
+            if snapshot:
+                fd, copy_file = tempfile.mkstemp(suffix=".db")
+                os.close(fd)
+                try:
+                    db.backup_to(copy_file)
+                    Database(copy_file).get_orders_between(start_date, end_date)
+                finally:
+                    os.remove(copy_file)
+            else:
+                db.get_orders_between(start_date, end_date)
+        except sqlite3.OperationalError:
+            # database is locked: выгрузка не дождалась записи (busy timeout)
+            with locked.get_lock():
+                locked.value += 1
+            continue
+        with reads.get_lock():
+            reads.value += 1
+
+
+def measure_writes(db_file, writes, interval, employees, date_keys):
+    """Задержки записи заказа на неделю (как confirm_order), мс"""
+    rng = random.Random(7)
+    db = Database(db_file)
+    latencies = []
+    for _ in range(writes):
+        user_id = rng.randrange(employees)
+        started = time.perf_counter()
+        db.save_week_orders(user_id, date_keys, {"Инструктор 0": [rng.choice((0, 1, 2)) for _ in date_keys]})
+        latencies.append((time.perf_counter() - started) * 1000)
+        time.sleep(interval)
+    return latencies
+
+
+def run_mode(mode, args, workdir):
+    db_file = os.path.join(workdir, f"bench_{mode}.db")
+    db = Database(db_file)
+    db.init_db()
+    if mode == "delete":
+        # Прежний режим журнала: чтение блокирует COMMIT записи
+        with sqlite3.connect(db_file) as conn:
+            conn.execute('PRAGMA journal_mode = DELETE')
+    start_date, end_date = fill_orders(db_file, args.orders, args.employees, args.weeks)
+    date_keys = [format_date_for_db(datetime.strptime(end_date, "%Y%m%d") - timedelta(days=i)) for i in range(7)][::-1]
+
+    stop = multiprocessing.Event()
+    reads = multiprocessing.Value('i', 0)
+    locked = multiprocessing.Value('i', 0)
+    exporters = [
+        multiprocessing.Process(
+            target=export_loop, args=(db_file, start_date, end_date, mode == "wal+backup", stop, reads, locked)
+        )
+        for _ in range(args.exporters)
+    ]
+    for process in exporters:
+        process.start()
+    time.sleep(0.5)  # выгрузки успели начаться
+
+    try:
+        latencies = measure_writes(db_file, args.writes, args.interval, args.employees, date_keys)
+    finally:
+        stop.set()
+        for process in exporters:
+            process.join()
+
+    latencies.sort()
+    quantile = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+    print(
+        f"   {mode:<11} p50 {statistics.median(latencies):7.1f}  p95 {quantile(0.95):7.1f}  "
+        f"p99 {quantile(0.99):7.1f}  макс {latencies[-1]:7.1f} мс   "
+        f"выгрузок: {reads.value} (не дождались блокировки: {locked.value})"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Задержка записи заказов во время выгрузок")
+    parser.add_argument("--orders", type=int, default=300_000, help="заказов в БД (300000)")
+    parser.add_argument("--employees", type=int, default=500, help="сотрудников (500)")
+    parser.add_argument("--weeks", type=int, default=26, help="недель истории (26)")
+    parser.add_argument("--exporters", type=int, default=2, help="параллельных выгрузок (2)")
+    parser.add_argument("--writes", type=int, default=200, help="записей заказа (200)")
+    parser.add_argument("--interval", type=float, default=0.01, help="пауза между записями, с (0.01)")
+    parser.add_argument("--modes", default="delete,wal,wal+backup",
+                        help="режимы: delete (старый журнал), wal, wal+backup")
+    args = parser.parse_args()
+
+    print(f"📦 Заказов: {args.orders}, выгрузок параллельно: {args.exporters}, записей: {args.writes}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for mode in args.modes.split(","):
+            run_mode(mode.strip(), args, workdir)
+
+
+if __name__ == "__main__":
+    main()
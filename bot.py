@@ -1,63 +1,221 @@
 import os
 import asyncio
 import logging
+import multiprocessing
+import time
 from dotenv import load_dotenv
 from aiogram import Bot, Dispatcher, F
-from aiogram.filters import Command
+from aiogram.filters import Command, StateFilter
 from aiogram.fsm.storage.memory import MemoryStorage
 
 # Загружаем переменные окружения
 load_dotenv()
 
 TOKEN = os.getenv("BOT_TOKEN")
-ADMIN_ID = int(os.getenv("ADMIN_ID", "0"))
+
+# Логирование через очередь - до импорта модулей бота
+from logs import setup_logging
+setup_logging()
 
 # Импорты из ваших файлов
-from handlers import *
-from database import Database
-from states import TextOrderState
-from scheduler import NotificationScheduler  # 👈 Новый импорт
+from handlers import (
+    db, subscribers, order_cache, directory, tenant_routing, throttling, ProfiledExecutor,
+    cmd_start, start_order, process_instructor, process_quantity, start_inline_order,
+    process_quantity_button, confirm_order, show_my_orders, repeat_last_week, confirm_repeat_week,
+    subscribe_notifications, unsubscribe_notifications,
+    quick_order_help, quick_order, confirm_quick_order, is_quick_order,
+    export_to_excel, show_excel_history, send_archived_excel, export_range_report,
+    show_stats, show_forecast, profile_bot, import_orders_file
+)
+from states import TextOrderState, InlineOrderState, QuickOrderState
+from utils import DEADLINE_DAY_NAMES
+from scheduler import NotificationScheduler, REMINDER_TIMES  # 👈 Новый импорт
+from snapshot import StateSnapshot
+from config import (
+    DB_FILE, WORKERS, LEASE_TTL, SNAPSHOT_FILE, SNAPSHOT_INTERVAL,
+    WEBHOOK_URL, WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_PATH, TELEGRAM_API_URL
+)
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-async def main():
-    # Создаем папки
-    os.makedirs("data", exist_ok=True)
-    
-    # Инициализация бота
-    bot = Bot(token=TOKEN)
-    storage = MemoryStorage()
-    dp = Dispatcher(storage=storage)
+def register_handlers(dp: Dispatcher):
+    """Регистрация обработчиков"""
+    # Компания пользователя (до фильтров: от неё зависят права и данные)
+    dp.message.outer_middleware(tenant_routing)
+    dp.callback_query.outer_middleware(tenant_routing)
     
-    # Создаем планировщик
-    scheduler = NotificationScheduler(bot)
+    # Ограничение частоты запросов на пользователя
+    dp.message.middleware(throttling)
+    dp.callback_query.middleware(throttling)
     
-    # Регистрация обработчиков
     dp.message.register(cmd_start, Command("start"))
     dp.message.register(start_order, F.text == "📝 Новый заказ")
     dp.message.register(process_instructor, TextOrderState.waiting_instructor)
     dp.message.register(process_quantity, TextOrderState.waiting_quantity)
+    dp.message.register(start_inline_order, F.text == "🔘 Заказ кнопками")
+    dp.callback_query.register(process_quantity_button, InlineOrderState.choosing_quantity, F.data.startswith("qty:"))
     dp.callback_query.register(confirm_order, F.data.in_(["confirm_yes", "confirm_no", "cancel"]))
     dp.message.register(show_my_orders, F.text == "📋 Мои заказы")
+    dp.message.register(repeat_last_week, F.text == "🔁 Повторить прошлую неделю")
+    dp.callback_query.register(confirm_repeat_week, F.data.startswith("repeat_yes:"))
     
     # Команды для подписки/отписки (можно добавить позже)
     dp.message.register(subscribe_notifications, F.text == "🔔 Подписаться на уведомления")
     dp.message.register(unsubscribe_notifications, F.text == "🔕 Отписаться")
     
-    if ADMIN_ID:
-        dp.message.register(export_to_excel, F.text == "📊 Выгрузить Excel")
-        dp.message.register(show_excel_history, F.text == "📚 Архив Excel")
+    # Быстрый заказ одним сообщением
+    dp.message.register(quick_order_help, Command("quick"))
+    dp.message.register(quick_order, QuickOrderState.waiting_order, F.text.contains(":"))
+    dp.message.register(quick_order, StateFilter(None), F.text, is_quick_order)
+    dp.callback_query.register(confirm_quick_order, QuickOrderState.waiting_confirm, F.data == "quick_yes")
     
-    print(f"🚀 Бот запущен на aiogram 3.x!")
-    print(f"👑 Админ ID: {ADMIN_ID}")
-    print(f"⏰ Планировщик уведомлений: пятница 08:00 МСК")
+    # Админка: права проверяются в обработчиках (администраторы у каждой компании свои)
+    dp.message.register(export_to_excel, F.text == "📊 Выгрузить Excel")
+    dp.message.register(show_excel_history, F.text == "📚 Архив Excel")
+    dp.callback_query.register(send_archived_excel, F.data.startswith("excel_file:"))
+    dp.message.register(export_range_report, Command("report"))
+    dp.message.register(show_stats, Command("stats"))
+    dp.message.register(show_forecast, Command("forecast"))
+    dp.message.register(profile_bot, Command("profile"))
+    dp.message.register(import_orders_file, F.document)
+
+def create_bot():
+    """Bot с учётом своего адреса Bot API (TELEGRAM_API_URL)"""
+    if TELEGRAM_API_URL:
+        from aiogram.client.session.aiohttp import AiohttpSession
+        from aiogram.client.telegram import TelegramAPIServer
+        
+        session = AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_URL))
+        return Bot(token=TOKEN, session=session)
+    return Bot(token=TOKEN)
+
+def startup():
+    """Явная фаза старта: таблицы БД и загрузка данных в память.
+       Шарды остальных компаний открываются при первом обращении"""
+    directory.open()
+
+def print_banner(mode):
+    print(f"🚀 Бот запущен на aiogram 3.x! ({mode})")
+    for tenant in directory.tenants.values():
+        day, hour, minute = tenant.deadline
+        print(f"🏢 {tenant.name}: админы {sorted(tenant.admin_ids)}, "
+              f"дедлайн {DEADLINE_DAY_NAMES[day]} {hour:02d}:{minute:02d}, БД {tenant.db_file}")
+    waves = ", ".join(f"{hour:02d}:{minute:02d}" for hour, minute in REMINDER_TIMES)
+    print(f"⏰ Напоминания: {waves} МСК в день дедлайна (тем, кто не заказал)")
+
+async def main():
+    # Создаем папки
+    os.makedirs("data", exist_ok=True)
     
-    # Запускаем планировщик в фоне
+    # Инициализация бота
+    bot = create_bot()
+    storage = MemoryStorage()
+    dp = Dispatcher(storage=storage)
+    
+    # Снимок состояния прошлого запуска (тёплый старт), затем
+    # БД, реестр сотрудников и подписчики в память
+    snapshot = StateSnapshot(SNAPSHOT_FILE, directory, SNAPSHOT_INTERVAL) if SNAPSHOT_FILE else None
+    if snapshot:
+        snapshot.restore()
+    startup()
+    asyncio.get_running_loop().set_default_executor(ProfiledExecutor())
+    
+    # Создаем планировщик
+    scheduler = NotificationScheduler(bot, order_cache, subscribers)
+    
+    register_handlers(dp)
+    print_banner("polling")
+    
+    # Запускаем планировщик и запись снимка в фоне
     asyncio.create_task(scheduler.scheduler_loop())
+    if snapshot:
+        asyncio.create_task(snapshot.run())
     
     # Запуск polling
-    await dp.start_polling(bot)
+    try:
+        await dp.start_polling(bot)
+    finally:
+        if snapshot:
+            snapshot.stop()
+
+# ==================== НЕСКОЛЬКО ПРОЦЕССОВ (WEBHOOK) ====================
+
+def run_worker(index):
+    """Процесс-воркер: принимает webhook на общем порту (SO_REUSEPORT).
+       FSM-состояние и данные общие через SQLite, плановые задачи
+       выполняет только процесс, держащий аренду лидера."""
+    from aiohttp import web
+    from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+    from leader import LeaderLease
+    from storage import SQLiteStorage
+    
+    setup_logging()  # свой поток вывода логов в каждом процессе
+    bot = create_bot()
+    dp = Dispatcher(storage=SQLiteStorage(DB_FILE))
+    register_handlers(dp)
+    
+    lease = LeaderLease(db, ttl=LEASE_TTL)
+    scheduler = NotificationScheduler(bot, order_cache, subscribers, lease)
+    background = []
+    
+    async def on_startup():
+        startup()
+        asyncio.get_running_loop().set_default_executor(ProfiledExecutor())
+        lease.renew()
+        background.append(asyncio.create_task(lease.run()))
+        background.append(asyncio.create_task(scheduler.scheduler_loop()))
+        logger.info(f"🧩 Воркер {index} (pid {os.getpid()}) запущен")
+    
+    async def on_shutdown():
+        scheduler.stop()
+        lease.stop()
+        for task in background:
+            task.cancel()
+    
+    dp.startup.register(on_startup)
+    dp.shutdown.register(on_shutdown)
+    
+    app = web.Application()
+    SimpleRequestHandler(dispatcher=dp, bot=bot).register(app, path=WEBHOOK_PATH)
+    setup_application(app, dp, bot=bot)
+    web.run_app(app, host=WEBHOOK_HOST, port=WEBHOOK_PORT, reuse_port=True, print=None)
+
+async def set_webhook():
+    bot = create_bot()
+    try:
+        await bot.set_webhook(WEBHOOK_URL)
+    finally:
+        await bot.session.close()
+
+def run_workers(count):
+    """Запускает count воркеров и перезапускает упавшие"""
+    os.makedirs("data", exist_ok=True)
+    asyncio.run(set_webhook())
+    print_banner(f"webhook, воркеров: {count}")
+    
+    def spawn(index):
+        process = multiprocessing.Process(target=run_worker, args=(index,), name=f"bot-worker-{index}")
+        process.start()
+        return process
+    
+    processes = [spawn(i) for i in range(count)]
+    try:
+        while True:
+            time.sleep(5)
+            for i, process in enumerate(processes):
+                if not process.is_alive():
+                    logger.warning(f"⚠️ Воркер {i} завершился (код {process.exitcode}), перезапуск")
+                    processes[i] = spawn(i)
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    if WEBHOOK_URL:
+        run_workers(WORKERS)
+    elif WORKERS > 1:
+        raise SystemExit("WORKERS > 1 требует WEBHOOK_URL (режим webhook)")
+    else:
+        asyncio.run(main())
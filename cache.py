@@ -1,16 +1,16 @@
+from collections import OrderedDict
 from functools import lru_cache
 from datetime import datetime, timedelta
-import pickle
-import os
 from config import WEEKDAYS
 
 class Cache:
     """Централизованное кэширование для ускорения работы"""
     
-    def __init__(self, cache_file=".cache"):
-        self.cache_file = cache_file
-        self._cache = {}
-        self.load()
+    def __init__(self, max_weeks=8):
+        self.max_weeks = max_weeks
+        # Контексты недель для FSM заказа: tuple(date_keys) -> [{...} по дням].
+        # Только строки - переживают перезапуск в снимке (см. snapshot.py)
+        self._weeks = OrderedDict()
     
     @lru_cache(maxsize=32)
     def get_week_dates(self, week_offset=0):
@@ -69,6 +69,30 @@ class Cache:
             })
         return week_data
     
+    def week_context(self, date_keys):
+        """Форматы дат недели для FSM заказа (ключ, день, дата...).
+           Возвращает копию: данные уходят в состояние пользователя"""
+        key = tuple(date_keys)
+        week = self._weeks.get(key)
+        if week is None:
+            week = []
+            for i, date_key in enumerate(date_keys):
+                date_obj = self.parse_date(date_key)
+                week.append({
+                    'key': date_key,
+                    'day_name': WEEKDAYS[i],
+                    'display': date_obj.strftime("%d.%m.%Y"),
+                    'short': date_obj.strftime("%d.%m"),
+                    'full_date': date_obj.strftime("%d %B %Y"),
+                    'weekday_full': date_obj.strftime("%A")
+                })
+            self._weeks[key] = week
+            if len(self._weeks) > self.max_weeks:
+                self._weeks.popitem(last=False)
+        else:
+            self._weeks.move_to_end(key)
+        return [dict(day) for day in week]
+    
     def clear_cache(self):
         """Очистка кэша"""
         self.get_week_dates.cache_clear()
@@ -77,19 +101,18 @@ class Cache:
         self.format_date_short.cache_clear()
         self.get_day_name.cache_clear()
         self.get_day_short.cache_clear()
+        self._weeks.clear()
     
-    def save(self):
-        """Сохранить кэш на диск"""
-        with open(self.cache_file, 'wb') as f:
-            pickle.dump(self._cache, f)
+    def dump(self):
+        """Контексты недель для снимка состояния"""
+        # list() копирует словарь разом: снимок пишется из потока
+        return [{'keys': list(key), 'days': week} for key, week in list(self._weeks.items())]
     
-    def load(self):
-        """Загрузить кэш с диска"""
-        if os.path.exists(self.cache_file):
-            try:
-                with open(self.cache_file, 'rb') as f:
-                    self._cache = pickle.load(f)
-            except:
-                pass
+    def restore(self, weeks):
+        """Контексты недель из снимка состояния"""
+        for item in weeks[-self.max_weeks:]:
+            self._weeks[tuple(item['keys'])] = item['days']
+        while len(self._weeks) > self.max_weeks:
+            self._weeks.popitem(last=False)
 
-cache = Cache()
\ No newline at end of file
+cache = Cache()
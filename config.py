@@ -3,6 +3,9 @@ import os
 # Токен берем из переменных окружения (секретов)
 TOKEN = os.getenv("BOT_TOKEN", "ваш_токен_здесь")
 
+# Свой адрес Bot API (локальный сервер, нагрузочные тесты). Пусто - api.telegram.org
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "")
+
 # ID администратора - ОБЯЗАТЕЛЬНО ДОБАВЬТЕ ЭТУ СТРОКУ!
 ADMIN_ID = int(os.getenv("ADMIN_ID", "5046675535"))
 
@@ -10,10 +13,61 @@ ADMIN_ID = int(os.getenv("ADMIN_ID", "5046675535"))
 COMPANY_NAME = "Игора"
 EXPORT_PATH = "exports"
 
+# База данных
+DB_FILE = os.getenv("DB_FILE", "orders.db")
+
+# Хранение истории: недели старше горизонта переносятся в архивную БД.
+# Пустой ARCHIVE_DB_FILE - рядом с основной (orders.db -> orders_archive.db)
+RETENTION_WEEKS = int(os.getenv("RETENTION_WEEKS", "26"))
+ARCHIVE_DB_FILE = os.getenv("ARCHIVE_DB_FILE", "")
+
+# Итоги по неделям/месяцам: ночью пересчитываются последние ROLLUP_REFRESH_WEEKS
+# недель; прогноз /forecast - среднее по дням недели за FORECAST_WEEKS недель
+ROLLUP_REFRESH_WEEKS = int(os.getenv("ROLLUP_REFRESH_WEEKS", "8"))
+FORECAST_WEEKS = int(os.getenv("FORECAST_WEEKS", "4"))
+
+# Несколько компаний: JSON со списком компаний (см. tenants.py). Пусто - одна
+# компания из настроек выше
+TENANTS_FILE = os.getenv("TENANTS_FILE", "")
+TENANT_DIRECTORY_DB = os.getenv("TENANT_DIRECTORY_DB", "data/tenants.db")
+TENANT_SHARDS_OPEN = int(os.getenv("TENANT_SHARDS_OPEN", "16"))
+
+# Снимок состояния в памяти для тёплого старта (snapshot.py): пишется при
+# остановке и раз в SNAPSHOT_INTERVAL секунд (только при WORKERS=1). Пусто - не использовать
+SNAPSHOT_FILE = os.getenv("SNAPSHOT_FILE", "data/snapshot.json")
+SNAPSHOT_INTERVAL = int(os.getenv("SNAPSHOT_INTERVAL", "300"))
+
+# Процессы бота. С WEBHOOK_URL - webhook и WORKERS воркеров на общем порту,
+# без него - обычный polling (только WORKERS=1)
+WORKERS = int(os.getenv("WORKERS", "1"))
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")  # например https://bot.example.com/webhook
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+LEASE_TTL = int(os.getenv("LEASE_TTL", "30"))
+
+# Логирование (logs.py): уровень, уровни модулей "handlers=DEBUG,aiogram=WARNING",
+# формат json/text и выборка частых DEBUG-событий (каждое N-е, "событие=N,...")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_SAMPLE_EVERY = int(os.getenv("LOG_SAMPLE_EVERY", "10"))
+LOG_SAMPLE = os.getenv("LOG_SAMPLE", "")
+
 # Дни недели
 WEEKDAYS = ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"]
 
 # Дедлайн
 DEADLINE_DAY = 4  # Пятница
 DEADLINE_HOUR = 16
-DEADLINE_MINUTE = 0
\ No newline at end of file
+DEADLINE_MINUTE = 0
+
+# Напоминания в день дедлайна (МСК) - только тем подписчикам, кто ещё не
+# заказал на целевую неделю. Несколько волн: "08:00,12:00,15:00"
+REMINDER_WAVES = os.getenv("REMINDER_WAVES", "08:00")
+
+# Ограничение частоты запросов (токенов в секунду / размер ведра)
+THROTTLE_RATE = float(os.getenv("THROTTLE_RATE", "1.0"))
+THROTTLE_BURST = int(os.getenv("THROTTLE_BURST", "5"))
+THROTTLE_EXPENSIVE_RATE = float(os.getenv("THROTTLE_EXPENSIVE_RATE", "0.2"))
+THROTTLE_EXPENSIVE_BURST = int(os.getenv("THROTTLE_EXPENSIVE_BURST", "2"))
@@ -1,54 +1,50 @@
+import logging
 import sqlite3
 import os
-from datetime import datetime
+import time
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+# Заказы основной БД вместе с архивом. Пачка переносится двумя фиксациями
+# (в WAL транзакция через ATTACH не атомарна между файлами), и после сбоя
+# между ними строка лежит в обоих файлах - берём её из основной БД
+ORDERS_WITH_ARCHIVE = '''(
+    SELECT * FROM main.orders
+    UNION ALL
+    SELECT * FROM archive.orders a
+    WHERE NOT EXISTS (SELECT 1 FROM main.orders m WHERE m.id = a.id)
+)'''
 
 class Database:
-    def __init__(self, db_file="orders.db"):
+    def __init__(self, db_file="orders.db", init=False, archive_file=None):
         self.db_file = db_file
-        self.init_db()
-    
-    def init_db(self):
-        """Создаём таблицы, если их нет"""
-        with sqlite3.connect(self.db_file) as conn:
-            cursor = conn.cursor()
-            
-            # Таблица сотрудников
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS employees (
-                    user_id INTEGER PRIMARY KEY,
-                    username TEXT,
-                    full_name TEXT,
-                    first_registration DATE
-                )
-            ''')
-            
-            # Таблица заказов
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS orders (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER,
-                    instructor_name TEXT,
-                    date TEXT,
-                    quantity INTEGER,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # Индексы для скорости
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_orders_user ON orders(user_id)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_orders_date ON orders(date)')
-            conn.commit()
+        # Архив старых недель (см. archive_orders_before)
+        self.archive_file = archive_file or os.path.splitext(db_file)[0] + "_archive.db"
+        # Таблицы создаются явно при старте бота (init_db), а не при импорте
+        if init:
+            self.init_db()
     
     def register_employee(self, user_id, username, full_name):
         """Регистрируем сотрудника"""
         with sqlite3.connect(self.db_file) as conn:
             cursor = conn.cursor()
             cursor.execute('''
-                INSERT OR IGNORE INTO employees (user_id, username, full_name, first_registration)
+                INSERT INTO employees (user_id, username, full_name, first_registration)
                 VALUES (?, ?, ?, DATE('now'))
+                ON CONFLICT(user_id) DO UPDATE SET
+                    username = excluded.username,
+                    full_name = excluded.full_name
             ''', (user_id, username, full_name))
             conn.commit()
     
+    def get_all_employees(self):
+        """Все сотрудники (для загрузки реестра в память)"""
+        with sqlite3.connect(self.db_file) as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT user_id, username, full_name FROM employees')
+            return cursor.fetchall()
+    
     def save_order(self, user_id, instructor_name, date, quantity):
         """Сохраняем заказ"""
         with sqlite3.connect(self.db_file) as conn:
@@ -70,6 +66,147 @@ class Database:
             conn.commit()
             return True
     
+    def save_week_orders(self, user_id, date_keys, orders):
+        """Сохраняем неделю заказов по нескольким инструкторам одной транзакцией.
+           orders: {инструктор: [кол-во на каждый день date_keys]}"""
+        with sqlite3.connect(self.db_file) as conn:
+            cursor = conn.cursor()
+            
+            # Неделя заменяется целиком: дни с 0 тоже очищаются
+            cursor.executemany('''
+                DELETE FROM orders 
+                WHERE user_id = ? AND instructor_name = ? AND date = ?
+            ''', [
+                (user_id, instructor, date_key)
+                for instructor in orders
+                for date_key in date_keys
+            ])
+            
+            cursor.executemany('''
+                INSERT INTO orders (user_id, instructor_name, date, quantity)
+                VALUES (?, ?, ?, ?)
+            ''', [
+                (user_id, instructor, date_key, quantity)
+                for instructor, quantities in orders.items()
+                for date_key, quantity in zip(date_keys, quantities)
+                if quantity > 0
+            ])
+            
+            conn.commit()
+            return True
+    
+    def get_user_week_orders(self, user_id, start_date, end_date):
+        """Заказы сотрудника за неделю: (инструктор, дата, кол-во)"""
+        with sqlite3.connect(self.db_file) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT instructor_name, date, quantity
+                FROM orders
+                WHERE user_id = ? AND date BETWEEN ? AND ? AND quantity > 0
+                ORDER BY instructor_name, date
+            ''', (user_id, start_date, end_date))
+            return cursor.fetchall()
+    
+    def find_user_instructors(self, user_id, names):
+        """Какие из инструкторов names уже встречаются в заказах сотрудника"""
+        if not names:
+            return set()
+        placeholders = ", ".join("?" * len(names))
+        with sqlite3.connect(self.db_file) as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT DISTINCT instructor_name FROM orders
+                WHERE user_id = ? AND instructor_name IN ({placeholders})
+            ''', (user_id, *names))
+            return {row[0] for row in cursor.fetchall()}
+
+    def copy_week_orders(self, user_id, start_date, end_date):
+        """Копирует заказы сотрудника за неделю start_date..end_date на неделю
+           вперёд одним INSERT ... SELECT. Заказы тех же инструкторов на
+           следующей неделе заменяются. Возвращает число скопированных строк"""
+        next_start, next_end = (
+            (datetime.strptime(d, "%Y%m%d") + timedelta(days=7)).strftime("%Y%m%d")
+            for d in (start_date, end_date)
+        )
+        with sqlite3.connect(self.db_file) as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                DELETE FROM orders
+                WHERE user_id = ?
+                  AND date BETWEEN ? AND ?
+                  AND instructor_name IN (
+                      SELECT instructor_name FROM orders
+                      WHERE user_id = ? AND date BETWEEN ? AND ? AND quantity > 0
+                  )
+            ''', (user_id, next_start, next_end, user_id, start_date, end_date))
+            
+            # Дата YYYYMMDD -> date() -> +7 дней -> снова YYYYMMDD
+            cursor.execute('''
+                INSERT INTO orders (user_id, instructor_name, date, quantity)
+                SELECT
+                    user_id,
+                    instructor_name,
+                    strftime('%Y%m%d', date(
+                        substr(date, 1, 4) || '-' || substr(date, 5, 2) || '-' || substr(date, 7, 2),
+                        '+7 days'
+                    )),
+                    quantity
+                FROM orders
+                WHERE user_id = ? AND date BETWEEN ? AND ? AND quantity > 0
+            ''', (user_id, start_date, end_date))
+            copied = cursor.rowcount
+            
+            conn.commit()
+            return copied
+    
+    def import_orders(self, cells):
+        """Массовый импорт одной транзакцией.
+           cells: [(user_id, инструктор, дата, кол-во)], 0 - удалить заказ.
+           Возвращает счётчики: inserted, updated, removed, unchanged"""
+        stats = {'inserted': 0, 'updated': 0, 'removed': 0, 'unchanged': 0}
+        if not cells:
+            return stats
+        
+        dates = [cell[2] for cell in cells]
+        with sqlite3.connect(self.db_file) as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT user_id, instructor_name, date, SUM(quantity)
+                FROM orders
+                WHERE date BETWEEN ? AND ?
+                GROUP BY user_id, instructor_name, date
+            ''', (min(dates), max(dates)))
+            existing = {(u, i, d): q for u, i, d, q in cursor.fetchall()}
+            
+            changed = []
+            for user_id, instructor, date, quantity in cells:
+                old = existing.get((user_id, instructor, date), 0)
+                if old == quantity:
+                    stats['unchanged'] += 1
+                    continue
+                if old == 0:
+                    stats['inserted'] += 1
+                elif quantity == 0:
+                    stats['removed'] += 1
+                else:
+                    stats['updated'] += 1
+                changed.append((user_id, instructor, date, quantity))
+            
+            cursor.executemany('''
+                DELETE FROM orders 
+                WHERE user_id = ? AND instructor_name = ? AND date = ?
+            ''', [(u, i, d) for u, i, d, _ in changed])
+            
+            cursor.executemany('''
+                INSERT INTO orders (user_id, instructor_name, date, quantity)
+                VALUES (?, ?, ?, ?)
+            ''', [cell for cell in changed if cell[3] > 0])
+            
+            conn.commit()
+        return stats
+    
     def get_user_orders(self, user_id):
         """Получаем заказы сотрудника"""
         with sqlite3.connect(self.db_file) as conn:
@@ -99,11 +236,186 @@ class Database:
                 ORDER BY o.date DESC, o.instructor_name
             ''')
             result = cursor.fetchall()
-            print(f"📤 get_all_orders вернул {len(result)} записей")
-            if result:
-                print(f"   Пример: {result[0]}")
+            logger.debug("📤 get_all_orders", extra={
+                "event": "get_all_orders", "rows": len(result), "sample": result[0] if result else None
+            })
             return result
     
+    def get_orders_between(self, start_date, end_date):
+        """Заказы за период (даты YYYYMMDD включительно):
+           (user_id, инструктор, дата, кол-во). ФИО сотрудников подставляет
+           реестр при выводе отчёта, без JOIN с employees.
+           Если период задевает перенесённые в архив недели - читаем обе БД"""
+        with sqlite3.connect(self.db_file) as conn:
+            cursor = conn.cursor()
+            source = "orders"
+            if self._attach_archive(conn, start_date):
+                source = ORDERS_WITH_ARCHIVE
+            cursor.execute(f'''
+                SELECT user_id, instructor_name, date, quantity
+                FROM {source}
+                WHERE quantity > 0 AND date BETWEEN ? AND ?
+                ORDER BY date, instructor_name
+            ''', (start_date, end_date))
+            return cursor.fetchall()
+    
+    # ==================== АРХИВ СТАРЫХ НЕДЕЛЬ ====================
+    
+    def _attach_archive(self, conn, start_date=None):
+        """Подключает архивную БД как schema archive.
+           С start_date - только если в архиве есть заказы не новее этой даты"""
+        if start_date is not None and not os.path.exists(self.archive_file):
+            return False
+        conn.execute("ATTACH DATABASE ? AS archive", (self.archive_file,))
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS archive.orders (
+                id INTEGER PRIMARY KEY,
+                user_id INTEGER,
+                instructor_name TEXT,
+                date TEXT,
+                quantity INTEGER,
+                created_at TIMESTAMP
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS archive.idx_archive_orders_date ON orders(date)')
+        if start_date is None:
+            return True
+        
+        overlaps = conn.execute(
+            'SELECT 1 FROM archive.orders WHERE date >= ? LIMIT 1', (start_date,)
+        ).fetchone()
+        if overlaps is None:
+            conn.execute("DETACH DATABASE archive")
+            return False
+        return True
+    
+    def archive_orders_before(self, cutoff_date, batch_size=5000):
+        """Переносит заказы старше cutoff_date (YYYYMMDD) в архивную БД.
+           Пачками по batch_size строк, каждая - отдельной транзакцией,
+           чтобы не держать блокировку на всё время переноса.
+           Возвращает число перенесённых строк"""
+        moved = 0
+        with sqlite3.connect(self.db_file) as conn:
+            self._attach_archive(conn)
+            cursor = conn.cursor()
+            while True:
+                cursor.execute('''
+                    SELECT MAX(id) FROM (
+                        SELECT id FROM main.orders WHERE date < ? ORDER BY id LIMIT ?
+                    )
+                ''', (cutoff_date, batch_size))
+                last_id = cursor.fetchone()[0]
+                if last_id is None:
+                    break
+                
+                cursor.execute('''
+                    INSERT OR REPLACE INTO archive.orders
+                    SELECT id, user_id, instructor_name, date, quantity, created_at
+                    FROM main.orders
+                    WHERE date < ? AND id <= ?
+                ''', (cutoff_date, last_id))
+                cursor.execute(
+                    'DELETE FROM main.orders WHERE date < ? AND id <= ?', (cutoff_date, last_id)
+                )
+                moved += cursor.rowcount
+                conn.commit()
+            
+            # Возвращаем освободившиеся страницы файлу (auto_vacuum = INCREMENTAL).
+            # Прагма освобождает по странице на шаг, а execute() делает только
+            # первый шаг; executescript выполняет её до конца
+            if moved:
+                conn.executescript("PRAGMA main.incremental_vacuum;")
+        return moved
+    
+    def backup_to(self, path):
+        """Копия основной БД на текущий момент через backup API.
+           Отчёт из нескольких процессов читает её, а не живую БД: все
+           недели видят одно и то же состояние, а запись заказов идёт дальше"""
+        with sqlite3.connect(self.db_file) as src:
+            dst = sqlite3.connect(path)
+            try:
+                src.backup(dst)
+                dst.execute('PRAGMA journal_mode = DELETE')  # копия только читается
+            finally:
+                dst.close()
+    
+    # ==================== ИТОГИ (ROLLUPS) ====================
+    
+    def refresh_rollups(self, since_date=None):
+        """Пересчитывает итоги недель и месяцев, начиная с периода даты
+           since_date (YYYYMMDD); None - все периоды, включая архив.
+           Одна транзакция: читатели видят либо старые, либо новые итоги.
+           Возвращает число строк итогов"""
+        if since_date is None:
+            week_from = month_from = "00000000"
+        else:
+            day = datetime.strptime(since_date, "%Y%m%d")
+            week_from = (day - timedelta(days=day.weekday())).strftime("%Y%m%d")
+            month_from = since_date[:6] + "01"
+        start = min(week_from, month_from)
+        
+        with sqlite3.connect(self.db_file) as conn:
+            source = "main.orders"
+            if self._attach_archive(conn, start):
+                source = ORDERS_WITH_ARCHIVE
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM main.rollups WHERE period = 'week' AND period_start >= ?", (week_from,))
+            cursor.execute("DELETE FROM main.rollups WHERE period = 'month' AND period_start >= ?", (month_from,))
+            
+            # Дата YYYYMMDD -> понедельник недели, 1-е число месяца, день недели (Пн = 0)
+            iso = "substr(date, 1, 4) || '-' || substr(date, 5, 2) || '-' || substr(date, 7, 2)"
+            for period, period_expr, period_from in (
+                ("week", f"strftime('%Y%m%d', {iso}, 'weekday 0', '-6 days')", week_from),
+                ("month", "substr(date, 1, 6) || '01'", month_from),
+            ):
+                cursor.execute(f'''
+                    WITH src AS (
+                        SELECT {period_expr} AS period_start,
+                               (CAST(strftime('%w', {iso}) AS INTEGER) + 6) % 7 AS weekday,
+                               user_id, instructor_name, quantity
+                        FROM {source}
+                        WHERE quantity > 0 AND date >= ?
+                    )
+                    INSERT INTO main.rollups (period, period_start, dimension, dim_key, quantity)
+                    SELECT ?, period_start, 'total', '', SUM(quantity) FROM src GROUP BY period_start
+                    UNION ALL
+                    SELECT ?, period_start, 'weekday', weekday, SUM(quantity) FROM src GROUP BY period_start, weekday
+                    UNION ALL
+                    SELECT ?, period_start, 'instructor', instructor_name, SUM(quantity) FROM src GROUP BY period_start, instructor_name
+                    UNION ALL
+                    SELECT ?, period_start, 'employee', user_id, SUM(quantity) FROM src GROUP BY period_start, user_id
+                ''', (period_from, period, period, period, period))
+            
+            conn.commit()
+            return conn.execute('SELECT COUNT(*) FROM main.rollups').fetchone()[0]
+    
+    def get_rollups(self, period, dimension, start_date, end_date):
+        """Итоги [(начало периода, ключ, кол-во)] для периодов в [start_date, end_date]"""
+        with sqlite3.connect(self.db_file) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT period_start, dim_key, quantity FROM rollups
+                WHERE period = ? AND dimension = ? AND period_start BETWEEN ? AND ?
+                ORDER BY period_start, dim_key
+            ''', (period, dimension, start_date, end_date))
+            return cursor.fetchall()
+    
+    def get_rollups_refreshed_at(self):
+        """Когда итоги пересчитывались последний раз (None - ни разу)"""
+        with sqlite3.connect(self.db_file) as conn:
+            return conn.execute('SELECT MAX(refreshed_at) FROM rollups').fetchone()[0]
+    
+    def get_orders_signature(self, start_date, end_date):
+        """Подпись заказов за период: меняется при любой вставке или удалении"""
+        with sqlite3.connect(self.db_file) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT COUNT(*), COALESCE(MAX(id), 0), COALESCE(SUM(quantity), 0)
+                FROM orders
+                WHERE date BETWEEN ? AND ?
+            ''', (start_date, end_date))
+            return ":".join(str(value) for value in cursor.fetchone())
+    
     def delete_user_orders(self, user_id):
         """Удаляем все заказы сотрудника"""
         with sqlite3.connect(self.db_file) as conn:
@@ -120,6 +432,20 @@ class Database:
             result = cursor.fetchone()
             return result[0] if result else None
     
+    def file_stamp(self):
+        """Размер и время изменения файла БД: меняются при любой записи.
+           По ним снимок состояния понимает, что данные с тех пор не трогали.
+           Сначала WAL переносится в основной файл (checkpoint TRUNCATE): сам
+           -wal меняется при открытии и закрытии БД и в штамп не входит.
+           Запись, которую checkpoint не перенёс (ждал читателей), попадёт
+           в основной файл позже и всё равно сменит штамп"""
+        if not os.path.exists(self.db_file):
+            return None
+        with sqlite3.connect(self.db_file) as conn:
+            conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchall()
+        st = os.stat(self.db_file)
+        return [st.st_size, st.st_mtime_ns]
+    
     def get_orders_count(self):
         """Сколько всего заказов в БД"""
         with sqlite3.connect(self.db_file) as conn:
@@ -163,10 +489,87 @@ class Database:
                 )
             ''')
             
+            # Таблица file_id загруженных в Telegram отчётов
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS export_files (
+                    filename TEXT PRIMARY KEY,
+                    file_id TEXT NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # Готовые отчёты, собранные на дедлайне
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS prebuilt_reports (
+                    week_start TEXT PRIMARY KEY,
+                    path TEXT NOT NULL,
+                    signature TEXT NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # Аренда лидерства для нескольких процессов бота
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS leases (
+                    name TEXT PRIMARY KEY,
+                    holder TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            ''')
+            
+            # Запуски плановых задач (защита от повторной рассылки)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS job_runs (
+                    job TEXT NOT NULL,
+                    run_key TEXT NOT NULL,
+                    holder TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (job, run_key)
+                )
+            ''')
+            
+            # Подтверждённые заказы: повторное «✅ Да» в любом процессе не пишет заказ дважды
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS order_confirmations (
+                    chat_id INTEGER NOT NULL,
+                    message_id INTEGER NOT NULL,
+                    version TEXT NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (chat_id, message_id, version)
+                )
+            ''')
+            cursor.execute(
+                'CREATE INDEX IF NOT EXISTS idx_confirmations_created ON order_confirmations(created_at)'
+            )
+            
+            # Итоги по неделям и месяцам (пересчитываются ночью, см. refresh_rollups)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS rollups (
+                    period TEXT NOT NULL,        -- week / month
+                    period_start TEXT NOT NULL,  -- YYYYMMDD понедельника или 1-го числа
+                    dimension TEXT NOT NULL,     -- total / weekday / instructor / employee
+                    dim_key TEXT NOT NULL,
+                    quantity INTEGER NOT NULL,
+                    refreshed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (period, period_start, dimension, dim_key)
+                )
+            ''')
+            
             # Индексы
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_orders_user ON orders(user_id)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_orders_date ON orders(date)')
             conn.commit()
+            
+            # Инкрементальный VACUUM после переноса в архив. Режим меняется
+            # только полным VACUUM - делаем его один раз для старых БД
+            if cursor.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+                cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+                cursor.execute('VACUUM')
+            
+            # WAL: чтение (выгрузки, отчёты) идёт по снимку на начало запроса
+            # и не ждёт записей, а записи не ждут долгих чтений. Режим
+            # хранится в файле БД - достаточно включить один раз
+            cursor.execute('PRAGMA journal_mode = WAL')
 
     def subscribe_user(self, user_id):
         """Подписать пользователя на уведомления"""
@@ -195,4 +598,125 @@ class Database:
             cursor.execute('''
                 SELECT user_id FROM notifications WHERE subscribed = 1
             ''')
-            return [row[0] for row in cursor.fetchall()]
\ No newline at end of file
+            return [row[0] for row in cursor.fetchall()]
+
+    def get_reminder_audience(self, start_date, end_date):
+        """Подписчики без заказов на период - одним запросом.
+           Возвращает (кому напоминать, всего подписчиков)"""
+        with sqlite3.connect(self.db_file) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT n.user_id, EXISTS (
+                    SELECT 1 FROM orders o
+                    WHERE o.user_id = n.user_id
+                      AND o.date BETWEEN ? AND ?
+                      AND o.quantity > 0
+                )
+                FROM notifications n
+                WHERE n.subscribed = 1
+            ''', (start_date, end_date))
+            rows = cursor.fetchall()
+            return [user_id for user_id, ordered in rows if not ordered], len(rows)
+
+    def get_export_file_id(self, filename):
+        """Получить file_id ранее отправленного отчёта"""
+        with sqlite3.connect(self.db_file) as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT file_id FROM export_files WHERE filename = ?', (filename,))
+            result = cursor.fetchone()
+            return result[0] if result else None
+
+    def save_export_file_id(self, filename, file_id):
+        """Запомнить file_id отправленного отчёта"""
+        with sqlite3.connect(self.db_file) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT OR REPLACE INTO export_files (filename, file_id)
+                VALUES (?, ?)
+            ''', (filename, file_id))
+            conn.commit()
+
+    def delete_export_file_id(self, filename):
+        """Забыть file_id (например, если Telegram его больше не принимает)"""
+        with sqlite3.connect(self.db_file) as conn:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM export_files WHERE filename = ?', (filename,))
+            conn.commit()
+
+    def save_prebuilt_report(self, week_start, path, signature):
+        """Запомнить готовый отчёт за неделю"""
+        with sqlite3.connect(self.db_file) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT OR REPLACE INTO prebuilt_reports (week_start, path, signature)
+                VALUES (?, ?, ?)
+            ''', (week_start, path, signature))
+            conn.commit()
+
+    def get_prebuilt_report(self, week_start):
+        """Готовый отчёт за неделю: (путь, подпись заказов) или None"""
+        with sqlite3.connect(self.db_file) as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                'SELECT path, signature FROM prebuilt_reports WHERE week_start = ?',
+                (week_start,)
+            )
+            return cursor.fetchone()
+
+    def acquire_lease(self, name, holder, ttl):
+        """Захватить аренду, если она свободна, истекла или уже наша"""
+        now = time.time()
+        with sqlite3.connect(self.db_file) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO leases (name, holder, expires_at) VALUES (?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET
+                    holder = excluded.holder,
+                    expires_at = excluded.expires_at
+                WHERE leases.holder = excluded.holder OR leases.expires_at < ?
+            ''', (name, holder, now + ttl, now))
+            conn.commit()
+            return cursor.rowcount > 0
+
+    def release_lease(self, name, holder):
+        """Отдать аренду (при остановке процесса)"""
+        with sqlite3.connect(self.db_file) as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                'DELETE FROM leases WHERE name = ? AND holder = ?', (name, holder)
+            )
+            conn.commit()
+
+    def claim_job_run(self, job, run_key, holder=None):
+        """Отметить запуск задачи. False - задачу с этим ключом уже кто-то выполнил"""
+        with sqlite3.connect(self.db_file) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT OR IGNORE INTO job_runs (job, run_key, holder) VALUES (?, ?, ?)
+            ''', (job, run_key, holder))
+            conn.commit()
+            return cursor.rowcount > 0
+
+    def claim_confirmation(self, chat_id, message_id, version, keep_seconds=86400):
+        """Отметить подтверждение заказа. False - эту версию заказа уже сохранили
+           (в этом или другом процессе). Отметки старше keep_seconds удаляются"""
+        with sqlite3.connect(self.db_file) as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "DELETE FROM order_confirmations WHERE created_at < datetime('now', ?)",
+                (f"-{keep_seconds} seconds",)
+            )
+            cursor.execute('''
+                INSERT OR IGNORE INTO order_confirmations (chat_id, message_id, version)
+                VALUES (?, ?, ?)
+            ''', (chat_id, message_id, version))
+            conn.commit()
+            return cursor.rowcount > 0
+
+    def release_confirmation(self, chat_id, message_id, version):
+        """Снять отметку: заказ сохранить не удалось"""
+        with sqlite3.connect(self.db_file) as conn:
+            conn.execute('''
+                DELETE FROM order_confirmations WHERE chat_id = ? AND message_id = ? AND version = ?
+            ''', (chat_id, message_id, version))
+            conn.commit()
\ No newline at end of file
@@ -1,74 +1,202 @@
+import argparse
+import gzip
+import hashlib
+import json
 import os
+import shutil
+import sys
 from datetime import datetime
 
-def create_project_dump():
-    output_file = "project_dump.txt"
-    
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write("# ============================================\n")
-        f.write("# ДАМП ПРОЕКТА: Бот для заказа обедов\n")
-        f.write(f"# Дата: {datetime.now().strftime('%d.%m.%Y %H:%M')}\n")
-        f.write("# ============================================\n\n")
-        
-        # Собираем все .py файлы
-        py_files = []
-        for root, dirs, files in os.walk('.'):
-            if 'venv' in root or '__pycache__' in root or '.git' in root:
-                continue
-            for file in files:
-                if file.endswith('.py'):
-                    full_path = os.path.join(root, file)
-                    rel_path = os.path.relpath(full_path)
-                    py_files.append((rel_path, full_path))
-        
-        # Сортируем файлы
-        py_files.sort()
-        
-        # Записываем каждый файл
-        for rel_path, full_path in py_files:
-            f.write(f"# ============================================\n")
-            f.write(f"# ФАЙЛ: {rel_path}\n")
-            f.write(f"# ============================================\n\n")
-            
-            try:
-                with open(full_path, 'r', encoding='utf-8') as py_file:
-                    content = py_file.read()
-                    f.write(content)
-            except Exception as e:
-                f.write(f"# ОШИБКА ЧТЕНИЯ: {e}\n")
-            
-            f.write("\n\n")
-        
-        # Добавляем requirements.txt
-        if os.path.exists('requirements.txt'):
-            f.write(f"# ============================================\n")
-            f.write(f"# ФАЙЛ: requirements.txt\n")
-            f.write(f"# ============================================\n\n")
-            with open('requirements.txt', 'r', encoding='utf-8') as req:
-                f.write(req.read())
-            f.write("\n\n")
-        
-        # Добавляем структуру папок
-        f.write(f"# ============================================\n")
-        f.write(f"# СТРУКТУРА ПРОЕКТА\n")
-        f.write(f"# ============================================\n\n")
-        
-        for root, dirs, files in os.walk('.'):
-            if 'venv' in root or '__pycache__' in root or '.git' in root:
-                continue
-            level = root.replace('.', '').count(os.sep)
-            indent = '    ' * level
-            f.write(f"{indent}📁 {os.path.basename(root)}/\n")
-            subindent = '    ' * (level + 1)
-            for file in sorted(files):
-                if file.endswith('.py') or file == 'requirements.txt':
-                    f.write(f"{subindent}📄 {file}\n")
-    
-    size = os.path.getsize(output_file) / 1024
-    print(f"✅ Дамп создан: {output_file}")
-    print(f"📁 Размер: {size:.1f} KB")
-    print(f"📊 Строк: {sum(1 for _ in open(output_file, 'r', encoding='utf-8'))}")
+SEPARATOR = "# ============================================\n"
+SKIP_DIRS = ('venv', '__pycache__', '.git')
+DEFAULT_MANIFEST = ".dump_manifest.json"
+
+
+class CountingWriter:
+    """Поток вывода, который по пути считает байты и строки (без перечитывания)"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.bytes = 0
+        self.lines = 0
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        self.stream.write(data)
+        self.bytes += len(data)
+        self.lines += data.count(b"\n")
+        return len(data)
+
+
+def scan_tree(root='.'):
+    """Один обход дерева: .py файлы и структура папок для последнего раздела"""
+    py_files = []
+    structure = []  # (уровень, папка, [файлы для показа])
+    for current, dirs, files in os.walk(root):
+        # Отсекаем служебные папки сразу, чтобы os.walk в них не заходил
+        dirs[:] = sorted(d for d in dirs if not any(skip in d for skip in SKIP_DIRS))
+        level = os.path.relpath(current, root).count(os.sep) + (current != root)
+        shown = []
+        for file in sorted(files):
+            if file.endswith('.py'):
+                full_path = os.path.join(current, file)
+                py_files.append((os.path.relpath(full_path, root), full_path))
+            if file.endswith('.py') or file == 'requirements.txt':
+                shown.append(file)
+        structure.append((level, os.path.basename(current), shown))
+    py_files.sort()
+    return py_files, structure
+
+
+def load_manifest(path):
+    """Манифест прошлого запуска: путь -> размер, mtime, sha256"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_file_section(out, rel_path, full_path, manifest, new_manifest, stats):
+    """Раздел одного файла. Не изменившийся (размер и mtime как в манифесте)
+       копируется байтами без разбора; изменившийся читается, хэшируется
+       и проверяется как UTF-8"""
+    out.write(SEPARATOR)
+    out.write(f"# ФАЙЛ: {rel_path}\n")
+    out.write(SEPARATOR + "\n")
+
+    try:
+        st = os.stat(full_path)
+        known = manifest.get(rel_path)
+        if known and known['size'] == st.st_size and known['mtime_ns'] == st.st_mtime_ns:
+            with open(full_path, 'rb') as src:
+                shutil.copyfileobj(src, out)
+            new_manifest[rel_path] = known
+            stats['reused'] += 1
+        else:
+            with open(full_path, 'rb') as src:
+                content = src.read()
+            content.decode('utf-8')  # как раньше: не UTF-8 - ошибка чтения
+            out.write(content)
+            digest = hashlib.sha256(content).hexdigest()
+            if known and known['sha256'] == digest:
+                stats['touched'] += 1  # mtime сменился, содержимое то же
+            else:
+                stats['changed'] += 1
+            new_manifest[rel_path] = {
+                'size': st.st_size,
+                'mtime_ns': st.st_mtime_ns,
+                'sha256': digest,
+            }
+    except Exception as e:
+        out.write(f"# ОШИБКА ЧТЕНИЯ: {e}\n")
+
+    out.write("\n\n")
+
+
+def write_dump(out, py_files, structure, manifest):
+    """Пишет весь дамп потоком. Возвращает (новый манифест, счётчики)"""
+    new_manifest = {}
+    stats = {'files': len(py_files), 'reused': 0, 'touched': 0, 'changed': 0}
+
+    out.write(SEPARATOR)
+    out.write("# ДАМП ПРОЕКТА: Бот для заказа обедов\n")
+    out.write(f"# Дата: {datetime.now().strftime('%d.%m.%Y %H:%M')}\n")
+    out.write(SEPARATOR + "\n")
+
+    for rel_path, full_path in py_files:
+        write_file_section(out, rel_path, full_path, manifest, new_manifest, stats)
+
+    # Добавляем requirements.txt
+    if os.path.exists('requirements.txt'):
+        out.write(SEPARATOR)
+        out.write("# ФАЙЛ: requirements.txt\n")
+        out.write(SEPARATOR + "\n")
+        with open('requirements.txt', 'rb') as req:
+            shutil.copyfileobj(req, out)
+        out.write("\n\n")
+
+    # Добавляем структуру папок
+    out.write(SEPARATOR)
+    out.write("# СТРУКТУРА ПРОЕКТА\n")
+    out.write(SEPARATOR + "\n")
+    for level, name, files in structure:
+        indent = '    ' * level
+        out.write(f"{indent}📁 {name}/\n")
+        subindent = '    ' * (level + 1)
+        for file in files:
+            out.write(f"{subindent}📄 {file}\n")
+
+    return new_manifest, stats
+
+
+def open_output(path, compress):
+    """Поток для записи: stdout ('-') или временный файл рядом с итоговым"""
+    if path == '-':
+        stream = sys.stdout.buffer
+        return (gzip.GzipFile(fileobj=stream, mode='wb') if compress else stream), None
+    tmp_path = path + ".tmp"
+    return (gzip.open(tmp_path, 'wb') if compress else open(tmp_path, 'wb')), tmp_path
+
+
+def create_project_dump(output_file="project_dump.txt", compress=False, manifest_file=None):
+    """Дамп проекта одним проходом. manifest_file - инкрементальный режим:
+       не изменившиеся файлы не разбираются заново"""
+    manifest = load_manifest(manifest_file) if manifest_file else {}
+    py_files, structure = scan_tree()
+
+    stream, tmp_path = open_output(output_file, compress)
+    out = CountingWriter(stream)
+    try:
+        new_manifest, stats = write_dump(out, py_files, structure, manifest)
+    finally:
+        if tmp_path is not None or compress:
+            stream.close()
+        else:
+            stream.flush()
+    if tmp_path is not None:
+        os.replace(tmp_path, output_file)
+
+    if manifest_file:
+        with open(manifest_file, 'w', encoding='utf-8') as f:
+            json.dump(new_manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+
+    # Итоги - в stderr, чтобы не смешивать с дампом при --output -
+    log = sys.stderr if output_file == '-' else sys.stdout
+    if output_file != '-':
+        size = os.path.getsize(output_file) / 1024
+        print(f"✅ Дамп создан: {output_file}", file=log)
+        print(f"📁 Размер: {size:.1f} KB", file=log)
+    print(f"📊 Строк: {out.lines}", file=log)
+    if manifest_file:
+        print(
+            f"♻️ Файлов: {stats['files']}, без изменений: {stats['reused']}, "
+            f"тот же хэш: {stats['touched']}, изменено: {stats['changed']}",
+            file=log
+        )
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Дамп .py файлов проекта в один файл")
+    parser.add_argument("-o", "--output", default=None,
+                        help="файл дампа (project_dump.txt, с --gzip - .txt.gz); '-' - stdout")
+    parser.add_argument("--gzip", action="store_true", help="сжимать дамп gzip")
+    parser.add_argument("--incremental", action="store_true",
+                        help=f"манифест размеров/mtime/хэшей ({DEFAULT_MANIFEST}): "
+                             f"не изменившиеся файлы не разбираются заново")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST, help="путь к манифесту")
+    parser.add_argument("-y", "--yes", action="store_true",
+                        help="не ждать Enter в конце (автоматизация)")
+    args = parser.parse_args()
+
+    output = args.output or ("project_dump.txt.gz" if args.gzip else "project_dump.txt")
+    create_project_dump(output, compress=args.gzip, manifest_file=args.manifest if args.incremental else None)
+
+    if not args.yes and output != '-' and sys.stdin.isatty():
+        input("\nНажми Enter для выхода...")
+
 
 if __name__ == "__main__":
-    create_project_dump()
-    input("\nНажми Enter для выхода...")
\ No newline at end of file
+    main()
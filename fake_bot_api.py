@@ -0,0 +1,215 @@
+import asyncio
+import itertools
+import json
+import random
+import time
+from collections import Counter, defaultdict
+
+import aiohttp
+from aiohttp import web
+
+# Методы, ответ на которые считается ответом бота пользователю
+REPLY_METHODS = {"sendMessage", "editMessageText", "sendDocument"}
+
+BOT_USER = {"id": 123456, "is_bot": True, "first_name": "Fake", "username": "fake_bot"}
+
+
+class FakeBotAPI:
+    """Локальная замена Telegram Bot API для нагрузочных тестов.
+       getUpdates отдаёт обновления из очереди (push_message/push_callback),
+       после setWebhook они доставляются POST-запросом на адрес webhook.
+       Отправка сообщений записывается и будит ожидающих ответа.
+       latency - задержка ответа на методы отправки, error_rate - доля
+       ответов 429 Too Many Requests."""
+
+    def __init__(self, latency=0.0, error_rate=0.0, retry_after=1, seed=None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+
+        self._updates = []  # неподтверждённые обновления
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._new_updates = asyncio.Event()
+
+        self._replies = defaultdict(asyncio.Queue)  # chat_id -> очередь ответов бота
+
+        self.webhook_url = None
+        self._deliveries = set()  # задачи доставки на webhook
+        self.webhook_failures = 0
+
+        self.first_get_updates = None  # время первого getUpdates
+        self.calls = Counter()
+        self.errors_injected = 0
+
+        self._runner = None
+        self.url = None
+
+    # ---------- сервер ----------
+
+    async def start(self, host="127.0.0.1", port=0):
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post("/bot{token}/{method}", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://{host}:{port}"
+        return self.url
+
+    async def stop(self):
+        for task in list(self._deliveries):
+            task.cancel()
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle(self, request):
+        method = request.match_info["method"]
+        params = dict(await request.post())
+        self.calls[method] += 1
+
+        if method == "getUpdates":
+            return await self._get_updates(params)
+        if method == "getMe":
+            return self._ok(BOT_USER)
+        if method == "setWebhook":
+            self.webhook_url = params.get("url") or None
+            return self._ok(True)
+        if method == "deleteWebhook":
+            self.webhook_url = None
+            return self._ok(True)
+
+        if method in REPLY_METHODS or method == "answerCallbackQuery":
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            if self.error_rate and self._random.random() < self.error_rate:
+                self.errors_injected += 1
+                return web.json_response({
+                    "ok": False, "error_code": 429,
+                    "description": f"Too Many Requests: retry after {self.retry_after}",
+                    "parameters": {"retry_after": self.retry_after},
+                }, status=429)
+
+        if method in REPLY_METHODS:
+            return self._ok(self._record_reply(method, params))
+        return self._ok(True)
+
+    @staticmethod
+    def _ok(result):
+        return web.json_response({"ok": True, "result": result})
+
+    async def _get_updates(self, params):
+        if self.first_get_updates is None:
+            self.first_get_updates = time.perf_counter()
+
+        offset = int(params.get("offset") or 0)
+        timeout = min(float(params.get("timeout") or 0), 10)
+        if offset:
+            self._updates = [u for u in self._updates if u["update_id"] >= offset]
+
+        if not self._updates and timeout:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+        limit = int(params.get("limit") or 100)
+        return self._ok(self._updates[:limit])
+
+    # ---------- обновления от «пользователей» ----------
+
+    @staticmethod
+    def _user(user_id):
+        return {"id": user_id, "is_bot": False, "first_name": f"User{user_id}", "username": f"user{user_id}"}
+
+    def _chat(self, user_id):
+        return {"id": user_id, "type": "private", "first_name": f"User{user_id}"}
+
+    def _push(self, update):
+        update["update_id"] = next(self._update_ids)
+        if self.webhook_url:
+            task = asyncio.get_running_loop().create_task(self._deliver(update))
+            self._deliveries.add(task)
+            task.add_done_callback(self._deliveries.discard)
+            return
+        self._updates.append(update)
+        self._new_updates.set()
+
+    async def _deliver(self, update, attempts=20):
+        """POST обновления на webhook. Каждое - новым соединением: с SO_REUSEPORT
+           ядро распределяет соединения, и keep-alive отправлял бы всё одному воркеру"""
+        connector = aiohttp.TCPConnector(force_close=True)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            for attempt in range(attempts):
+                try:
+                    async with session.post(self.webhook_url, json=update) as response:
+                        if response.status == 200:
+                            return
+                except aiohttp.ClientError:
+                    pass
+                await asyncio.sleep(0.1 * (attempt + 1))
+        self.webhook_failures += 1
+
+    def push_message(self, user_id, text):
+        """Пользователь пишет боту"""
+        self._push({"message": {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": self._chat(user_id),
+            "from": self._user(user_id),
+            "text": text,
+        }})
+
+    def push_callback(self, user_id, message_id, data):
+        """Пользователь нажимает inline-кнопку под сообщением бота"""
+        self._push({"callback_query": {
+            "id": f"cb{next(self._update_ids)}",
+            "from": self._user(user_id),
+            "chat_instance": str(user_id),
+            "data": data,
+            "message": {
+                "message_id": message_id,
+                "date": int(time.time()),
+                "chat": self._chat(user_id),
+                "from": BOT_USER,
+                "text": "...",
+            },
+        }})
+
+    # ---------- ответы бота ----------
+
+    def _record_reply(self, method, params):
+        chat_id = int(params.get("chat_id") or 0)
+        message_id = int(params.get("message_id") or 0) or next(self._message_ids)
+        message = {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": self._chat(chat_id),
+            "from": BOT_USER,
+        }
+        if method == "sendDocument":
+            message["document"] = {"file_id": f"doc{message_id}", "file_unique_id": f"u{message_id}"}
+            message["caption"] = params.get("caption", "")
+        else:
+            message["text"] = params.get("text", "")
+        # В Message попадает только inline-клавиатура (её кнопки нажимают пользователи)
+        markup = json.loads(params.get("reply_markup") or "{}")
+        if "inline_keyboard" in markup:
+            message["reply_markup"] = markup
+
+        self._replies[chat_id].put_nowait((time.perf_counter(), method, message))
+        return message
+
+    def drain(self, chat_id):
+        """Отбрасывает ещё не прочитанные ответы пользователю"""
+        queue = self._replies[chat_id]
+        while not queue.empty():
+            queue.get_nowait()
+
+    async def wait_reply(self, chat_id, timeout=10):
+        """Ждёт следующий ответ бота в чат: (время, метод, сообщение)"""
+        return await asyncio.wait_for(self._replies[chat_id].get(), timeout)
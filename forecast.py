@@ -0,0 +1,59 @@
+from datetime import timedelta
+
+from config import FORECAST_WEEKS
+from utils import format_date_for_db
+
+DAYS = 7
+
+
+class WeekForecast:
+    """Прогноз обедов на неделю по итогам прошлых недель (таблица rollups):
+       по каждому дню недели - среднее за weeks недель с заказами.
+       Сырые заказы не читаются - только предрасчитанные итоги."""
+
+    def __init__(self, db, monday, weeks=FORECAST_WEEKS):
+        self.monday = monday
+        self.weeks = weeks
+
+        first = monday - timedelta(weeks=weeks)
+        window_start = format_date_for_db(first)
+        window_end = format_date_for_db(monday - timedelta(days=1))
+        target = format_date_for_db(monday)
+
+        # Недели без заказов (праздники, нет данных) в среднее не входят
+        self.base_weeks = [
+            period_start for period_start, _, quantity
+            in db.get_rollups("week", "total", window_start, window_end) if quantity > 0
+        ]
+        base = len(self.base_weeks) or 1
+
+        self.days = [0] * DAYS  # прогноз по дням
+        self.day_ranges = [[None, None] for _ in range(DAYS)]  # мин/макс за окно
+        per_day = [dict.fromkeys(self.base_weeks, 0) for _ in range(DAYS)]
+        for period_start, weekday, quantity in db.get_rollups("week", "weekday", window_start, window_end):
+            if period_start in per_day[int(weekday)]:
+                per_day[int(weekday)][period_start] = quantity
+        for day, values in enumerate(per_day):
+            if values:
+                self.days[day] = round(sum(values.values()) / base)
+                self.day_ranges[day] = [min(values.values()), max(values.values())]
+
+        instructors = {}
+        for _, instructor, quantity in db.get_rollups("week", "instructor", window_start, window_end):
+            instructors[instructor] = instructors.get(instructor, 0) + quantity
+        self.instructors = sorted(
+            ((name, total / base) for name, total in instructors.items()),
+            key=lambda item: -item[1]
+        )
+
+        # Уже заказано на целевую неделю - на момент последнего пересчёта
+        self.ordered = [0] * DAYS
+        for _, weekday, quantity in db.get_rollups("week", "weekday", target, target):
+            self.ordered[int(weekday)] = quantity
+
+    @property
+    def has_data(self):
+        return bool(self.base_weeks)
+
+    def total(self):
+        return sum(self.days)
@@ -1,30 +1,65 @@
-from aiogram import F, types, Bot
-from aiogram.filters import Command
+from aiogram import types, Bot
+from aiogram.filters import CommandObject
 from aiogram.fsm.context import FSMContext
-from datetime import datetime
+from datetime import datetime, timedelta
+import io
 import os
 import logging
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
+import uuid
 
-import openpyxl
-
-from config import ADMIN_ID, WEEKDAYS
-from database import Database
-from keyboards import get_main_keyboard, get_remove_keyboard
-from states import TextOrderState
+from config import (
+    WEEKDAYS,
+    THROTTLE_RATE, THROTTLE_BURST, THROTTLE_EXPENSIVE_RATE, THROTTLE_EXPENSIVE_BURST
+)
+from idempotency import RecentConfirmations
+from matrix import WeekMatrix
+from middlewares import ThrottlingMiddleware, TenantMiddleware
+from tenants import ShardAttribute, directory, current_tenant, is_admin
+from profiling import ProfilerSession, ProfiledExecutor, active_session, DEFAULT_SECONDS
+from keyboards import (
+    get_main_keyboard,
+    get_remove_keyboard,
+    get_excel_history_keyboard,
+    get_confirm_keyboard,
+    get_week_quantity_keyboard,
+    get_quick_confirm_keyboard,
+    get_repeat_confirm_keyboard
+)
+from states import TextOrderState, InlineOrderState, QuickOrderState
 from utils import (
     get_target_week_dates,
+    get_closed_week_dates,
     get_deadline_status,
     get_week_range_display,
     format_date_for_db,
-    create_excel_report
+    get_archive_stamp,
+    get_archive_path,
+    get_range_weeks,
+    parse_quick_order,
+    quick_order_instructors,
+    get_fresh_prebuilt_report,
+    send_export_file
 )
 from cache import cache
 
-executor = ThreadPoolExecutor(max_workers=1)
-db = Database()
-logging.basicConfig(level=logging.WARNING)
+executor = ProfiledExecutor(max_workers=1)
+MAX_REPORT_WEEKS = 53
+MY_ORDERS_WEEKS = 2  # сколько последних недель показывать в «Мои заказы»
+# БД, реестр и подписчики компании текущего пользователя (см. tenants.py).
+# Шарды открываются при старте бота (directory.open) и по первому обращению
+db = ShardAttribute("db")
+registry = ShardAttribute("registry")
+subscribers = ShardAttribute("subscribers")
+order_cache = ShardAttribute("orders")  # чтения и записи заказов - через кэш
+tenant_routing = TenantMiddleware(directory)
+confirmations = RecentConfirmations(store=db)  # повторные «✅ Да» не пишут заказ дважды
+throttling = ThrottlingMiddleware(
+    rate=THROTTLE_RATE,
+    burst=THROTTLE_BURST,
+    expensive_rate=THROTTLE_EXPENSIVE_RATE,
+    expensive_burst=THROTTLE_EXPENSIVE_BURST
+)
 logger = logging.getLogger(__name__)
 
 # ==================== КОМАНДЫ ====================
@@ -33,7 +68,9 @@ async def cmd_start(message: types.Message):
     """🚀 Старт с подробной информацией"""
     user = message.from_user
     
-    asyncio.create_task(register_user_async(user.id, user.username, user.full_name))
+    # Пишем в БД только новых сотрудников или при смене username/ФИО
+    if registry.needs_update(user.id, user.username, user.full_name):
+        asyncio.create_task(register_user_async(user.id, user.username, user.full_name))
     
     target_dates, week_type, _ = get_target_week_dates()
     week_range = get_week_range_display(target_dates)
@@ -49,16 +86,18 @@ async def cmd_start(message: types.Message):
         f"• Нажать «📝 Новый заказ»\n"
         f"• Ввести ФИО инструктора\n"
         f"• На каждый день ввести **0**, **1** или **2**\n"
-        f"• Проверить и подтвердить заказ\n\n"
+        f"• Проверить и подтвердить заказ\n"
+        f"• Или «🔘 Заказ кнопками» — то же самое кнопками в одном сообщении\n"
+        f"• Много инструкторов? Быстрый заказ одним сообщением: /quick\n\n"
         f"👇 *Нажмите кнопку «📝 Новый заказ» чтобы начать*",
         parse_mode="Markdown",
-        reply_markup=get_main_keyboard(user.id == ADMIN_ID)
+        reply_markup=get_main_keyboard(is_admin(user.id))
     )
 
 async def register_user_async(user_id, username, full_name):
     """Фоновая регистрация"""
     try:
-        db.register_employee(user_id, username, full_name)
+        registry.register(user_id, username, full_name)
     except:
         pass
 
@@ -66,23 +105,20 @@ async def register_user_async(user_id, username, full_name):
 
 async def start_order(message: types.Message, state: FSMContext):
     """📝 Начало заказа с подробной информацией"""
-    
+    await begin_order(message, state, mode="text")
+
+async def start_inline_order(message: types.Message, state: FSMContext):
+    """🔘 Заказ кнопками: вся неделя на одной клавиатуре, правка сообщения - только в конце"""
+    await begin_order(message, state, mode="inline")
+
+async def begin_order(message: types.Message, state: FSMContext, mode):
+    """Общее начало заказа: неделя, ФИО инструктора"""
     target_dates, week_type, _ = get_target_week_dates()
     date_keys = [format_date_for_db(d) for d in target_dates]
     week_range = get_week_range_display(target_dates)
     
-    # Предрасчет всех форматов
-    week_data = []
-    for i, date_key in enumerate(date_keys):
-        date_obj = cache.parse_date(date_key)
-        week_data.append({
-            'key': date_key,
-            'day_name': WEEKDAYS[i],
-            'display': date_obj.strftime("%d.%m.%Y"),
-            'short': date_obj.strftime("%d.%m"),
-            'full_date': date_obj.strftime("%d %B %Y"),
-            'weekday_full': date_obj.strftime("%A")
-        })
+    # Предрасчитанные форматы дат недели (переживают перезапуск в снимке)
+    week_data = cache.week_context(date_keys)
     
     await state.update_data(
         date_keys=date_keys,
@@ -90,7 +126,9 @@ async def start_order(message: types.Message, state: FSMContext):
         week_range=week_range,
         week_type=week_type,
         current_day=0,
-        meals={}
+        meals={},
+        mode=mode,
+        order_version=uuid.uuid4().hex
     )
     
     await state.set_state(TextOrderState.waiting_instructor)
@@ -121,10 +159,21 @@ async def process_instructor(message: types.Message, state: FSMContext):
         return
     
     await state.update_data(instructor=instructor)
+    data = await state.get_data()
+    
+    if data.get('mode') == "inline":
+        # Дальше всё в одном сообщении с кнопками
+        await state.set_state(InlineOrderState.choosing_quantity)
+        await message.answer(
+            build_week_buttons_text(data),
+            parse_mode="Markdown",
+            reply_markup=get_week_quantity_keyboard(data['week_data'])
+        )
+        return
+    
     await state.set_state(TextOrderState.waiting_quantity)
     
     # Показываем первый день
-    data = await state.get_data()
     day_info = data['week_data'][0]
     
     await message.answer(
@@ -179,9 +228,9 @@ async def process_quantity(message: types.Message, state: FSMContext):
         await message.answer(
             "❌ *Неверный ввод*\n\n"
             "Пожалуйста, введите только **0**, **1** или **2**:\n"
-            f"└ 0 — не заказывать\n"
-            f"└ 1 — один обед\n"
-            f"└ 2 — два обеда",
+            "└ 0 — не заказывать\n"
+            "└ 1 — один обед\n"
+            "└ 2 — два обеда",
             parse_mode="Markdown"
         )
         return
@@ -235,24 +284,22 @@ async def process_quantity(message: types.Message, state: FSMContext):
         parse_mode="Markdown"
     )
 
-async def show_summary(message: types.Message, state: FSMContext):
-    """📋 Подробный показ итогов"""
-    data = await state.get_data()
+def build_summary_text(data):
+    """Текст итогов заказа. Возвращает (текст, всего обедов, дней с обедами)"""
     meals = data.get('meals', {})
     week_data = data.get('week_data', [])
     instructor = data.get('instructor', '')
     week_range = data.get('week_range', '')
     
-    print(f"📊 show_summary: meals={meals}")  # Отладка
+    logger.debug("📊 Итоги заказа", extra={"event": "show_summary", "meals": meals})
     
     # Подсчёт итогов
     total = 0
     days_count = 0
     lines = []
     
-    for i, day_info in enumerate(week_data):
+    for day_info in week_data:
         qty = meals.get(day_info['key'], 0)
-        print(f"   День {i}: {day_info['key']} = {qty}")  # Отладка
         
         if qty > 0:
             total += qty
@@ -275,19 +322,55 @@ async def show_summary(message: types.Message, state: FSMContext):
     text += "\n\n⚠️ *Проверьте внимательно!*\n"
     text += "После подтверждения заказ будет сохранён."
     
+    return text, total, days_count
+
+async def show_summary(message: types.Message, state: FSMContext):
+    """📋 Подробный показ итогов"""
+    data = await state.get_data()
+    text, total, days_count = build_summary_text(data)
+    
     await state.update_data(total=total, days_count=days_count)
     await state.set_state(TextOrderState.waiting_confirm)
     
-    from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-    keyboard = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [InlineKeyboardButton(text="✅ Да, всё верно", callback_data="confirm_yes")],
-            [InlineKeyboardButton(text="🔄 Заполнить заново", callback_data="confirm_no")],
-            [InlineKeyboardButton(text="❌ Отменить заказ", callback_data="cancel")]
-        ]
+    await message.answer(text, parse_mode="Markdown", reply_markup=get_confirm_keyboard())
+
+# ==================== ЗАКАЗ КНОПКАМИ ====================
+
+def build_week_buttons_text(data):
+    """Текст сообщения заказа кнопками"""
+    return (
+        f"👤 *Инструктор:* {data['instructor']}\n"
+        f"📅 *Период:* {data['week_range']}\n\n"
+        f"🍽️ *Сколько обедов на каждый день?*\n"
+        f"└ Нажмите 0, 1 или 2 в строке дня\n"
+        f"└ День без отметки — без обедов\n"
+        f"└ Нажатие на дату покажет, что выбрано\n\n"
+        f"Затем нажмите *«✅ Готово»* — покажу итоги."
     )
+
+async def process_quantity_button(callback: types.CallbackQuery, state: FSMContext):
+    """🔘 Кнопка недели. Выбор дня только запоминается и подтверждается
+       всплывающим ответом - сообщение правится один раз, по «Готово»"""
+    data = await state.get_data()
+    meals = data.get('meals', {})
+    
+    if callback.data == "qty:done":
+        # То же сообщение превращается в итоги
+        text, total, days_count = build_summary_text(data)
+        await state.update_data(total=total, days_count=days_count)
+        await state.set_state(TextOrderState.waiting_confirm)
+        await callback.message.edit_text(text, parse_mode="Markdown", reply_markup=get_confirm_keyboard())
+        await callback.answer()
+        return
     
-    await message.answer(text, parse_mode="Markdown", reply_markup=keyboard)
+    _, day, choice = callback.data.split(":")
+    day_info = data['week_data'][int(day)]
+    if choice != "show":
+        meals[day_info['key']] = int(choice)
+        await state.update_data(meals=meals)
+    
+    qty = meals.get(day_info['key'], 0)
+    await callback.answer(f"{'✅' if qty > 0 else '❌'} {day_info['day_name']} {day_info['short']}: {qty}")
 
 async def confirm_order(callback: types.CallbackQuery, state: FSMContext):
     """✅ Подтверждение заказа с сохранением в БД"""
@@ -300,46 +383,46 @@ async def confirm_order(callback: types.CallbackQuery, state: FSMContext):
         meals = data.get('meals', {})
         week_range = data.get('week_range', '')
         
+        order_version = data.get('order_version')
+        
+        # Пустой заказ: сохранять нечего, отметку подтверждения не тратим
+        if not meals and order_version is not None:
+            await callback.answer("❌ Нет данных для сохранения")
+            return
+        
+        # Двойное нажатие или повторная доставка callback: заказ уже сохранён
+        chat_id, message_id = callback.message.chat.id, callback.message.message_id
+        if not confirmations.claim(chat_id, message_id, order_version):
+            await callback.answer("✅ Заказ уже сохранён")
+            return
+        
         if not meals:
+            # Состояние очищено, а отметки в памяти нет - подтверждать нечего
             await callback.answer("❌ Нет данных для сохранения")
             return
         
-        # Счетчики для статистики
-        saved_count = 0
-        total_meals = 0
-        saved_details = []
+        # Выбранные дни - одной транзакцией
+        date_keys = [date_key for date_key, quantity in meals.items() if quantity > 0]
+        quantities = [meals[date_key] for date_key in date_keys]
+        try:
+            if date_keys:
+                order_cache.save_week_orders(user_id, date_keys, {instructor: quantities})
+        except Exception as e:
+            confirmations.release(chat_id, message_id)
+            logger.error(f"❌ Ошибка сохранения заказа: {e}", extra={"event": "order_save_failed", "user_id": user_id})
+            await callback.answer("❌ Не удалось сохранить заказ, попробуйте ещё раз", show_alert=True)
+            return
         
-        # Сохраняем каждый выбранный день
-        for date_key, quantity in meals.items():
-            if quantity > 0:  # Сохраняем только положительные значения
-                try:
-                    # Вызываем метод сохранения в БД
-                    db.save_order(
-                        user_id=user_id,
-                        instructor_name=instructor,
-                        date=date_key,
-                        quantity=quantity
-                    )
-                    saved_count += 1
-                    total_meals += quantity
-                    
-                    # Форматируем дату для красивого вывода
-                    date_obj = datetime.strptime(date_key, "%Y%m%d")
-                    date_str = date_obj.strftime("%d.%m")
-                    saved_details.append(f"{date_str}: {quantity}")
-                    
-                except Exception as e:
-                    print(f"❌ Ошибка сохранения: {e}")
+        saved_count = len(date_keys)
+        total_meals = sum(quantities)
+        saved_details = [
+            f"{datetime.strptime(date_key, '%Y%m%d').strftime('%d.%m')}: {meals[date_key]}"
+            for date_key in date_keys
+        ]
         
         # Очищаем состояние
         await state.clear()
         
-        # Очищаем кэш БД (если есть такой метод)
-        try:
-            db.clear_cache()
-        except:
-            pass
-        
         # Формируем красивое сообщение об успехе
         success_text = (
             f"✅ *Заказ успешно подтверждён!*\n\n"
@@ -353,7 +436,7 @@ async def confirm_order(callback: types.CallbackQuery, state: FSMContext):
         if saved_details and len(saved_details) <= 7:
             success_text += "*Детали:*\n" + "\n".join([f"  • {d}" for d in saved_details])
         
-        success_text += f"\n\n✨ Спасибо! Заказ передан администраторам."
+        success_text += "\n\n✨ Спасибо! Заказ передан администраторам."
         
         # Отправляем подтверждение
         await callback.message.edit_text(
@@ -365,10 +448,13 @@ async def confirm_order(callback: types.CallbackQuery, state: FSMContext):
         await callback.message.answer(
             "👇 *Главное меню:*",
             parse_mode="Markdown",
-            reply_markup=get_main_keyboard(callback.from_user.id == ADMIN_ID)
+            reply_markup=get_main_keyboard(is_admin(callback.from_user.id))
         )
         
-        print(f"✅ Заказ сохранен: {instructor}, {saved_count} дней, {total_meals} обедов")
+        logger.info("✅ Заказ сохранен", extra={
+            "event": "order_saved", "user_id": user_id, "instructor": instructor,
+            "days": saved_count, "meals_total": total_meals
+        })
     
     elif callback.data == "confirm_no":
         # Начать заново
@@ -376,10 +462,20 @@ async def confirm_order(callback: types.CallbackQuery, state: FSMContext):
         instructor = data.get('instructor', '')
         week_data = data.get('week_data', [])
         
-        await state.update_data(current_day=0, meals={})
-        await state.set_state(TextOrderState.waiting_quantity)
+        # Новая версия заказа: его снова можно подтвердить в том же сообщении
+        order_version = uuid.uuid4().hex
+        await state.update_data(current_day=0, meals={}, order_version=order_version)
         
-        if week_data:
+        if week_data and data.get('mode') == "inline":
+            data.update(current_day=0, meals={}, order_version=order_version)
+            await state.set_state(InlineOrderState.choosing_quantity)
+            await callback.message.edit_text(
+                "🔄 *Начинаем заново*\n\n" + build_week_buttons_text(data),
+                parse_mode="Markdown",
+                reply_markup=get_week_quantity_keyboard(week_data)
+            )
+        elif week_data:
+            await state.set_state(TextOrderState.waiting_quantity)
             day_info = week_data[0]
             await callback.message.edit_text(
                 f"🔄 *Начинаем заново*\n\n"
@@ -400,9 +496,182 @@ async def confirm_order(callback: types.CallbackQuery, state: FSMContext):
         await callback.message.answer(
             "👇 *Главное меню:*",
             parse_mode="Markdown",
-            reply_markup=get_main_keyboard(callback.from_user.id == ADMIN_ID)
+            reply_markup=get_main_keyboard(is_admin(callback.from_user.id))
+        )
+    
+    await callback.answer()
+
+# ==================== БЫСТРЫЙ ЗАКАЗ ====================
+
+QUICK_ORDER_HELP = (
+    "⚡ *Быстрый заказ одним сообщением*\n\n"
+    "Одна строка на инструктора: ФИО, двоеточие и 7 чисел (Пн-Вс):\n"
+    "`Иванов Иван: 1 1 0 2 1 0 0`\n"
+    "`Петрова Мария: 1 1 1 1 1 0 0`\n\n"
+    "└ 0 — не заказывать, 1 — один обед, 2 — два обеда\n"
+    "└ Заказ на неделю по каждому инструктору заменяется целиком"
+)
+
+def is_quick_order(message: types.Message):
+    """Быстрый заказ без /quick: каждая строка в формате «ФИО: числа» и хотя бы
+       один инструктор, которому сотрудник уже заказывал. Иначе в разбор заказа
+       уходило бы любое сообщение с двоеточием"""
+    names = quick_order_instructors(message.text)
+    return bool(names) and bool(db.find_user_instructors(message.from_user.id, names))
+
+async def quick_order_help(message: types.Message, state: FSMContext):
+    """⚡ Подсказка по быстрому заказу; следующее сообщение - заказ"""
+    await state.set_state(QuickOrderState.waiting_order)
+    await message.answer(
+        QUICK_ORDER_HELP + "\n\n👇 Отправьте заказ следующим сообщением",
+        parse_mode="Markdown"
+    )
+
+async def quick_order(message: types.Message, state: FSMContext):
+    """⚡ Быстрый заказ: «ФИО: 1 1 0 2 1 0 0», по строке на инструктора"""
+    orders, errors = parse_quick_order(message.text)
+    
+    if errors or not orders:
+        text = "❌ *Не удалось разобрать заказ*\n\n"
+        text += "\n".join(f"└ {error}" for error in errors[:10])
+        if len(errors) > 10:
+            text += f"\n└ ...и ещё {len(errors) - 10}"
+        await message.answer(text + "\n\n" + QUICK_ORDER_HELP, parse_mode="Markdown")
+        return
+    
+    target_dates, week_type, _ = get_target_week_dates()
+    date_keys = [format_date_for_db(d) for d in target_dates]
+    week_range = get_week_range_display(target_dates)
+    
+    total = 0
+    lines = []
+    for instructor, quantities in orders.items():
+        days = ", ".join(f"{WEEKDAYS[i]} {qty}" for i, qty in enumerate(quantities) if qty > 0) or "без обедов"
+        lines.append(f"👤 *{instructor}:* {days} — {sum(quantities)}")
+        total += sum(quantities)
+    
+    await state.set_state(QuickOrderState.waiting_confirm)
+    await state.set_data({
+        'quick_orders': orders,
+        'date_keys': date_keys,
+        'week_range': week_range
+    })
+    
+    await message.answer(
+        f"📋 *Проверьте быстрый заказ*\n\n"
+        f"📅 *Период:* `{week_range}`\n"
+        f"└ {week_type}\n"
+        f"📊 *Инструкторов:* {len(orders)}, *обедов:* {total}\n\n"
+        + "\n".join(lines) +
+        "\n\n⚠️ Заказы этих инструкторов на неделю будут заменены.",
+        parse_mode="Markdown",
+        reply_markup=get_quick_confirm_keyboard()
+    )
+
+async def confirm_quick_order(callback: types.CallbackQuery, state: FSMContext):
+    """✅ Сохранение быстрого заказа одной транзакцией"""
+    data = await state.get_data()
+    orders = data.get('quick_orders')
+    if not orders:
+        await callback.answer("❌ Нет данных для сохранения")
+        return
+    
+    # Пока заказ проверяли, мог пройти дедлайн - неделя сменилась
+    target_dates, _, _ = get_target_week_dates()
+    if format_date_for_db(target_dates[0]) != data['date_keys'][0]:
+        await state.clear()
+        await callback.message.edit_text(
+            "⌛ *Неделя заказа сменилась*\n\nОтправьте заказ ещё раз.",
+            parse_mode="Markdown"
+        )
+        await callback.answer()
+        return
+    
+    order_cache.save_week_orders(callback.from_user.id, data['date_keys'], orders)
+    await state.clear()
+    
+    total = sum(sum(quantities) for quantities in orders.values())
+    await callback.message.edit_text(
+        f"✅ *Быстрый заказ сохранён!*\n\n"
+        f"📅 *Период:* {data['week_range']}\n"
+        f"👥 *Инструкторов:* {len(orders)}\n"
+        f"🍱 *Всего обедов:* {total}\n\n"
+        f"✨ Спасибо! Заказ передан администраторам.",
+        parse_mode="Markdown"
+    )
+    await callback.answer()
+
+# ==================== ПОВТОР ПРОШЛОЙ НЕДЕЛИ ====================
+
+async def repeat_last_week(message: types.Message):
+    """🔁 Предпросмотр копирования прошлой недели на целевую"""
+    user_id = message.from_user.id
+    target_dates, week_type, _ = get_target_week_dates()
+    previous_dates = [d - timedelta(days=7) for d in target_dates]
+    
+    orders = order_cache.get_user_week_orders(
+        user_id, format_date_for_db(previous_dates[0]), format_date_for_db(previous_dates[6])
+    )
+    if not orders:
+        await message.answer(
+            f"📭 *Нет заказов за прошлую неделю*\n\n"
+            f"За {get_week_range_display(previous_dates)} заказов не найдено.\n"
+            f"Нажмите «📝 Новый заказ», чтобы заказать вручную.",
+            parse_mode="Markdown",
+            reply_markup=get_main_keyboard(is_admin(user_id))
+        )
+        return
+    
+    # Группируем по инструкторам, дни - уже на целевой неделе
+    instructors = {}
+    for instructor_name, date, quantity in orders:
+        weekday = datetime.strptime(date, "%Y%m%d").weekday()
+        instructors.setdefault(instructor_name, []).append(f"{WEEKDAYS[weekday]} {quantity}")
+    
+    total = sum(quantity for _, _, quantity in orders)
+    text = (
+        f"🔁 *Повторить прошлую неделю*\n\n"
+        f"📅 *На период:* `{get_week_range_display(target_dates)}`\n"
+        f"└ {week_type}\n"
+        f"📊 *Инструкторов:* {len(instructors)}, *обедов:* {total}\n\n"
+    )
+    text += "\n".join(f"👤 *{name}:* {', '.join(days)}" for name, days in instructors.items())
+    text += "\n\n⚠️ Заказы этих инструкторов на неделю будут заменены."
+    
+    await message.answer(
+        text,
+        parse_mode="Markdown",
+        reply_markup=get_repeat_confirm_keyboard(format_date_for_db(target_dates[0]))
+    )
+
+async def confirm_repeat_week(callback: types.CallbackQuery):
+    """✅ Копирование прошлой недели одним INSERT ... SELECT"""
+    week_start = callback.data.split(":", 1)[1]
+    target_dates, _, _ = get_target_week_dates()
+    
+    # Пока смотрели предпросмотр, мог пройти дедлайн
+    if format_date_for_db(target_dates[0]) != week_start:
+        await callback.message.edit_text(
+            "⌛ *Неделя заказа сменилась*\n\nНажмите «🔁 Повторить прошлую неделю» ещё раз.",
+            parse_mode="Markdown"
         )
+        await callback.answer()
+        return
+    
+    previous_dates = [d - timedelta(days=7) for d in target_dates]
+    copied = order_cache.copy_week_orders(
+        callback.from_user.id,
+        format_date_for_db(previous_dates[0]),
+        format_date_for_db(previous_dates[6])
+    )
     
+    await callback.message.edit_text(
+        f"✅ *Заказ повторён!*\n\n"
+        f"📅 *Период:* {get_week_range_display(target_dates)}\n"
+        f"📊 *Скопировано дней:* {copied}\n\n"
+        f"✨ Спасибо! Заказ передан администраторам.",
+        parse_mode="Markdown"
+    )
     await callback.answer()
 
 # ==================== ПРОСМОТР ЗАКАЗОВ ====================
@@ -411,87 +680,370 @@ async def show_my_orders(message: types.Message):
     """📋 Мои заказы"""
     user_id = message.from_user.id
     
-    # Используем обычный метод, не cached
-    orders = db.get_user_orders(user_id)  # ← ИЗМЕНЕНО!
+    # Повторные нажатия берутся из кэша, без SQLite
+    orders = order_cache.get_user_orders(user_id)
     
     if not orders:
         await message.answer(
             "📭 *У вас нет заказов*",
             parse_mode="Markdown",
-            reply_markup=get_main_keyboard(user_id == ADMIN_ID)
+            reply_markup=get_main_keyboard(is_admin(user_id))
         )
         return
     
-    # Группируем по инструкторам
-    instructors = {}
+    # Последние недели с заказами - по WeekMatrix на неделю
+    weeks = {}
     for instructor_name, date, quantity in orders:
-        if instructor_name not in instructors:
-            instructors[instructor_name] = []
-        instructors[instructor_name].append((date, quantity))
+        day = datetime.strptime(date, "%Y%m%d")
+        monday = day - timedelta(days=day.weekday())
+        if monday not in weeks:
+            if len(weeks) == MY_ORDERS_WEEKS:
+                continue
+            weeks[monday] = WeekMatrix([monday + timedelta(days=i) for i in range(7)])
+        weeks[monday].add("", instructor_name, date, quantity)
     
     text = "📋 *Ваши заказы*\n\n"
     total_all = 0
     
-    for instructor, items in instructors.items():
-        text += f"👤 *{instructor}*\n"
-        instructor_total = 0
-        
-        for date, quantity in sorted(items, reverse=True)[:7]:
-            date_obj = datetime.strptime(date, "%Y%m%d")
-            date_str = date_obj.strftime("%a %d.%m")
-            text += f"  • {date_str}: {quantity}\n"
-            instructor_total += quantity
-            total_all += quantity
-        
-        text += f"  ✨ Итого: {instructor_total}\n\n"
+    for matrix in weeks.values():
+        text += f"📅 *{get_week_range_display(matrix.dates)}*\n"
+        row_totals = matrix.row_totals()
+        for _, instructors in matrix.grouped():
+            for instructor, index in instructors:
+                days_text = ", ".join(f"{WEEKDAYS[i]} {qty}" for i, qty in enumerate(matrix.row(index)) if qty)
+                text += f"👤 *{instructor}:* {days_text} — {row_totals[index]}\n"
+        text += f"✨ Итого за неделю: {matrix.total()}\n\n"
+        total_all += matrix.total()
     
     text += f"📊 *Всего:* {total_all} обедов"
     
     await message.answer(
         text,
         parse_mode="Markdown",
-        reply_markup=get_main_keyboard(user_id == ADMIN_ID)
+        reply_markup=get_main_keyboard(is_admin(user_id))
     )
 
 # ==================== АДМИНКА ====================
 
 async def export_to_excel(message: types.Message, bot: Bot):
     """📊 Выгрузить Excel"""
-    if message.from_user.id != ADMIN_ID:
+    if not is_admin(message.from_user.id):
         await message.answer("⛔ *Доступ запрещён*\n\nЭта команда только для администратора.")
         return
     
-    status = await message.answer("🔄 *Формирую отчёт...*\nЭто займёт несколько секунд.")
+    # После дедлайна - закрытая неделя: её отчёт уже собран на дедлайне,
+    # отдаём его, если с тех пор заказы не менялись. До дедлайна - целевая
+    # неделя, заказы на которую ещё идут: собираем по заказам как есть
+    target_dates, _, is_after_deadline = get_target_week_dates()
+    dates = get_closed_week_dates() if is_after_deadline else target_dates
+    week_range = get_week_range_display(dates)
+    status = None
     
     try:
-        # Используем обычный метод, не cached
-        all_orders = db.get_all_orders()  # ← ИЗМЕНЕНО!
+        from reports import build_week_report, prebuild_week_report
         
-        if not all_orders:
-            await status.edit_text("📭 *Нет заказов для выгрузки*")
-            return
+        path = get_fresh_prebuilt_report(db, dates) if is_after_deadline else None
+        if path is None:
+            if is_after_deadline and db.get_prebuilt_report(format_date_for_db(dates[0])):
+                status = await message.answer("🔄 *Заказы изменились, обновляю отчёт...*")
+            else:
+                status = await message.answer("🔄 *Формирую отчёт...*\nЭто займёт несколько секунд.")
+            build = prebuild_week_report if is_after_deadline else build_week_report
+            loop = asyncio.get_running_loop()
+            path, matrix = await loop.run_in_executor(
+                executor, build, order_cache, dates, registry.get_name
+            )
+            if not matrix.total():
+                await status.edit_text(f"📭 *Нет заказов за неделю {week_range}*")
+                return
+        
+        caption = f"📊 *Отчёт за неделю {week_range}*\n"
+        if not is_after_deadline:
+            caption += "⏳ Приём заказов ещё открыт\n"
+        await send_export_file(bot, db, message.chat.id, path, caption + "💾 Сохранён в папке exports/")
+        if status:
+            await status.delete()
         
-        target_dates, _, _ = get_target_week_dates()
+    except Exception as e:
+        error_text = f"❌ *Ошибка:* {str(e)[:50]}"
+        if status:
+            await status.edit_text(error_text)
+        else:
+            await message.answer(error_text)
+        logger.error(f"Excel export error: {e}")
+
+async def export_range_report(message: types.Message, command: CommandObject):
+    """📅 Отчёт за диапазон недель: /report ДД.ММ.ГГГГ ДД.ММ.ГГГГ"""
+    if not is_admin(message.from_user.id):
+        await message.answer("⛔ *Доступ запрещён*\n\nЭта команда только для администратора.")
+        return
+    
+    usage = (
+        "📅 *Отчёт за период*\n\n"
+        "Использование: `/report ДД.ММ.ГГГГ ДД.ММ.ГГГГ`\n"
+        "└ Пример: `/report 01.09.2026 30.11.2026`"
+    )
+    args = (command.args or "").split()
+    if len(args) != 2:
+        await message.answer(usage, parse_mode="Markdown")
+        return
+    
+    try:
+        start_date, end_date = (datetime.strptime(arg, "%d.%m.%Y") for arg in args)
+    except ValueError:
+        await message.answer(usage, parse_mode="Markdown")
+        return
+    
+    if end_date < start_date:
+        start_date, end_date = end_date, start_date
+    
+    weeks = get_range_weeks(start_date, end_date)
+    if len(weeks) > MAX_REPORT_WEEKS:
+        await message.answer(f"❌ *Слишком большой период*\n\nМаксимум {MAX_REPORT_WEEKS} недели.", parse_mode="Markdown")
+        return
+    
+    status = await message.answer(f"🔄 *Формирую отчёт за {len(weeks)} нед.*\nЭто займёт несколько секунд.", parse_mode="Markdown")
+    
+    try:
+        from reports import create_range_report
         
-        # Создаём Excel отчёт
-        temp_path, saved_path = create_excel_report(all_orders, target_dates, save_copy=True)
+        loop = asyncio.get_running_loop()
+        temp_path, saved_path = await loop.run_in_executor(
+            executor, create_range_report, db.db_file, db.archive_file, weeks, registry.get_name
+        )
         
-        await message.answer_document(
+        sent = await message.answer_document(
             types.FSInputFile(temp_path),
-            caption=f"📊 *Отчёт по заказам готов*\n💾 Сохранён в папке exports/"
+            caption=f"📅 *Отчёт за {len(weeks)} нед. готов*\n💾 Сохранён в папке exports/",
+            parse_mode="Markdown"
         )
+        if saved_path and sent.document:
+            db.save_export_file_id(os.path.basename(saved_path), sent.document.file_id)
         
         os.remove(temp_path)
         await status.delete()
         
     except Exception as e:
         await status.edit_text(f"❌ *Ошибка:* {str(e)[:50]}")
-        logger.error(f"Excel export error: {e}")
+        logger.error(f"Range report error: {e}")
+
+IMPORT_MAX_SIZE = 20 * 1024 * 1024  # лимит скачивания файлов Bot API
+
+def prepare_import(data, filename):
+    """Разбор файла и сопоставление сотрудников (выполняется в потоке)"""
+    from reports import parse_orders_file
+    
+    cells, rejected = parse_orders_file(data, filename)
+    
+    resolved = []
+    user_ids = {}
+    for employee, instructor, date_key, quantity in cells:
+        if employee not in user_ids:
+            user_ids[employee] = registry.find_user_ids(employee)
+        ids = user_ids[employee]
+        if len(ids) != 1:
+            reason = "не найден среди сотрудников" if not ids else "несколько сотрудников с таким ФИО"
+            rejected.append((employee, reason))
+            continue
+        resolved.append((ids[0], instructor, date_key, quantity))
+    
+    # Одна причина на сотрудника, а не на каждый его день
+    rejected = list(dict.fromkeys(rejected))
+    return resolved, rejected
+
+async def import_orders_file(message: types.Message, bot: Bot):
+    """📥 Импорт заказов из xlsx/csv в формате отчёта"""
+    if not is_admin(message.from_user.id):
+        return
+    
+    document = message.document
+    filename = document.file_name or ""
+    if not filename.lower().endswith((".xlsx", ".csv")):
+        await message.answer("❌ *Нужен файл .xlsx или .csv* в формате выгрузки отчёта", parse_mode="Markdown")
+        return
+    if document.file_size and document.file_size > IMPORT_MAX_SIZE:
+        await message.answer("❌ *Файл слишком большой* (максимум 20 МБ)", parse_mode="Markdown")
+        return
+    
+    status = await message.answer("🔄 *Импортирую заказы...*", parse_mode="Markdown")
+    
+    try:
+        buffer = io.BytesIO()
+        await bot.download(document, destination=buffer)
+        
+        # Разбор и запись - вне event loop
+        loop = asyncio.get_running_loop()
+        cells, rejected = await loop.run_in_executor(executor, prepare_import, buffer.getvalue(), filename)
+        stats = await loop.run_in_executor(executor, order_cache.import_orders, cells)
+        
+        text = (
+            f"📥 *Импорт завершён:* `{filename}`\n\n"
+            f"➕ Добавлено: {stats['inserted']}\n"
+            f"✏️ Изменено: {stats['updated']}\n"
+            f"➖ Обнулено: {stats['removed']}\n"
+            f"= Без изменений: {stats['unchanged']}\n"
+            f"❌ Отклонено: {len(rejected)}"
+        )
+        if rejected:
+            text += "\n\n*Отклонённые строки:*\n"
+            text += "\n".join(f"└ {where}: {reason}" for where, reason in rejected[:10])
+            if len(rejected) > 10:
+                text += f"\n└ ...и ещё {len(rejected) - 10}"
+        
+        await status.edit_text(text, parse_mode="Markdown")
+        
+    except Exception as e:
+        await status.edit_text(f"❌ *Ошибка импорта:* {str(e)[:50]}")
+        logger.error(f"Import error: {e}")
+
+async def profile_bot(message: types.Message, command: CommandObject):
+    """🔬 Профилирование бота: /profile [секунд]"""
+    if not is_admin(message.from_user.id):
+        await message.answer("⛔ Доступ запрещён")
+        return
+    
+    if active_session() is not None:
+        await message.answer("⏳ *Профилирование уже идёт*, дождитесь отчёта", parse_mode="Markdown")
+        return
+    
+    arg = (command.args or "").strip()
+    if arg and not arg.isdigit():
+        await message.answer("🔬 Использование: `/profile [секунд]`", parse_mode="Markdown")
+        return
+    
+    session = ProfilerSession(int(arg) if arg else DEFAULT_SECONDS)
+    session.start()
+    await message.answer(
+        f"🔬 *Профилирование запущено на {session.seconds} с*\n\n"
+        f"Отчёт придёт файлом.",
+        parse_mode="Markdown"
+    )
+    
+    try:
+        await asyncio.sleep(session.seconds)
+    finally:
+        report = session.stop()
+    
+    filename = f"profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
+    await message.answer_document(
+        types.BufferedInputFile(report.encode("utf-8"), filename=filename),
+        caption=f"🔬 Профиль за {session.seconds} с: cProfile + tracemalloc"
+    )
+
+async def show_forecast(message: types.Message):
+    """📈 Прогноз обедов на целевую неделю по ночным итогам (без чтения заказов)"""
+    if not is_admin(message.from_user.id):
+        await message.answer("⛔ Доступ запрещён")
+        return
+    
+    loop = asyncio.get_running_loop()
+    refreshed_at = db.get_rollups_refreshed_at()
+    if refreshed_at is None:
+        # Итоги ещё ни разу не считались - один раз считаем по всей истории
+        await message.answer("🔄 Считаю итоги по всей истории заказов...")
+        await loop.run_in_executor(executor, db.refresh_rollups, None)
+        refreshed_at = db.get_rollups_refreshed_at()
+    
+    from forecast import WeekForecast
+    
+    target_dates, week_type, _ = get_target_week_dates()
+    forecast = WeekForecast(db, target_dates[0])
+    week_range = get_week_range_display(target_dates)
+    
+    if not forecast.has_data:
+        await message.answer(
+            f"📈 *Прогноз на {week_range}*\n\n"
+            f"Нет заказов за последние {forecast.weeks} нед. - прогнозировать не по чему.",
+            parse_mode="Markdown"
+        )
+        return
+    
+    days = "\n".join(
+        f"└ {WEEKDAYS[i]} {target_dates[i].strftime('%d.%m')}: ~{qty} ({low}–{high})"
+        + (f", заказано {forecast.ordered[i]}" if forecast.ordered[i] else "")
+        for i, (qty, (low, high)) in enumerate(zip(forecast.days, forecast.day_ranges))
+        if high
+    ) or "└ заказов не ожидается"
+    instructors = "\n".join(
+        f"└ {name}: ~{qty:.0f}" for name, qty in forecast.instructors[:5]
+    )
+    first_month = (target_dates[0].replace(day=1) - timedelta(days=62)).replace(day=1)
+    months = " · ".join(
+        f"{period_start[4:6]}.{period_start[:4]}: {qty}"
+        for period_start, _, qty in db.get_rollups(
+            "month", "total", format_date_for_db(first_month), format_date_for_db(target_dates[-1])
+        )
+    )
+    
+    await message.answer(
+        f"📈 *Прогноз на {week_range}* ({week_type})\n"
+        f"Среднее по дням за {len(forecast.base_weeks)} нед. с заказами (мин–макс)\n\n"
+        f"{days}\n\n"
+        f"🍱 *Всего:* ~{forecast.total()} (заказано: {sum(forecast.ordered)})\n\n"
+        f"👤 *Инструкторы* (в среднем за неделю):\n{instructors}\n\n"
+        f"📆 *По месяцам:* {months or 'нет данных'}\n\n"
+        f"🕒 Итоги пересчитаны: {refreshed_at} UTC",
+        parse_mode="Markdown"
+    )
+
+async def show_stats(message: types.Message):
+    """📈 Статистика кэшей для администратора"""
+    if not is_admin(message.from_user.id):
+        await message.answer("⛔ Доступ запрещён")
+        return
+    
+    employees = registry.stats()
+    subs = subscribers.stats()
+    throttle = throttling.stats()
+    orders = order_cache.stats()
+    confirms = confirmations.stats()
+    
+    throttled = "\n".join(
+        f"└ `{name}`: {count}" for name, count in sorted(throttle['throttled'].items())
+    ) or "└ нет"
+    
+    text = (
+        f"📈 *Статистика бота*\n\n"
+        f"👥 *Реестр сотрудников:* {employees['employees']}\n"
+        f"└ /start без записи в БД: {employees['register_hits']}\n"
+        f"└ Записей в БД: {employees['register_writes']}\n"
+        f"└ Имена из памяти: {employees['name_hits']} (промахов: {employees['name_misses']})\n\n"
+        f"🔔 *Подписчиков:* {subs['subscribers']}\n"
+        f"└ Записей в БД: {subs['writes']}\n"
+        f"└ Повторных нажатий без записи: {subs['noops']}\n\n"
+        f"📦 *Кэш заказов:* {'вкл' if orders['enabled'] else 'выкл (несколько процессов)'}\n"
+        f"└ Записей: {orders['entries']} (строк: {orders['rows']})\n"
+        f"└ Попаданий: {orders['hits']} из {orders['hits'] + orders['misses']} ({orders['hit_rate']:.0%})\n"
+        f"└ Сброшено: {orders['invalidations']}, вытеснено: {orders['evictions']}\n\n"
+        f"✅ *Подтверждений заказа:* {confirms['claims']}\n"
+        f"└ Повторных без записи в БД: {confirms['duplicates']}\n\n"
+        f"⏳ *Ограничение частоты* (активных пользователей: {throttle['users']})\n"
+        f"Отброшено запросов:\n{throttled}\n"
+        f"Двойных нажатий: {sum(throttle['coalesced'].values())}"
+    )
+    
+    if directory.multi:
+        tenants = directory.stats()
+        me = await message.bot.me()
+        token = directory.invite_token(current_tenant().key)
+        text += (
+            f"\n\n🏢 *Компаний:* {tenants['tenants']} (открыто шардов: {tenants['open_shards']})\n"
+            f"└ Привязок в кэше: {tenants['routes_cached']}\n"
+            f"└ Из кэша: {tenants['route_hits']} (из БД: {tenants['route_misses']})\n"
+            f"🔗 Приглашение в {current_tenant().name}: `https://t.me/{me.username}?start={token}`"
+        )
+    
+    await message.answer(text, parse_mode="Markdown")
 
 async def subscribe_notifications(message: types.Message):
     """🔔 Подписаться на уведомления"""
     user_id = message.from_user.id
-    db.subscribe_user(user_id)
+    if not subscribers.subscribe(user_id):
+        await message.answer(
+            "ℹ️ *Вы уже подписаны на уведомления*",
+            parse_mode="Markdown"
+        )
+        return
     await message.answer(
         "✅ *Вы подписались на уведомления*\n\n"
         "📅 Каждую пятницу в 08:00 я буду напоминать о заказе обедов.",
@@ -501,7 +1053,12 @@ async def subscribe_notifications(message: types.Message):
 async def unsubscribe_notifications(message: types.Message):
     """🔕 Отписаться от уведомлений"""
     user_id = message.from_user.id
-    db.unsubscribe_user(user_id)
+    if not subscribers.unsubscribe(user_id):
+        await message.answer(
+            "ℹ️ *Вы не подписаны на уведомления*",
+            parse_mode="Markdown"
+        )
+        return
     await message.answer(
         "❌ *Вы отписались от уведомлений*\n\n"
         "Если захотите снова получать напоминания, нажмите «🔔 Подписаться».",
@@ -510,15 +1067,14 @@ async def unsubscribe_notifications(message: types.Message):
 
 async def show_excel_history(message: types.Message):
     """📚 Показать историю Excel отчётов (все листы)"""
-    if message.from_user.id != ADMIN_ID:
+    if not is_admin(message.from_user.id):
         await message.answer("⛔ Доступ запрещён")
         return
     
     import glob
-    import os
-    from config import EXPORT_PATH
+    import openpyxl
     
-    files = glob.glob(os.path.join(EXPORT_PATH, "заказы_архив_*.xlsx"))
+    files = [f for f in glob.glob(os.path.join(current_tenant().export_path, "заказы_архив_*.xlsx")) if get_archive_stamp(f)]
     
     if not files:
         await message.answer("📭 Нет сохранённых отчётов")
@@ -527,6 +1083,7 @@ async def show_excel_history(message: types.Message):
     files.sort(reverse=True)
     
     text = "📚 *Архив Excel отчётов:*\n\n"
+    stamps = []
     
     for i, file in enumerate(files[:10], 1):
         filename = os.path.basename(file)
@@ -545,5 +1102,30 @@ async def show_excel_history(message: types.Message):
         text += f"{i}. `{filename}`\n"
         text += f"   📊 Листы: {sheets}\n"
         text += f"   📦 {size:.1f} KB\n\n"
+        stamps.append(get_archive_stamp(file))
+    
+    text += "👇 Нажмите на кнопку, чтобы скачать отчёт"
+    
+    await message.answer(
+        text,
+        parse_mode="Markdown",
+        reply_markup=get_excel_history_keyboard(stamps)
+    )
+
+async def send_archived_excel(callback: types.CallbackQuery, bot: Bot):
+    """📥 Отправить архивный отчёт (по сохранённому file_id, если он есть)"""
+    if not is_admin(callback.from_user.id):
+        await callback.answer("⛔ Доступ запрещён", show_alert=True)
+        return
     
-    await message.answer(text, parse_mode="Markdown")
\ No newline at end of file
+    stamp = callback.data.split(":", 1)[1]
+    path = get_archive_path(stamp)
+    if not path:
+        await callback.answer("❌ Некорректный файл", show_alert=True)
+        return
+    
+    caption = f"📚 Архивный отчёт `{os.path.basename(path)}`"
+    if not await send_export_file(bot, db, callback.message.chat.id, path, caption):
+        await callback.answer("📭 Файл не найден в архиве", show_alert=True)
+        return
+    await callback.answer()
\ No newline at end of file
@@ -0,0 +1,72 @@
+import time
+from collections import OrderedDict
+
+
+class RecentConfirmations:
+    """Недавно подтверждённые заказы: (chat_id, message_id) -> версия заказа.
+       Повторное нажатие «Да» или повторная доставка callback от Telegram
+       находит здесь тот же заказ и не пишет его в БД второй раз.
+       Записи живут ttl секунд; таблица в памяти процесса, не больше max_entries.
+       store - БД с отметками подтверждений (claim_confirmation): через неё
+       дубль ловится, даже если два нажатия попали в разные процессы."""
+
+    def __init__(self, ttl=600, max_entries=10000, store=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.store = store
+        self._entries = OrderedDict()  # ключ -> (версия, истекает)
+
+        # Счётчики
+        self.claims = 0
+        self.duplicates = 0
+
+    def claim(self, chat_id, message_id, version):
+        """True - подтверждение первое и заказ нужно сохранить.
+           False - дубль: этот заказ (или уже очищенное состояние) сохранён.
+           Вызывается без await между чтением состояния и claim - атомарно
+           для event loop."""
+        now = time.monotonic()
+        self._sweep(now)
+
+        key = (chat_id, message_id)
+        entry = self._entries.get(key)
+        if entry is not None and (version is None or entry[0] == version):
+            self.duplicates += 1
+            return False
+        if version is None:
+            return True  # сохранять нечего - обработчик ответит сам
+
+        first = self.store is None or self.store.claim_confirmation(chat_id, message_id, version)
+        self._entries[key] = (version, now + self.ttl)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        if not first:
+            self.duplicates += 1  # уже сохранил другой процесс
+            return False
+        self.claims += 1
+        return True
+
+    def release(self, chat_id, message_id):
+        """Сохранить не удалось - разрешаем повторить подтверждение"""
+        entry = self._entries.pop((chat_id, message_id), None)
+        if entry is None:
+            return
+        if self.store is not None:
+            self.store.release_confirmation(chat_id, message_id, entry[0])
+        self.claims -= 1
+
+    def _sweep(self, now):
+        # Записи добавляются по времени: истёкшие - в начале
+        while self._entries:
+            key, (_, expires) = next(iter(self._entries.items()))
+            if expires > now:
+                break
+            del self._entries[key]
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'claims': self.claims,
+            'duplicates': self.duplicates,
+        }
@@ -1,4 +1,7 @@
-from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemove
+from aiogram.types import (
+    ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemove,
+    InlineKeyboardMarkup, InlineKeyboardButton
+)
 
 def get_remove_keyboard():
     """Убирает клавиатуру"""
@@ -7,7 +10,8 @@ def get_remove_keyboard():
 def get_main_keyboard(is_admin=False):
     """Главное меню"""
     keyboard = [
-        [KeyboardButton(text="📝 Новый заказ")],
+        [KeyboardButton(text="📝 Новый заказ"), KeyboardButton(text="🔘 Заказ кнопками")],
+        [KeyboardButton(text="🔁 Повторить прошлую неделю")],
         [KeyboardButton(text="📋 Мои заказы")],
         [KeyboardButton(text="🔔 Подписаться на уведомления")],
         [KeyboardButton(text="🔕 Отписаться")]
@@ -15,4 +19,54 @@ def get_main_keyboard(is_admin=False):
     if is_admin:
         keyboard.append([KeyboardButton(text="📊 Выгрузить Excel")])
         keyboard.append([KeyboardButton(text="📚 Архив Excel")])  # Новая кнопка
-    return ReplyKeyboardMarkup(keyboard=keyboard, resize_keyboard=True)
\ No newline at end of file
+    return ReplyKeyboardMarkup(keyboard=keyboard, resize_keyboard=True)
+
+def get_excel_history_keyboard(stamps):
+    """Кнопки скачивания архивных отчётов (по метке времени файла)"""
+    keyboard = [
+        [InlineKeyboardButton(text=f"📥 {i}. {stamp}", callback_data=f"excel_file:{stamp}")]
+        for i, stamp in enumerate(stamps, 1)
+    ]
+    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+
+def get_confirm_keyboard():
+    """Подтверждение заказа"""
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [InlineKeyboardButton(text="✅ Да, всё верно", callback_data="confirm_yes")],
+            [InlineKeyboardButton(text="🔄 Заполнить заново", callback_data="confirm_no")],
+            [InlineKeyboardButton(text="❌ Отменить заказ", callback_data="cancel")]
+        ]
+    )
+
+def get_week_quantity_keyboard(week_data):
+    """Вся неделя на одной клавиатуре: строка на день - дата и 0/1/2.
+       Кнопка даты показывает текущий выбор, «Готово» - итоги"""
+    keyboard = [
+        [InlineKeyboardButton(text=f"{day['day_name']} {day['short']}", callback_data=f"qty:{i}:show")]
+        + [InlineKeyboardButton(text=str(qty), callback_data=f"qty:{i}:{qty}") for qty in (0, 1, 2)]
+        for i, day in enumerate(week_data)
+    ]
+    keyboard.append([
+        InlineKeyboardButton(text="✅ Готово", callback_data="qty:done"),
+        InlineKeyboardButton(text="❌ Отмена", callback_data="cancel"),
+    ])
+    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+
+def get_quick_confirm_keyboard():
+    """Подтверждение быстрого заказа"""
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [InlineKeyboardButton(text="✅ Да, сохранить", callback_data="quick_yes")],
+            [InlineKeyboardButton(text="❌ Отменить", callback_data="cancel")]
+        ]
+    )
+
+def get_repeat_confirm_keyboard(week_start):
+    """Подтверждение повтора прошлой недели (week_start - целевая неделя)"""
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [InlineKeyboardButton(text="✅ Да, повторить", callback_data=f"repeat_yes:{week_start}")],
+            [InlineKeyboardButton(text="❌ Отменить", callback_data="cancel")]
+        ]
+    )
\ No newline at end of file
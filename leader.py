@@ -0,0 +1,49 @@
+import asyncio
+import logging
+import os
+import socket
+
+logger = logging.getLogger(__name__)
+
+class LeaderLease:
+    """Выбор лидера через аренду в SQLite.
+       Плановые задачи и рассылки выполняет только процесс-лидер; если он
+       умер и не продлил аренду, её забирает другой процесс через ttl секунд."""
+    
+    def __init__(self, db, name="scheduler", ttl=30):
+        self.db = db
+        self.name = name
+        self.ttl = ttl
+        self.holder = f"{socket.gethostname()}:{os.getpid()}"
+        self.is_leader = False
+        self.is_running = False
+    
+    def renew(self):
+        """Захватить или продлить аренду. Возвращает True, если мы лидер"""
+        was_leader = self.is_leader
+        try:
+            self.is_leader = self.db.acquire_lease(self.name, self.holder, self.ttl)
+        except Exception as e:
+            # Не смогли продлить - считаем, что аренду потеряли
+            logger.error(f"❌ Ошибка продления аренды {self.name}: {e}")
+            self.is_leader = False
+        
+        if self.is_leader and not was_leader:
+            logger.info(f"👑 {self.holder} стал лидером ({self.name})")
+        elif was_leader and not self.is_leader:
+            logger.warning(f"⚠️ {self.holder} потерял лидерство ({self.name})")
+        return self.is_leader
+    
+    async def run(self):
+        """Продлеваем аренду каждые ttl/3 секунд"""
+        self.is_running = True
+        while self.is_running:
+            self.renew()
+            await asyncio.sleep(self.ttl / 3)
+    
+    def stop(self):
+        """Остановить и отдать аренду другим процессам"""
+        self.is_running = False
+        if self.is_leader:
+            self.db.release_lease(self.name, self.holder)
+            self.is_leader = False
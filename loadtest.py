@@ -0,0 +1,142 @@
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from fake_bot_api import FakeBotAPI
+
+FAKE_TOKEN = "123456:loadtest"
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# id пользователей начинаются отсюда, чтобы не совпасть с ADMIN_ID
+FIRST_USER_ID = 10_000_000
+
+
+class UserStats:
+    """Задержки ответов по шагам сценария"""
+
+    def __init__(self):
+        self.latencies = {}  # шаг -> [секунды]
+        self.timeouts = 0
+
+    def add(self, step, seconds):
+        self.latencies.setdefault(step, []).append(seconds)
+
+
+async def run_user(api, user_id, rounds, stats, reply_timeout):
+    """Один пользователь: /start, быстрый заказ через /quick с подтверждением, «Мои заказы».
+       Без /quick заказ нового пользователя не распознаётся как быстрый"""
+
+    async def step(name, send):
+        api.drain(user_id)
+        started = time.perf_counter()
+        send()
+        try:
+            replied_at, _, message = await api.wait_reply(user_id, reply_timeout)
+        except asyncio.TimeoutError:
+            stats.timeouts += 1
+            return None
+        stats.add(name, replied_at - started)
+        return message
+
+    await step("/start", lambda: api.push_message(user_id, "/start"))
+    for _ in range(rounds):
+        await step("/quick", lambda: api.push_message(user_id, "/quick"))
+        summary = await step("quick_order", lambda: api.push_message(user_id, "Иванов Иван: 1 1 0 2 1 0 0"))
+        if summary is not None:
+            await step("quick_yes", lambda: api.push_callback(user_id, summary["message_id"], "quick_yes"))
+        await step("my_orders", lambda: api.push_message(user_id, "📋 Мои заказы"))
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def print_report(stats_list, elapsed, api):
+    latencies = {}
+    for stats in stats_list:
+        for name, values in stats.latencies.items():
+            latencies.setdefault(name, []).extend(values)
+    every = [v for values in latencies.values() for v in values]
+    timeouts = sum(s.timeouts for s in stats_list)
+
+    print(f"\n📈 Ответов: {len(every)} за {elapsed:.1f} с — {len(every) / elapsed:.1f} отв/с")
+    print(f"   Без ответа (таймаут): {timeouts}, внедрено 429: {api.errors_injected}")
+    print(f"\n   {'шаг':<12} {'n':>6} {'p50, мс':>9} {'p95, мс':>9} {'p99, мс':>9} {'max, мс':>9}")
+    for name, values in list(latencies.items()) + [("всего", every)]:
+        if not values:
+            continue
+        print(f"   {name:<12} {len(values):>6} "
+              f"{statistics.median(values) * 1000:>9.1f} {percentile(values, 95) * 1000:>9.1f} "
+              f"{percentile(values, 99) * 1000:>9.1f} {max(values) * 1000:>9.1f}")
+    print(f"\n   Вызовы Bot API: {dict(api.calls)}")
+
+
+async def main_async(args):
+    api = FakeBotAPI(latency=args.latency / 1000, error_rate=args.error_rate, seed=args.seed)
+    url = await api.start()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(
+            os.environ,
+            BOT_TOKEN=FAKE_TOKEN,
+            TELEGRAM_API_URL=url,
+            DB_FILE=os.path.join(workdir, "orders.db"),
+            WORKERS="1",
+        )
+        if not args.throttling:
+            # Иначе мерим ограничитель частоты, а не бота
+            env.update(THROTTLE_RATE="1000", THROTTLE_BURST="1000",
+                       THROTTLE_EXPENSIVE_RATE="1000", THROTTLE_EXPENSIVE_BURST="1000")
+
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, os.path.join(ROOT, "bot.py"),
+            cwd=workdir, env=env,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=None if args.verbose else asyncio.subprocess.DEVNULL
+        )
+        try:
+            # Ждём, пока бот начнёт опрашивать getUpdates
+            while api.first_get_updates is None:
+                if process.returncode is not None:
+                    raise SystemExit(f"❌ bot.py завершился с кодом {process.returncode}")
+                await asyncio.sleep(0.05)
+
+            print(f"🚀 Бот запущен, пользователей: {args.users}, раундов: {args.rounds}")
+            stats_list = [UserStats() for _ in range(args.users)]
+            started = time.perf_counter()
+            await asyncio.gather(*(
+                run_user(api, FIRST_USER_ID + i, args.rounds, stats, args.timeout)
+                for i, stats in enumerate(stats_list)
+            ))
+            print_report(stats_list, time.perf_counter() - started, api)
+            return stats_list
+        finally:
+            process.terminate()
+            await process.wait()
+            await api.stop()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест bot.py на локальном Bot API")
+    parser.add_argument("--users", type=int, default=200, help="одновременных пользователей (200)")
+    parser.add_argument("--rounds", type=int, default=3, help="раундов сценария на пользователя (3)")
+    parser.add_argument("--latency", type=float, default=0.0, help="задержка Bot API на отправку, мс (0)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="доля ответов 429, 0..1 (0)")
+    parser.add_argument("--timeout", type=float, default=15.0, help="ожидание ответа бота, с (15)")
+    parser.add_argument("--throttling", action="store_true", help="не отключать ограничение частоты")
+    parser.add_argument("--seed", type=int, default=None, help="seed для внедрения ошибок")
+    parser.add_argument("--verbose", action="store_true", help="показывать stderr бота")
+    return parser
+
+
+def main():
+    asyncio.run(main_async(build_parser().parse_args()))
+
+
+if __name__ == "__main__":
+    main()
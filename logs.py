@@ -0,0 +1,133 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+import time
+from collections import Counter
+from logging.handlers import QueueHandler, QueueListener
+
+from config import LOG_LEVEL, LOG_LEVELS, LOG_FORMAT, LOG_SAMPLE_EVERY, LOG_SAMPLE
+
+# Стандартные поля LogRecord: всё остальное пришло через extra= и идёт в JSON
+_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись - одна строка JSON: время, уровень, модуль, сообщение
+       и поля из extra= (event, user_id, ...)"""
+
+    def format(self, record):
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)) + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Частые DEBUG-события с extra={"event": ...}: проходит каждое N-е.
+       N - из LOG_SAMPLE (событие=N), иначе LOG_SAMPLE_EVERY.
+       Остальные записи не трогаем."""
+
+    def __init__(self, every=10, per_event=None):
+        super().__init__()
+        self.every = every
+        self.per_event = per_event or {}
+        self.seen = Counter()
+
+    def filter(self, record):
+        event = getattr(record, "event", None)
+        if event is None or record.levelno > logging.DEBUG:
+            return True
+        every = self.per_event.get(event, self.every)
+        self.seen[event] += 1
+        if every <= 1:
+            return True
+        if self.seen[event] % every != 1:
+            return False
+        record.sampled = every  # в выводе видно, что это 1 из every
+        return True
+
+
+def parse_levels(text):
+    """"handlers=DEBUG,aiogram=WARNING" -> {"handlers": "DEBUG", "aiogram": "WARNING"}"""
+    levels = {}
+    for item in text.split(","):
+        name, sep, level = item.partition("=")
+        if sep and name.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def parse_sampling(text):
+    """"show_summary=100,get_all_orders=10" -> {"show_summary": 100, ...}"""
+    return {name: int(every) for name, every in parse_levels(text).items()}
+
+
+_listener = None
+
+
+def setup_logging():
+    """Логирование через очередь: обработчики только кладут запись в очередь
+       (QueueHandler), вывод в stderr делает отдельный поток (QueueListener).
+       Повторный вызов (процесс-воркер) настраивает всё заново."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+
+    output = logging.StreamHandler(sys.stderr)
+    if LOG_FORMAT == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    records = queue.SimpleQueue()
+    handler = QueueHandler(records)
+    handler.addFilter(SamplingFilter(LOG_SAMPLE_EVERY, parse_sampling(LOG_SAMPLE)))
+
+    root = logging.getLogger()
+    for old in root.handlers[:]:
+        root.removeHandler(old)
+    root.addHandler(handler)
+    root.setLevel(LOG_LEVEL.upper())
+    for name, level in parse_levels(LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = QueueListener(records, output)
+    _listener.start()
+    return _listener
+
+
+def stop_logging():
+    """Дописать очередь и остановить поток вывода"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def _after_fork():
+    # В дочернем процессе (ProcessPoolExecutor отчётов) потока вывода нет:
+    # пишем напрямую, иначе записи копились бы в очереди
+    global _listener
+    if _listener is None:
+        return
+    output = _listener.handlers[0]
+    _listener = None
+    root = logging.getLogger()
+    for old in root.handlers[:]:
+        root.removeHandler(old)
+    root.addHandler(output)
+
+
+atexit.register(stop_logging)
+os.register_at_fork(after_in_child=_after_fork)
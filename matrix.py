@@ -0,0 +1,102 @@
+import logging
+from array import array
+
+from config import WEEKDAYS
+from utils import format_date_for_db
+
+DAYS = 7
+_ZERO_ROW = array('i', [0] * DAYS)
+
+logger = logging.getLogger(__name__)
+
+
+class WeekMatrix:
+    """Заказы одной недели: плотная матрица (сотрудник, инструктор) × 7 дней.
+       Все ячейки лежат в одном array('i'): строка r занимает [r*7, r*7+7).
+       Из неё строятся Excel-отчёты, «Мои заказы» и итоги для кухни."""
+    __slots__ = ("dates", "date_index", "labels", "_rows", "cells")
+
+    def __init__(self, dates):
+        self.dates = list(dates)
+        self.date_index = {format_date_for_db(d): i for i, d in enumerate(self.dates)}
+        self.labels = []  # [(user_id сотрудника, инструктор)] в порядке появления строк
+        self._rows = {}   # user_id сотрудника -> {инструктор -> номер строки}
+        self.cells = array('i')
+
+    @classmethod
+    def from_orders(cls, orders, dates):
+        """Из строк get_orders_between: (user_id, инструктор, дата, кол-во)"""
+        matrix = cls(dates)
+        # Горячий цикл отчёта: add() развёрнут, атрибуты - в локальных переменных
+        date_index, rows, labels, cells = matrix.date_index, matrix._rows, matrix.labels, matrix.cells
+        for order in orders:
+            if len(order) != 4:
+                logger.warning(f"⚠️ Неправильный формат данных: {order}")
+                continue
+            user_id, instructor_name, date, quantity = order
+            day = date_index.get(date)
+            if day is None:
+                continue
+            employee_rows = rows.get(user_id)
+            if employee_rows is None:
+                employee_rows = rows[user_id] = {}
+            row = employee_rows.get(instructor_name)
+            if row is None:
+                row = employee_rows[instructor_name] = len(labels)
+                labels.append((user_id, instructor_name))
+                cells.extend(_ZERO_ROW)
+            cells[row * DAYS + day] += quantity
+        return matrix
+
+    def add(self, employee, instructor, date_key, quantity):
+        """Добавляет кол-во в ячейку; даты вне недели пропускаются"""
+        day = self.date_index.get(date_key)
+        if day is None:
+            return
+        employee_rows = self._rows.setdefault(employee, {})
+        row = employee_rows.get(instructor)
+        if row is None:
+            row = employee_rows[instructor] = len(self.labels)
+            self.labels.append((employee, instructor))
+            self.cells.extend(_ZERO_ROW)
+        self.cells[row * DAYS + day] += quantity
+
+    def __len__(self):
+        return len(self.labels)
+
+    def row(self, index):
+        """Кол-во по 7 дням строки index"""
+        return self.cells[index * DAYS:(index + 1) * DAYS]
+
+    def row_totals(self):
+        """Итоги строк (сотрудник, инструктор) за неделю - колонка «Всего».
+           Складываются 7 столбцов разом, без среза на каждую строку"""
+        cells = self.cells
+        return array('i', map(sum, zip(*(cells[day::DAYS] for day in range(DAYS)))))
+
+    def day_totals(self):
+        """Итоги по дням (столбцы) - то, что нужно кухне"""
+        return [sum(self.cells[day::DAYS]) for day in range(DAYS)]
+
+    def total(self):
+        return sum(self.cells)
+
+    def grouped(self, names=None):
+        """Строки по сотрудникам в алфавитном порядке (генератор):
+           (сотрудник, [(инструктор, номер строки), ...]) - кол-во по дням
+           даёт row(), итог строки - row_totals().
+           names - ФИО по user_id (EmployeeRegistry.get_name); без него
+           сотрудник выводится ключом строки как есть"""
+        if names is None:
+            titles = {employee: employee for employee in self._rows}
+        else:
+            titles = {employee: names(employee) or "Неизвестно" for employee in self._rows}
+        for employee in sorted(self._rows, key=titles.__getitem__):
+            employee_rows = self._rows[employee]
+            yield titles[employee], [(instructor, employee_rows[instructor]) for instructor in sorted(employee_rows)]
+
+    def format_day_totals(self):
+        """«Пн 12 · Вт 10 · ...» по дням с заказами"""
+        return " · ".join(
+            f"{WEEKDAYS[day]} {qty}" for day, qty in enumerate(self.day_totals()) if qty
+        ) or "заказов нет"
@@ -0,0 +1,192 @@
+import logging
+import time
+from collections import Counter
+
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery, Message
+
+from tenants import current_tenant, use_tenant
+
+logger = logging.getLogger(__name__)
+
+# Обработчики, которые делают много работы с БД или файлами
+EXPENSIVE_HANDLERS = {
+    "show_my_orders",
+    "repeat_last_week",
+    "export_to_excel",
+    "export_range_report",
+    "show_excel_history",
+    "send_archived_excel",
+    "import_orders_file",
+}
+
+# Шаги заказа: одинаковые ответы подряд ("1", "1") - это нормально
+NO_COALESCE_HANDLERS = {
+    "process_instructor",
+    "process_quantity",
+}
+
+
+class _UserBuckets:
+    """Два ведра токенов пользователя (дешёвые и дорогие обработчики)"""
+    __slots__ = ("cheap", "expensive", "updated", "last_key", "last_at", "warned")
+
+    def __init__(self, cheap, expensive, now):
+        self.cheap = cheap
+        self.expensive = expensive
+        self.updated = now
+        self.last_key = None
+        self.last_at = 0.0
+        self.warned = False
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """Ограничение частоты запросов на пользователя (token bucket).
+       Повторные одинаковые нажатия в пределах duplicate_window молча
+       отбрасываются; вёдра неактивных пользователей вычищаются."""
+
+    def __init__(self, rate=1.0, burst=5, expensive_rate=0.2, expensive_burst=2,
+                 duplicate_window=1.0, idle_ttl=600, sweep_interval=60):
+        self.rate = rate
+        self.burst = burst
+        self.expensive_rate = expensive_rate
+        self.expensive_burst = expensive_burst
+        self.duplicate_window = duplicate_window
+        self.idle_ttl = idle_ttl
+        self.sweep_interval = sweep_interval
+
+        self._buckets = {}  # user_id -> _UserBuckets
+        self._last_sweep = time.monotonic()
+
+        # Счётчики по обработчикам
+        self.throttled = Counter()
+        self.coalesced = Counter()
+
+    async def __call__(self, handler, event, data):
+        user = data.get("event_from_user")
+        handler_obj = data.get("handler")
+        if user is None or handler_obj is None:
+            return await handler(event, data)
+
+        name = getattr(handler_obj.callback, "__name__", "unknown")
+        now = time.monotonic()
+        self._sweep(now)
+
+        buckets = self._buckets.get(user.id)
+        if buckets is None:
+            buckets = _UserBuckets(self.burst, self.expensive_burst, now)
+            self._buckets[user.id] = buckets
+        else:
+            # Пополняем вёдра за прошедшее время
+            elapsed = now - buckets.updated
+            buckets.cheap = min(self.burst, buckets.cheap + elapsed * self.rate)
+            buckets.expensive = min(self.expensive_burst, buckets.expensive + elapsed * self.expensive_rate)
+            buckets.updated = now
+
+        # Двойное нажатие той же кнопки - молча пропускаем
+        key = self._event_key(event)
+        if (name not in NO_COALESCE_HANDLERS and key is not None
+                and key == buckets.last_key and now - buckets.last_at < self.duplicate_window):
+            self.coalesced[name] += 1
+            buckets.last_at = now
+            if isinstance(event, CallbackQuery):
+                await event.answer()
+            return None
+        buckets.last_key = key
+        buckets.last_at = now
+
+        expensive = name in EXPENSIVE_HANDLERS
+        if buckets.cheap < 1 or (expensive and buckets.expensive < 1):
+            self.throttled[name] += 1
+            await self._warn(event, buckets)
+            return None
+
+        buckets.cheap -= 1
+        if expensive:
+            buckets.expensive -= 1
+        buckets.warned = False
+        return await handler(event, data)
+
+    @staticmethod
+    def _event_key(event):
+        """Что считать «тем же нажатием»"""
+        if isinstance(event, Message):
+            return event.text
+        if isinstance(event, CallbackQuery):
+            message_id = event.message.message_id if event.message else None
+            return (message_id, event.data)
+        return None
+
+    async def _warn(self, event, buckets):
+        """Предупреждаем один раз за серию отброшенных запросов"""
+        if isinstance(event, CallbackQuery):
+            await event.answer("⏳ Слишком часто, подождите немного")
+            return
+        if buckets.warned:
+            return
+        buckets.warned = True
+        if isinstance(event, Message):
+            await event.answer("⏳ *Слишком много запросов*\n\nПодождите несколько секунд.", parse_mode="Markdown")
+
+    def _sweep(self, now):
+        """Удаляем вёдра пользователей, неактивных дольше idle_ttl"""
+        if now - self._last_sweep < self.sweep_interval:
+            return
+        self._last_sweep = now
+        idle = [user_id for user_id, b in self._buckets.items() if now - b.updated > self.idle_ttl]
+        for user_id in idle:
+            del self._buckets[user_id]
+        if idle:
+            logger.debug(f"🧹 Удалено неактивных вёдер: {len(idle)}")
+
+    def stats(self):
+        """Счётчики для админки"""
+        return {
+            'users': len(self._buckets),
+            'throttled': dict(self.throttled),
+            'coalesced': dict(self.coalesced),
+        }
+
+
+class TenantMiddleware(BaseMiddleware):
+    """Выбирает компанию пользователя и делает её шард текущим на время
+       обработки. Непривязанный пользователь присоединяется по приглашению
+       /start <токен приглашения компании>."""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    async def __call__(self, handler, event, data):
+        user = data.get("event_from_user")
+        if user is None:
+            return await handler(event, data)
+
+        key = self._invite_key(event)
+        if key is not None:
+            self.directory.assign(user.id, key)
+        else:
+            key = self.directory.route(user.id)
+
+        if key is None:
+            if isinstance(event, Message):
+                await event.answer(
+                    "🏢 *Бот обслуживает несколько компаний*\n\n"
+                    "Откройте ссылку-приглашение от администратора вашей компании.",
+                    parse_mode="Markdown"
+                )
+            elif isinstance(event, CallbackQuery):
+                await event.answer("🏢 Сначала откройте ссылку-приглашение", show_alert=True)
+            return None
+
+        with use_tenant(key):
+            data["tenant"] = current_tenant()
+            return await handler(event, data)
+
+    def _invite_key(self, event):
+        """Ключ компании из «/start <токен>», если токен приглашения верный"""
+        if not self.directory.multi or not isinstance(event, Message) or not event.text:
+            return None
+        parts = event.text.split()
+        if len(parts) == 2 and parts[0] == "/start":
+            return self.directory.invite_tenant(parts[1])
+        return None
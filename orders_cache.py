@@ -0,0 +1,225 @@
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+
+def _week_key(date_key):
+    """Понедельник недели даты YYYYMMDD (тоже YYYYMMDD)"""
+    day = datetime.strptime(date_key, "%Y%m%d")
+    return (day - timedelta(days=day.weekday())).strftime("%Y%m%d")
+
+
+def _weeks_between(start_date, end_date):
+    """Понедельники всех недель, которые задевает период"""
+    monday = datetime.strptime(_week_key(start_date), "%Y%m%d")
+    end = datetime.strptime(end_date, "%Y%m%d")
+    weeks = []
+    while monday <= end:
+        weeks.append(monday.strftime("%Y%m%d"))
+        monday += timedelta(days=7)
+    return weeks
+
+
+class OrdersCache:
+    """Кэш чтения заказов перед Database.
+       Чтения (заказы сотрудника, заказы за период) берутся из памяти, а
+       записи идут через этот же объект и сбрасывают только затронутые
+       записи: все записи сотрудника и записи периодов с изменёнными неделями.
+       Размер ограничен числом записей и суммарным числом строк (LRU).
+       Остальные методы Database доступны как есть."""
+
+    def __init__(self, db, enabled=True, max_entries=2048, max_rows=200_000):
+        self.db = db
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+
+        self._entries = OrderedDict()  # ключ -> (строки, user_id, недели)
+        self._by_user = {}  # user_id -> {ключи}
+        self._by_week = {}  # понедельник -> {ключи}
+        self._rows = 0
+        # Записи идут и из потоков исполнителя (импорт, архив)
+        self._lock = threading.Lock()
+        self._generation = 0  # растёт при каждом сбросе
+        self._writes_in_flight = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def __getattr__(self, name):
+        return getattr(self.db, name)
+
+    # ---------- чтение ----------
+
+    def get_user_orders(self, user_id):
+        return self._read(("user", user_id), user_id, (), self.db.get_user_orders, user_id)
+
+    def get_user_week_orders(self, user_id, start_date, end_date):
+        return self._read(
+            ("user_week", user_id, start_date, end_date), user_id, (),
+            self.db.get_user_week_orders, user_id, start_date, end_date
+        )
+
+    def get_orders_between(self, start_date, end_date):
+        return self._read(
+            ("between", start_date, end_date), None, _weeks_between(start_date, end_date),
+            self.db.get_orders_between, start_date, end_date
+        )
+
+    def _read(self, key, user_id, weeks, load, *args):
+        if not self.enabled:
+            return load(*args)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return entry[0]
+            self.misses += 1
+            generation = self._generation
+
+        rows = load(*args)
+        with self._lock:
+            # Пока читали, была запись - результат мог устареть, не кэшируем
+            if generation == self._generation and key not in self._entries:
+                self._store(key, rows, user_id, weeks)
+        return rows
+
+    def _store(self, key, rows, user_id, weeks):
+        if len(rows) > self.max_rows:
+            return  # не вытесняем весь кэш ради одного огромного периода
+
+        self._entries[key] = (rows, user_id, weeks)
+        self._rows += len(rows)
+        if user_id is not None:
+            self._by_user.setdefault(user_id, set()).add(key)
+        for week in weeks:
+            self._by_week.setdefault(week, set()).add(key)
+
+        while len(self._entries) > self.max_entries or self._rows > self.max_rows:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.evictions += 1
+
+    def _drop(self, key):
+        rows, user_id, weeks = self._entries.pop(key)
+        self._rows -= len(rows)
+        if user_id is not None:
+            self._by_user[user_id].discard(key)
+            if not self._by_user[user_id]:
+                del self._by_user[user_id]
+        for week in weeks:
+            self._by_week[week].discard(key)
+            if not self._by_week[week]:
+                del self._by_week[week]
+
+    # ---------- снимок состояния ----------
+
+    def dump(self):
+        """Записи для снимка состояния, от старых к новым.
+           None - идёт запись в БД, и записи кэша могут быть уже устаревшими"""
+        with self._lock:
+            if self._writes_in_flight:
+                return None
+            return [
+                [list(key), [list(row) for row in rows], user_id, list(weeks)]
+                for key, (rows, user_id, weeks) in self._entries.items()
+            ]
+
+    def restore(self, entries):
+        """Записи из снимка состояния (БД с тех пор не менялась)"""
+        if not self.enabled:
+            return
+        with self._lock:
+            for key, rows, user_id, weeks in entries:
+                key = tuple(key)
+                if key not in self._entries:
+                    self._store(key, [tuple(row) for row in rows], user_id, tuple(weeks))
+
+    # ---------- сброс ----------
+
+    def invalidate(self, user_ids=(), date_keys=()):
+        """Сбрасывает записи сотрудников user_ids и периодов с датами date_keys"""
+        weeks = {_week_key(date_key) for date_key in date_keys}
+        with self._lock:
+            self._generation += 1
+            keys = set()
+            for user_id in user_ids:
+                keys |= self._by_user.get(user_id, set())
+            for week in weeks:
+                keys |= self._by_week.get(week, set())
+            for key in keys:
+                self._drop(key)
+            self.invalidations += len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._by_user.clear()
+            self._by_week.clear()
+            self._rows = 0
+
+    # ---------- запись ----------
+
+    @contextmanager
+    def _writing(self, user_ids=(), date_keys=(), clear=False):
+        """Запись в БД, после которой сбрасываются затронутые записи.
+           Пока запись идёт, снимок кэша не делается (dump вернёт None)"""
+        with self._lock:
+            self._writes_in_flight += 1
+        try:
+            yield
+        finally:
+            if clear:
+                self.clear()
+            else:
+                self.invalidate(user_ids, date_keys)
+            with self._lock:
+                self._writes_in_flight -= 1
+
+    def save_order(self, user_id, instructor_name, date, quantity):
+        with self._writing([user_id], [date]):
+            return self.db.save_order(user_id, instructor_name, date, quantity)
+
+    def save_week_orders(self, user_id, date_keys, orders):
+        with self._writing([user_id], date_keys):
+            return self.db.save_week_orders(user_id, date_keys, orders)
+
+    def copy_week_orders(self, user_id, start_date, end_date):
+        # Меняется следующая неделя
+        next_monday = datetime.strptime(start_date, "%Y%m%d") + timedelta(days=7)
+        with self._writing([user_id], [next_monday.strftime("%Y%m%d")]):
+            return self.db.copy_week_orders(user_id, start_date, end_date)
+
+    def import_orders(self, cells):
+        with self._writing({cell[0] for cell in cells}, {cell[2] for cell in cells}):
+            return self.db.import_orders(cells)
+
+    def delete_user_orders(self, user_id):
+        # Какие недели задеты, не знаем - сбрасываем и периоды
+        with self._writing(clear=True):
+            return self.db.delete_user_orders(user_id)
+
+    def archive_orders_before(self, cutoff_date, batch_size=5000):
+        # Заказы сотрудников читаются только из основной БД
+        with self._writing(clear=True):
+            return self.db.archive_orders_before(cutoff_date, batch_size)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'entries': len(self._entries),
+            'rows': self._rows,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'invalidations': self.invalidations,
+            'evictions': self.evictions,
+        }
@@ -0,0 +1,144 @@
+import cProfile
+import contextvars
+import io
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+# Окно профилирования, секунды
+MIN_SECONDS = 5
+MAX_SECONDS = 300
+DEFAULT_SECONDS = 30
+
+# Сколько строк показывать в отчёте
+TOP_FUNCTIONS = 40
+TOP_ALLOCATIONS = 25
+
+# До Python 3.12 cProfile видит только свой поток - вызовам в исполнителях
+# нужен отдельный профиль. С 3.12 он работает через sys.monitoring: активен
+# только один профиль на процесс (второй enable - ValueError), зато он видит
+# все потоки. Тогда вызовы в исполнителях только замеряются по времени
+PER_THREAD_PROFILES = sys.version_info < (3, 12)
+
+
+class ProfilerSession:
+    """Профилирование работающего бота на заданное окно времени.
+       cProfile в потоке event loop (обработчики, планировщик, запросы к БД)
+       плюс вызовы в ProfiledExecutor (см. PER_THREAD_PROFILES);
+       tracemalloc - места выделения памяти."""
+
+    def __init__(self, seconds):
+        self.seconds = max(MIN_SECONDS, min(MAX_SECONDS, seconds))
+        self.started_at = None
+        self._profile = cProfile.Profile()
+        self._thread_stats = []  # профили вызовов в потоках исполнителей
+        self._thread_calls = {}  # имя функции -> [вызовов, секунд] (Python 3.12+)
+        self._lock = threading.Lock()
+
+    def start(self):
+        global _active
+        self.started_at = time.time()
+        tracemalloc.start()
+        self._profile.enable()
+        _active = self
+
+    def stop(self):
+        """Останавливает сбор и возвращает текстовый отчёт"""
+        global _active
+        _active = None
+        self._profile.disable()
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return self._render(snapshot, current, peak)
+
+    def run_profiled(self, fn, *args, **kwargs):
+        """Вызов в потоке исполнителя: со своим профилем или (Python 3.12+) с замером времени"""
+        if not PER_THREAD_PROFILES:
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                name = getattr(fn, "__qualname__", repr(fn))
+                with self._lock:
+                    calls = self._thread_calls.setdefault(name, [0, 0.0])
+                    calls[0] += 1
+                    calls[1] += elapsed
+
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(fn, *args, **kwargs)
+        finally:
+            with self._lock:
+                self._thread_stats.append(profile)
+
+    def _render(self, snapshot, current, peak):
+        out = io.StringIO()
+        duration = time.time() - self.started_at
+        out.write(f"Профиль за {duration:.1f} с ({time.strftime('%d.%m.%Y %H:%M:%S', time.localtime(self.started_at))})\n")
+        with self._lock:
+            profiles = [self._profile, *self._thread_stats]
+            thread_calls = sorted(self._thread_calls.items(), key=lambda item: -item[1][1])
+        calls = len(self._thread_stats) + sum(count for _, (count, _) in thread_calls)
+        out.write(f"Вызовов в потоках исполнителей: {calls}\n\n")
+
+        # Профиль без единого вызова pstats не принимает (TypeError)
+        stats = None
+        for profile in profiles:
+            profile.create_stats()
+            if not profile.stats:
+                continue
+            if stats is None:
+                stats = pstats.Stats(profile, stream=out)
+            else:
+                stats.add(profile)
+
+        if stats is None:
+            out.write("Вызовов Python за окно не было\n\n")
+        else:
+            stats.strip_dirs()
+            out.write("=" * 30 + " по cumulative " + "=" * 30 + "\n")
+            stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(TOP_FUNCTIONS)
+            out.write("=" * 30 + " по tottime " + "=" * 30 + "\n")
+            stats.sort_stats(pstats.SortKey.TIME).print_stats(TOP_FUNCTIONS)
+
+        if thread_calls:
+            out.write("=" * 30 + " вызовы в исполнителях " + "=" * 30 + "\n")
+            for name, (count, seconds) in thread_calls[:TOP_FUNCTIONS]:
+                out.write(f"{seconds:10.3f} с {count:8d} вызовов  {name}\n")
+            out.write("\n")
+
+        out.write("=" * 30 + " память (tracemalloc) " + "=" * 30 + "\n")
+        out.write(f"Сейчас: {current / 1024:.1f} КиБ, пик: {peak / 1024:.1f} КиБ\n\n")
+        snapshot = snapshot.filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ])
+        for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]:
+            frame = stat.traceback[0]
+            out.write(f"{stat.size / 1024:10.1f} КиБ {stat.count:8d} блоков  {frame.filename}:{frame.lineno}\n")
+        return out.getvalue()
+
+
+# Текущая сессия; None - профилирование выключено
+_active = None
+
+
+def active_session():
+    return _active
+
+
+class ProfiledExecutor(ThreadPoolExecutor):
+    """ThreadPoolExecutor, вызовы которого попадают в активную сессию.
+       Контекст (текущая компания) переносится в поток, как в asyncio.to_thread"""
+
+    def submit(self, fn, /, *args, **kwargs):
+        context = contextvars.copy_context()
+        session = _active
+        if session is not None:
+            fn, args = session.run_profiled, (fn, *args)
+        return super().submit(context.run, fn, *args, **kwargs)
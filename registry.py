@@ -0,0 +1,176 @@
+import logging
+from array import array
+from bisect import bisect_left, insort
+
+logger = logging.getLogger(__name__)
+
+class EmployeeRegistry:
+    """Сотрудники в памяти: запись в БД только для новых или изменившихся"""
+    
+    def __init__(self, db):
+        self.db = db
+        self._employees = {}  # user_id -> (username, full_name)
+        self.loaded = False
+        
+        # Счётчики
+        self.register_hits = 0   # /start без записи в БД
+        self.register_writes = 0  # новые сотрудники или изменения
+        self.name_hits = 0
+        self.name_misses = 0
+    
+    def load(self):
+        """Загрузить всех сотрудников из БД (при старте бота)"""
+        self._employees = {
+            user_id: (username, full_name)
+            for user_id, username, full_name in self.db.get_all_employees()
+        }
+        self.loaded = True
+        logger.info(f"👥 Загружено сотрудников: {len(self._employees)}")
+    
+    def dump(self):
+        """Сотрудники для снимка состояния: [[user_id, username, ФИО], ...]"""
+        # list() копирует словарь разом: снимок пишется из потока, пока обработчики добавляют сотрудников
+        return [[user_id, username, full_name] for user_id, (username, full_name) in list(self._employees.items())]
+    
+    def restore(self, employees):
+        """Сотрудники из снимка состояния (вместо load)"""
+        self._employees = {
+            user_id: (username, full_name) for user_id, username, full_name in employees
+        }
+        self.loaded = True
+        logger.info(f"👥 Сотрудников из снимка: {len(self._employees)}")
+    
+    def needs_update(self, user_id, username, full_name):
+        """Нужно ли писать в БД: сотрудник новый или сменил username/ФИО"""
+        return self._employees.get(user_id) != (username, full_name)
+    
+    def register(self, user_id, username, full_name):
+        """Регистрируем сотрудника. Возвращает True, если была запись в БД"""
+        if not self.needs_update(user_id, username, full_name):
+            self.register_hits += 1
+            return False
+        
+        self.db.register_employee(user_id, username, full_name)
+        self._employees[user_id] = (username, full_name)
+        self.register_writes += 1
+        return True
+    
+    def get_name(self, user_id):
+        """Имя сотрудника по ID (из памяти)"""
+        employee = self._employees.get(user_id)
+        if employee:
+            self.name_hits += 1
+            return employee[1]
+        
+        # Сотрудник мог зарегистрироваться через другой процесс бота
+        self.name_misses += 1
+        full_name = self.db.get_employee_name(user_id)
+        if full_name is not None:
+            self._employees[user_id] = (None, full_name)
+        return full_name
+    
+    def find_user_ids(self, full_name):
+        """ID сотрудников с таким ФИО (для импорта из отчёта)"""
+        return [
+            user_id for user_id, (_, name) in self._employees.items()
+            if name == full_name
+        ]
+    
+    def __len__(self):
+        return len(self._employees)
+    
+    def stats(self):
+        """Счётчики для админки"""
+        return {
+            'employees': len(self._employees),
+            'register_hits': self.register_hits,
+            'register_writes': self.register_writes,
+            'name_hits': self.name_hits,
+            'name_misses': self.name_misses,
+        }
+
+
+class SubscriberSet:
+    """Подписчики на уведомления в памяти (отсортированный массив int64).
+       Повторные подписки/отписки не трогают БД.
+       shared=True - БД общая для нескольких процессов: набор в памяти может
+       отставать, поэтому изменения пишутся всегда, а перед рассылкой набор
+       перечитывается (load)."""
+    
+    def __init__(self, db, shared=False):
+        self.db = db
+        self.shared = shared
+        self._ids = array('q')
+        self.loaded = False
+        
+        # Счётчики
+        self.writes = 0
+        self.noops = 0
+    
+    def load(self):
+        """Загрузить подписчиков из БД (при старте бота)"""
+        self._ids = array('q', sorted(self.db.get_subscribed_users()))
+        self.loaded = True
+        logger.info(f"🔔 Загружено подписчиков: {len(self._ids)}")
+    
+    def dump(self):
+        """Подписчики для снимка состояния"""
+        return self._ids.tolist()
+    
+    def restore(self, ids):
+        """Подписчики из снимка состояния (вместо load)"""
+        self._ids = array('q', sorted(ids))
+        self.loaded = True
+        logger.info(f"🔔 Подписчиков из снимка: {len(self._ids)}")
+    
+    def __contains__(self, user_id):
+        i = bisect_left(self._ids, user_id)
+        return i < len(self._ids) and self._ids[i] == user_id
+    
+    def __len__(self):
+        return len(self._ids)
+    
+    def __iter__(self):
+        # Итерируемся по копии: во время рассылки кто-то может отписаться
+        return iter(array('q', self._ids))
+    
+    def count(self):
+        """Количество подписчиков"""
+        return len(self._ids)
+    
+    def subscribe(self, user_id):
+        """Подписать. Возвращает False, если пользователь уже подписан"""
+        if user_id in self:
+            self.noops += 1
+            if not self.shared:
+                return False
+            self.db.subscribe_user(user_id)
+            return True
+        
+        self.db.subscribe_user(user_id)
+        insort(self._ids, user_id)
+        self.writes += 1
+        return True
+    
+    def unsubscribe(self, user_id):
+        """Отписать. Возвращает False, если пользователь не был подписан"""
+        i = bisect_left(self._ids, user_id)
+        if i >= len(self._ids) or self._ids[i] != user_id:
+            self.noops += 1
+            if not self.shared:
+                return False
+            self.db.unsubscribe_user(user_id)
+            return True
+        
+        self.db.unsubscribe_user(user_id)
+        del self._ids[i]
+        self.writes += 1
+        return True
+    
+    def stats(self):
+        """Счётчики для админки"""
+        return {
+            'subscribers': len(self._ids),
+            'writes': self.writes,
+            'noops': self.noops,
+        }
\ No newline at end of file
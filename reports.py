@@ -0,0 +1,362 @@
+# Excel-отчёты. openpyxl нужен только администратору, поэтому
+# модуль импортируется лениво - при первой выгрузке
+from datetime import datetime, timedelta
+import csv
+import io
+import logging
+import os
+import re
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import openpyxl
+from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+from openpyxl.utils import get_column_letter
+
+from config import WEEKDAYS
+from matrix import WeekMatrix
+from tenants import current_tenant
+from utils import ARCHIVE_PREFIX, format_date_for_db, get_week_range_display
+
+logger = logging.getLogger(__name__)
+
+def load_week_group(db_file, archive_file, date_keys):
+    """Загружает заказы одной недели в WeekMatrix (выполняется в отдельном процессе)"""
+    from database import Database
+    
+    dates = [datetime.strptime(key, "%Y%m%d") for key in date_keys]
+    orders = Database(db_file, archive_file=archive_file).get_orders_between(date_keys[0], date_keys[-1])
+    return WeekMatrix.from_orders(orders, dates)
+
+def _new_workbook():
+    """Пустая книга без дефолтного листа"""
+    wb = openpyxl.Workbook()
+    if "Sheet" in wb.sheetnames:
+        wb.remove(wb["Sheet"])
+    return wb
+
+def _unique_sheet_name(wb, sheet_name):
+    """Если лист с таким названием уже есть - добавляем суффикс"""
+    original_name = sheet_name
+    counter = 1
+    while sheet_name in wb.sheetnames:
+        sheet_name = f"{original_name} ({counter})"
+        counter += 1
+    return sheet_name
+
+def _header_styles():
+    """Общие стили заголовков"""
+    header_font = Font(bold=True, color="FFFFFF", size=11)
+    header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
+    center_alignment = Alignment(horizontal="center", vertical="center")
+    border = Border(
+        left=Side(style='thin'),
+        right=Side(style='thin'),
+        top=Side(style='thin'),
+        bottom=Side(style='thin')
+    )
+    return header_font, header_fill, center_alignment, border
+
+def _auto_width(ws, columns, last_row):
+    """Автоширина колонок"""
+    for col in range(1, columns + 1):
+        max_len = 10
+        for r in range(1, last_row + 1):
+            val = ws.cell(row=r, column=col).value
+            if val:
+                max_len = max(max_len, len(str(val)))
+        ws.column_dimensions[get_column_letter(col)].width = min(max_len + 2, 25)
+
+def _write_week_sheet(wb, matrix, names):
+    """Добавляет в книгу лист с заказами недели из WeekMatrix.
+       names - ФИО сотрудника по user_id (EmployeeRegistry.get_name).
+       Возвращает (название листа, итоги по дням, общий итог)"""
+    dates = matrix.dates
+    week_start = dates[0].strftime("%d.%m")
+    week_end = dates[6].strftime("%d.%m")
+    sheet_name = _unique_sheet_name(wb, f"Неделя {week_start}-{week_end}")
+    
+    ws = wb.create_sheet(title=sheet_name)
+    header_font, header_fill, center_alignment, border = _header_styles()
+    
+    # Заголовок с информацией о периоде
+    ws.merge_cells('A1:I1')
+    ws['A1'] = f"Заказы обедов • {current_tenant().name}"
+    ws['A1'].font = Font(bold=True, size=14)
+    ws['A1'].alignment = center_alignment
+    
+    # Период
+    ws.merge_cells('A2:I2')
+    start_date = dates[0].strftime("%d.%m.%Y")
+    end_date = dates[6].strftime("%d.%m.%Y")
+    ws['A2'] = f"Период: {start_date} - {end_date}"
+    ws['A2'].font = Font(size=11)
+    ws['A2'].alignment = center_alignment
+    
+    # Дата создания отчёта
+    ws.merge_cells('A3:I3')
+    creation_time = datetime.now().strftime('%d.%m.%Y %H:%M')
+    ws['A3'] = f"Отчёт создан: {creation_time}"
+    ws['A3'].font = Font(size=11)
+    ws['A3'].alignment = center_alignment
+    
+    # Заголовки таблицы
+    headers = ["№", "Сотрудник", "Инструктор"] + \
+              [f"{WEEKDAYS[i]}\n{d.strftime('%d.%m')}" for i, d in enumerate(dates)] + \
+              ["Всего"]
+    
+    for col, header in enumerate(headers, 1):
+        cell = ws.cell(row=4, column=col)
+        cell.value = header
+        cell.font = header_font
+        cell.fill = header_fill
+        cell.alignment = center_alignment
+        cell.border = border
+    
+    # Заполнение данных
+    row = 5
+    row_totals = matrix.row_totals()
+    
+    for emp_idx, (employee, instructors) in enumerate(matrix.grouped(names), 1):
+        first_row = True
+        for instructor, index in instructors:
+            # Номер сотрудника (только для первой строки)
+            ws.cell(row=row, column=1, value=emp_idx if first_row else "")
+            first_row = False
+            
+            # ФИО сотрудника и инструктор
+            ws.cell(row=row, column=2, value=employee)
+            ws.cell(row=row, column=3, value=instructor)
+            
+            # Заполняем дни недели
+            for i, qty in enumerate(matrix.row(index)):
+                ws.cell(row=row, column=4 + i, value=qty if qty > 0 else "-")
+            
+            # Итого по строке
+            ws.cell(row=row, column=11, value=row_totals[index])
+            row += 1
+        
+        # Пустая строка между сотрудниками
+        row += 1
+    
+    # Итоговая строка
+    day_totals = matrix.day_totals()
+    total_all = matrix.total()
+    if row > 5:  # Если есть данные
+        ws.cell(row=row, column=2, value="ИТОГО:")
+        ws.cell(row=row, column=2).font = Font(bold=True)
+        for i, col_total in enumerate(day_totals):
+            ws.cell(row=row, column=4 + i, value=col_total)
+            ws.cell(row=row, column=4 + i).font = Font(bold=True)
+        ws.cell(row=row, column=11, value=total_all)
+        ws.cell(row=row, column=11).font = Font(bold=True)
+    
+    _auto_width(ws, 11, row)
+    return sheet_name, day_totals, total_all
+
+def _write_summary_sheet(wb, weeks):
+    """Сводный лист диапазонного отчёта.
+       weeks: [(даты недели, название листа, итоги по дням, общий итог), ...]"""
+    ws = wb.create_sheet(title="Сводка", index=0)
+    header_font, header_fill, center_alignment, border = _header_styles()
+    
+    first, last = weeks[0][0][0], weeks[-1][0][6]
+    ws.merge_cells('A1:J1')
+    ws['A1'] = f"Сводка заказов • {current_tenant().name}"
+    ws['A1'].font = Font(bold=True, size=14)
+    ws['A1'].alignment = center_alignment
+    
+    ws.merge_cells('A2:J2')
+    ws['A2'] = f"Период: {first.strftime('%d.%m.%Y')} - {last.strftime('%d.%m.%Y')} ({len(weeks)} нед.)"
+    ws['A2'].alignment = center_alignment
+    
+    headers = ["Неделя", "Лист"] + WEEKDAYS + ["Всего"]
+    for col, header in enumerate(headers, 1):
+        cell = ws.cell(row=4, column=col)
+        cell.value = header
+        cell.font = header_font
+        cell.fill = header_fill
+        cell.alignment = center_alignment
+        cell.border = border
+    
+    row = 5
+    grand_days = [0] * 7
+    for dates, sheet_name, day_totals, total in weeks:
+        ws.cell(row=row, column=1, value=get_week_range_display(dates))
+        ws.cell(row=row, column=2, value=sheet_name)
+        for i, qty in enumerate(day_totals):
+            ws.cell(row=row, column=3 + i, value=qty)
+            grand_days[i] += qty
+        ws.cell(row=row, column=10, value=total)
+        row += 1
+    
+    ws.cell(row=row, column=1, value="ИТОГО:").font = Font(bold=True)
+    for i, qty in enumerate(grand_days):
+        ws.cell(row=row, column=3 + i, value=qty).font = Font(bold=True)
+    ws.cell(row=row, column=10, value=sum(grand_days)).font = Font(bold=True)
+    
+    _auto_width(ws, 10, row)
+
+def _save_workbook(wb, save_copy):
+    """Сохраняет книгу во временный файл и (опционально) в архив"""
+    export_path = current_tenant().export_path
+    os.makedirs(export_path, exist_ok=True)
+    
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    filename = f"{ARCHIVE_PREFIX}{timestamp}.xlsx"
+    temp_path = os.path.join(export_path, f"temp_{filename}")
+    saved_path = os.path.join(export_path, filename)
+    
+    wb.save(temp_path)
+    
+    if save_copy:
+        # Копируем в постоянное место
+        shutil.copy2(temp_path, saved_path)
+        logger.info(f"📁 Excel файл сохранён: {saved_path} (листы: {', '.join(wb.sheetnames)})")
+        return temp_path, saved_path
+    
+    return temp_path, None
+
+def build_week_report(db, dates, names):
+    """Формирует отчёт за неделю в exports/ по заказам из БД.
+       names - ФИО сотрудника по user_id (EmployeeRegistry.get_name).
+       Возвращает (путь к отчёту, WeekMatrix недели)"""
+    start, end = format_date_for_db(dates[0]), format_date_for_db(dates[6])
+    matrix = WeekMatrix.from_orders(db.get_orders_between(start, end), dates)
+    
+    wb = _new_workbook()
+    _write_week_sheet(wb, matrix, names)
+    temp_path, saved_path = _save_workbook(wb, save_copy=True)
+    os.remove(temp_path)
+    return saved_path, matrix
+
+def prebuild_week_report(db, dates, names):
+    """Формирует отчёт за неделю (build_week_report) и запоминает его как готовый.
+       Подпись заказов снимается до выборки: если заказ придёт во время
+       сборки, подпись не совпадёт и отчёт соберётся заново"""
+    start, end = format_date_for_db(dates[0]), format_date_for_db(dates[6])
+    signature = db.get_orders_signature(start, end)
+    saved_path, matrix = build_week_report(db, dates, names)
+    db.save_prebuilt_report(start, saved_path, signature)
+    return saved_path, matrix
+
+def create_range_report(db_file, archive_file, weeks, names, save_copy=True):
+    """Создаёт одну книгу по нескольким неделям: лист на каждую неделю + сводка.
+       Выборка и группировка недель идут параллельно в отдельных процессах,
+       ФИО (names - EmployeeRegistry.get_name) подставляются при записи листов."""
+    from database import Database
+    
+    week_keys = [[format_date_for_db(d) for d in dates] for dates in weeks]
+    workers = max(1, min(len(weeks), os.cpu_count() or 1))
+    
+    # Процессы читают копию БД на один момент (backup API), а не живую БД:
+    # недели согласованы между собой, запись заказов при этом не ждёт
+    fd, snapshot_file = tempfile.mkstemp(prefix="report_", suffix=".db")
+    os.close(fd)
+    try:
+        Database(db_file, archive_file=archive_file).backup_to(snapshot_file)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            matrices = list(pool.map(
+                load_week_group, [snapshot_file] * len(weeks), [archive_file] * len(weeks), week_keys
+            ))
+    finally:
+        os.remove(snapshot_file)
+    
+    # Листы пишем в основном процессе: книга openpyxl не делится между процессами
+    wb = _new_workbook()
+    summary = []
+    for dates, matrix in zip(weeks, matrices):
+        sheet_name, day_totals, total = _write_week_sheet(wb, matrix, names)
+        summary.append((dates, sheet_name, day_totals, total))
+    _write_summary_sheet(wb, summary)
+    
+    return _save_workbook(wb, save_copy)
+
+# ==================== ИМПОРТ ЗАКАЗОВ ====================
+
+PERIOD_RE = re.compile(r"Период:\s*(\d{2}\.\d{2}\.\d{4})")
+
+def _iter_file_tables(data, filename):
+    """Таблицы файла как потоки строк: по листу на xlsx, одна на csv"""
+    if filename.lower().endswith(".csv"):
+        try:
+            text = data.decode("utf-8-sig")
+        except UnicodeDecodeError:
+            text = data.decode("cp1251")
+        # Sniffer путается на строках шапки - берём самый частый разделитель
+        sample = text[:4096]
+        delimiter = max(";,\t", key=sample.count)
+        yield "CSV", csv.reader(io.StringIO(text), delimiter=delimiter)
+        return
+    
+    # read_only: строки читаются потоком, без загрузки всей книги в память
+    wb = openpyxl.load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+    try:
+        for ws in wb.worksheets:
+            yield ws.title, ws.iter_rows(values_only=True)
+    finally:
+        wb.close()
+
+def _parse_quantity(value):
+    """Кол-во из ячейки отчёта: '-' и пусто - 0; None, если значение некорректно"""
+    if value is None:
+        return 0
+    text = str(value).strip()
+    if text in ("", "-"):
+        return 0
+    try:
+        number = float(text.replace(",", "."))
+    except ValueError:
+        return None
+    if number not in (0, 1, 2):
+        return None
+    return int(number)
+
+def parse_orders_file(data, filename):
+    """Разбирает xlsx/csv в формате отчёта за неделю (_write_week_sheet).
+       Возвращает ([(сотрудник, инструктор, дата YYYYMMDD, кол-во)], [(где, причина)])"""
+    cells = []
+    rejected = []
+    
+    for table, rows in _iter_file_tables(data, filename):
+        dates = None
+        header_seen = False
+        
+        for row_no, row in enumerate(rows, 1):
+            row = list(row) + [None] * (11 - len(row))
+            where = f"{table}, строка {row_no}"
+            
+            if not header_seen:
+                # Шапка: «Период: ДД.ММ.ГГГГ - ...», затем строка заголовков
+                for value in row:
+                    match = PERIOD_RE.search(str(value or ""))
+                    if match:
+                        monday = datetime.strptime(match.group(1), "%d.%m.%Y")
+                        dates = [format_date_for_db(monday + timedelta(days=i)) for i in range(7)]
+                if str(row[2] or "").strip() == "Инструктор":
+                    header_seen = True
+                    if dates is None:
+                        rejected.append((table, "не найдена строка «Период: ДД.ММ.ГГГГ - ДД.ММ.ГГГГ»"))
+                        break
+                continue
+            
+            employee = str(row[1] or "").strip()
+            instructor = str(row[2] or "").strip()
+            if not employee and not instructor:
+                continue  # пустая строка между сотрудниками
+            if employee == "ИТОГО:":
+                continue
+            if not employee or not instructor:
+                rejected.append((where, "не указан сотрудник или инструктор"))
+                continue
+            
+            quantities = [_parse_quantity(value) for value in row[3:10]]
+            if None in quantities:
+                rejected.append((where, "количество на день - только 0, 1, 2 или «-»"))
+                continue
+            
+            for date_key, quantity in zip(dates, quantities):
+                cells.append((employee, instructor, date_key, quantity))
+    
+    return cells, rejected
@@ -1,56 +1,236 @@
 import asyncio
 import logging
-from datetime import datetime, time
+from datetime import datetime, timedelta
 from aiogram import Bot
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
 import pytz
 
-from config import ADMIN_ID
-from utils import get_target_week_dates, get_week_range_display, get_deadline_status
+from config import RETENTION_WEEKS, REMINDER_WAVES, ROLLUP_REFRESH_WEEKS
+from tenants import directory, current_shard, current_tenant, use_tenant
+from utils import (
+    DEADLINE_DAY_NAMES,
+    format_date_for_db,
+    get_target_week_dates,
+    get_closed_week_dates,
+    get_week_range_display,
+    send_export_file
+)
 
 logger = logging.getLogger(__name__)
 
 # Московское время
 MSK_TZ = pytz.timezone('Europe/Moscow')
 
+# Пауза между сообщениями рассылки (лимит Telegram ~30 сообщений в секунду)
+BROADCAST_DELAY = 0.05
+
+
+def parse_waves(text):
+    """"08:00,12:00" -> [(8, 0), (12, 0)]"""
+    waves = []
+    for item in text.split(","):
+        if item.strip():
+            hour, minute = item.strip().split(":")
+            waves.append((int(hour), int(minute)))
+    return sorted(waves)
+
+
+# Волны напоминания в день дедлайна
+REMINDER_TIMES = parse_waves(REMINDER_WAVES)
+
 class NotificationScheduler:
-    def __init__(self, bot: Bot):
+    def __init__(self, bot: Bot, db, subscribers, lease=None):
         self.bot = bot
+        self.db = db
+        self.subscribers = subscribers
+        self.lease = lease  # LeaderLease, если процессов бота несколько
         self.is_running = False
+        self._done = set()  # (компания, задача, день) - уже отмечены в БД
+    
+    def claim(self, job, now):
+        """Задачу выполняет один процесс и один раз за день"""
+        holder = self.lease.holder if self.lease else None
+        return self.db.claim_job_run(job, now.strftime("%Y-%m-%d"), holder)
     
-    async def send_reminder(self):
-        """Отправка напоминания всем пользователям"""
+    async def broadcast(self, text, parse_mode="Markdown", audience=None):
+        """Рассылка подписчикам (или audience - уже отобранным из них).
+           Возвращает число доставленных сообщений"""
+        if audience is None:
+            if self.subscribers.shared:
+                # Подписки могли измениться в других процессах
+                self.subscribers.load()
+            audience = self.subscribers
+        
+        sent = 0
+        for user_id in audience:
+            try:
+                await self.bot.send_message(user_id, text, parse_mode=parse_mode)
+                sent += 1
+            except TelegramRetryAfter as e:
+                await asyncio.sleep(e.retry_after)
+                await self.bot.send_message(user_id, text, parse_mode=parse_mode)
+                sent += 1
+            except TelegramForbiddenError:
+                # Пользователь заблокировал бота
+                self.subscribers.unsubscribe(user_id)
+            except Exception as e:
+                logger.warning(f"⚠️ Не удалось отправить {user_id}: {e}")
+            await asyncio.sleep(BROADCAST_DELAY)
+        return sent
+    
+    async def send_reminder(self, wave=0):
+        """Напоминание подписчикам, у которых нет заказов на целевую неделю.
+           wave - номер волны (0 - первая). Администраторам - сколько
+           сообщений сэкономил отбор"""
         try:
-            # Получаем список всех пользователей, кто хоть раз заказывал
-            # Можно добавить отдельную таблицу для подписок на уведомления
-            
             # Формируем сообщение
             target_dates, week_type, _ = get_target_week_dates()
             week_range = get_week_range_display(target_dates)
-            deadline_status = get_deadline_status()
+            deadline_day, deadline_hour, deadline_minute = current_tenant().deadline
             
+            audience, subscribed = self.db.get_reminder_audience(
+                format_date_for_db(target_dates[0]), format_date_for_db(target_dates[-1])
+            )
+            skipped = subscribed - len(audience)
+            
+            title = "⏰ *НАПОМИНАНИЕ О ЗАКАЗЕ ОБЕДОВ*" if wave == 0 else "⏰ *ЕЩЁ НЕ ЗАКАЗАЛИ ОБЕДЫ?*"
             reminder_text = (
-                f"⏰ *НАПОМИНАНИЕ О ЗАКАЗЕ ОБЕДОВ*\n\n"
-                f"📅 Сегодня пятница!\n\n"
+                f"{title}\n\n"
+                f"📅 Сегодня {DEADLINE_DAY_NAMES[deadline_day]} - день дедлайна!\n\n"
                 f"🍽️ *Нужно заказать обеды на следующую неделю:*\n"
                 f"└ Период: `{week_range}`\n"
                 f"└ {week_type}\n\n"
-                f"⏳ *Дедлайн:* сегодня до 16:00\n\n"
+                f"⏳ *Дедлайн:* сегодня до {deadline_hour:02d}:{deadline_minute:02d}\n\n"
                 f"👇 Нажми «📝 Новый заказ» чтобы сделать заказ"
             )
             
-            # TODO: Отправить всем пользователям
-            # Пока отправим админу для теста
-            await self.bot.send_message(
-                ADMIN_ID,
-                reminder_text,
-                parse_mode="Markdown"
-            )
+            sent = await self.broadcast(reminder_text, audience=audience)
             
-            logger.info("✅ Напоминание отправлено")
+            logger.info(
+                f"✅ Напоминание (волна {wave + 1}) отправлено: {sent} из {len(audience)}, "
+                f"уже заказали {skipped} из {subscribed}",
+                extra={"event": "reminder", "wave": wave + 1, "sent": sent, "saved": skipped}
+            )
+            for admin_id in current_tenant().admin_ids:
+                try:
+                    await self.bot.send_message(
+                        admin_id,
+                        f"🔔 *Напоминание, волна {wave + 1}*\n\n"
+                        f"📤 Отправлено: {sent} из {len(audience)}\n"
+                        f"✅ Уже заказали: {skipped} из {subscribed} подписчиков\n"
+                        f"💡 Сэкономлено сообщений: {skipped}",
+                        parse_mode="Markdown"
+                    )
+                except Exception as e:
+                    logger.warning(f"⚠️ Не удалось отправить отчёт о напоминании {admin_id}: {e}")
             
         except Exception as e:
             logger.error(f"❌ Ошибка при отправке напоминания: {e}")
     
+    async def prebuild_deadline_report(self):
+        """Сборка отчёта за закрытую неделю сразу после дедлайна"""
+        try:
+            from reports import prebuild_week_report
+            
+            closed_dates = get_closed_week_dates()
+            week_range = get_week_range_display(closed_dates)
+            
+            loop = asyncio.get_running_loop()
+            path, matrix = await loop.run_in_executor(
+                None, prebuild_week_report, self.db, closed_dates, current_shard().registry.get_name
+            )
+            logger.info(f"✅ Отчёт за {week_range} собран: {path}")
+            
+            for admin_id in current_tenant().admin_ids:
+                await send_export_file(
+                    self.bot, self.db, admin_id, path,
+                    f"🔒 *Приём заказов закрыт*\n\n"
+                    f"📊 Отчёт за неделю `{week_range}` готов\n"
+                    f"🍽️ *Для кухни:* {matrix.format_day_totals()}\n"
+                    f"└ Всего обедов: {matrix.total()}\n"
+                    f"💾 Сохранён в папке {current_tenant().export_path}/"
+                )
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка при сборке отчёта на дедлайне: {e}")
+    
+    async def archive_old_weeks(self, now):
+        """Ночной перенос недель старше RETENTION_WEEKS в архивную БД"""
+        try:
+            monday = now.date() - timedelta(days=now.weekday())
+            cutoff = format_date_for_db(monday - timedelta(weeks=RETENTION_WEEKS))
+            
+            loop = asyncio.get_running_loop()
+            moved = await loop.run_in_executor(None, self.db.archive_orders_before, cutoff)
+            logger.info(f"🗄️ В архив перенесено заказов: {moved} (старше {cutoff})")
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка при переносе заказов в архив: {e}")
+    
+    async def refresh_rollups(self, now):
+        """Ночной пересчёт итогов за последние ROLLUP_REFRESH_WEEKS недель"""
+        try:
+            since = format_date_for_db(now.date() - timedelta(weeks=ROLLUP_REFRESH_WEEKS))
+            
+            loop = asyncio.get_running_loop()
+            rows = await loop.run_in_executor(None, self.db.refresh_rollups, since)
+            logger.info(f"📈 Итоги пересчитаны с {since}: строк итогов {rows}")
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка при пересчёте итогов: {e}")
+    
+    def due_jobs(self, tenant, now):
+        """Задачи компании, время которых сегодня уже наступило и которые
+           этот процесс ещё не отметил: [(задача, корутина-функция, аргументы)].
+           Срабатывают при now >= времени задачи, а не в ровную минуту:
+           тик цикла может опоздать, и задача не должна пропасть"""
+        deadline_day, deadline_hour, deadline_minute = tenant.deadline
+        current = (now.hour, now.minute)
+        jobs = []
+        
+        if now.weekday() == deadline_day:
+            # Волны напоминаний: каждая - до следующей волны или дедлайна
+            waves = [t for t in REMINDER_TIMES if t < (deadline_hour, deadline_minute)]
+            for wave, (hour, minute) in enumerate(waves):
+                until = waves[wave + 1] if wave + 1 < len(waves) else (deadline_hour, deadline_minute)
+                if (hour, minute) <= current < until:
+                    job = "reminder" if wave == 0 else f"reminder_{hour:02d}{minute:02d}"
+                    jobs.append((job, self.send_reminder, (wave,)))
+            
+            # После дедлайна: отчёт за закрытую неделю
+            if current >= (deadline_hour, deadline_minute):
+                jobs.append(("deadline_report", self.prebuild_deadline_report, ()))
+        
+        # Ночью пересчитываем итоги (до переноса в архив)
+        if current >= (2, 30):
+            jobs.append(("rollups", self.refresh_rollups, (now,)))
+        
+        # Ночью переносим старые недели в архив
+        if current >= (3, 0):
+            jobs.append(("retention", self.archive_old_weeks, (now,)))
+        
+        day = now.strftime("%Y-%m-%d")
+        return [item for item in jobs if (tenant.key, item[0], day) not in self._done]
+    
+    async def run_due_jobs(self, now, jobs):
+        """Задачи текущей компании из due_jobs"""
+        tenant = current_tenant()
+        day = now.strftime("%Y-%m-%d")
+        for job, action, args in jobs:
+            # Отметка в БД - одна на день и на все процессы
+            if self.claim(job, now):
+                await action(*args)
+            self._done.add((tenant.key, job, day))
+    
+    def _forget_old_runs(self, now):
+        day = now.strftime("%Y-%m-%d")
+        self._done = {item for item in self._done if item[2] == day}
+    
+    @staticmethod
+    def _until_next_minute():
+        now = datetime.now(MSK_TZ)
+        return max(1.0, 60 - now.second - now.microsecond / 1_000_000)
+    
     async def scheduler_loop(self):
         """Бесконечный цикл проверки времени"""
         self.is_running = True
@@ -61,14 +241,24 @@ class NotificationScheduler:
                 # Текущее время в Москве
                 now = datetime.now(MSK_TZ)
                 
-                # Проверяем: сегодня пятница и время 08:00
-                if now.weekday() == 4 and now.hour == 8 and now.minute == 0:
-                    await self.send_reminder()
-                    # Ждем минуту, чтобы не отправить дважды
-                    await asyncio.sleep(60)
+                # Задачи выполняет только лидер
+                if self.lease and not self.lease.is_leader:
+                    await asyncio.sleep(self._until_next_minute())
+                    continue
                 
-                # Проверяем каждую минуту
-                await asyncio.sleep(60)
+                self._forget_old_runs(now)
+                
+                # Задачи каждой компании - в её шарде и по её дедлайну.
+                # Срок проверяем без открытия шарда: иначе при компаний больше,
+                # чем TENANT_SHARDS_OPEN, LRU каждую минуту переоткрывал бы шарды
+                for key, tenant in directory.tenants.items():
+                    jobs = self.due_jobs(tenant, now)
+                    if jobs:
+                        with use_tenant(key):
+                            await self.run_due_jobs(now, jobs)
+                
+                # Следующая проверка - в начале следующей минуты
+                await asyncio.sleep(self._until_next_minute())
                 
             except Exception as e:
                 logger.error(f"❌ Ошибка в планировщике: {e}")
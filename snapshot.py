@@ -0,0 +1,125 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+
+from cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Меняется при несовместимом изменении формата снимка
+SNAPSHOT_VERSION = 3
+
+
+def _checksum(body):
+    """sha256 сериализованного содержимого снимка (bytes)"""
+    return hashlib.sha256(body).hexdigest()
+
+
+class StateSnapshot:
+    """Снимок горячего состояния в памяти для тёплого старта после деплоя.
+       Обычный JSON (не pickle): реестр сотрудников, подписчики и кэш заказов
+       открытых шардов, контексты недель для FSM заказа. Первая строка файла -
+       версия формата и контрольная сумма, вторая - содержимое; снимок с чужой
+       версией, битой суммой или от изменившейся с тех пор БД игнорируется -
+       данные читаются из БД.
+       file_id выгрузок не входят в снимок: они и так лежат в БД (export_files)."""
+
+    def __init__(self, path, directory, interval=300):
+        self.path = path
+        self.directory = directory
+        self.interval = interval
+        self.is_running = False
+
+        # Счётчики
+        self.saved_at = None
+        self.saves = 0
+        self.restored = False
+
+    def save(self):
+        """Пишет снимок атомарно (временный файл + rename). Возвращает True при успехе.
+           Из run() вызывается в потоке: сериализация кэша и checkpoint WAL
+           (file_stamp ждёт читателей отчёта) не держат цикл событий.
+           Содержимое сериализуется один раз: сумма считается по тем же байтам,
+           что пишутся в файл"""
+        payload = {
+            "created_at": time.time(),
+            "shards": self.directory.dump(),
+            "weeks": cache.dump(),
+        }
+        body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        header = json.dumps({"version": SNAPSHOT_VERSION, "checksum": _checksum(body)})
+        tmp_path = self.path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                f.write(header.encode("utf-8") + b"\n")
+                f.write(body)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.error(f"❌ Не удалось записать снимок {self.path}: {e}")
+            return False
+
+        self.saved_at = payload["created_at"]
+        self.saves += 1
+        logger.info(f"💾 Снимок состояния записан: шардов {len(payload['shards'])}")
+        return True
+
+    def read(self):
+        """Содержимое снимка после проверки версии и суммы или None"""
+        try:
+            with open(self.path, "rb") as f:
+                header_line, _, body = f.read().partition(b"\n")
+            header = json.loads(header_line)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Снимок {self.path} не читается: {e}")
+            return None
+
+        if not isinstance(header, dict) or header.get("version") != SNAPSHOT_VERSION:
+            logger.warning(f"⚠️ Снимок {self.path}: другая версия формата, пропускаем")
+            return None
+        if header.get("checksum") != _checksum(body):
+            logger.warning(f"⚠️ Снимок {self.path}: не сходится контрольная сумма, пропускаем")
+            return None
+        try:
+            payload = json.loads(body)
+        except ValueError as e:
+            logger.warning(f"⚠️ Снимок {self.path} не читается: {e}")
+            return None
+        return payload if isinstance(payload, dict) else None
+
+    def restore(self):
+        """Фаза старта, до directory.open(): отдаёт состояния шардам.
+           Шард применит своё состояние при открытии, если его БД не менялась"""
+        payload = self.read()
+        if payload is None:
+            return False
+        try:
+            cache.restore(payload["weeks"])
+            self.directory.restore(payload["shards"])
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning(f"⚠️ Снимок {self.path} повреждён: {e}")
+            self.directory.restore({})
+            return False
+
+        self.restored = True
+        age = time.time() - payload.get("created_at", 0)
+        logger.info(f"♨️ Снимок состояния загружен (возраст {age:.0f} с)")
+        return True
+
+    async def run(self):
+        """Пишем снимок каждые interval секунд (на случай падения без остановки)"""
+        self.is_running = True
+        while self.is_running:
+            await asyncio.sleep(self.interval)
+            if self.is_running:
+                await asyncio.get_running_loop().run_in_executor(None, self.save)
+
+    def stop(self):
+        """Остановить периодическую запись и записать снимок напоследок"""
+        self.is_running = False
+        return self.save()
@@ -0,0 +1,136 @@
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from fake_bot_api import FakeBotAPI
+
+# Модули проекта, время импорта которых показываем
+PROJECT_MODULES = [
+    "config", "database", "cache", "utils", "keyboards", "states",
+    "registry", "handlers", "scheduler", "bot",
+]
+
+# Сторонние библиотеки грузятся заранее: бюджет импорта - только на модули
+# проекта (один aiogram.types - это секунды, и они от проекта не зависят)
+THIRD_PARTY_MODULES = [
+    "aiogram", "aiogram.types", "aiogram.filters", "aiogram.fsm.context",
+    "aiogram.fsm.storage.memory", "aiogram.client.session.aiohttp",
+    "aiogram.webhook.aiohttp_server", "aiohttp.web", "pytz", "dotenv",
+]
+
+# Тяжёлые модули, которые не должны грузиться при старте бота
+LAZY_MODULES = ["openpyxl", "reports"]
+
+FAKE_TOKEN = "123456:startup-budget"
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def measure_imports():
+    """Время импорта модулей проекта (cumulative, мс) через python -X importtime.
+       Сторонние библиотеки к этому моменту уже импортированы (third_party, мс)"""
+    env = dict(os.environ, BOT_TOKEN=FAKE_TOKEN)
+    code = (
+        "import time; started = time.perf_counter(); "
+        f"import {', '.join(THIRD_PARTY_MODULES)}; "
+        "third_party = time.perf_counter() - started; "
+        "import sys, bot; "
+        f"print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules)); "
+        "print(third_party * 1000)"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        name = name.strip()
+        if name in PROJECT_MODULES and cumulative.strip().isdigit():
+            times[name] = int(cumulative) / 1000
+
+    lazy_line, third_party = result.stdout.rstrip("\n").split("\n")[-2:]
+    loaded_lazy = [m for m in lazy_line.split(",") if m]
+    return times, loaded_lazy, float(third_party)
+
+
+async def measure_first_get_updates(timeout):
+    """Время от запуска bot.py до первого getUpdates на локальном Bot API"""
+    api = FakeBotAPI()
+    url = await api.start()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(
+            os.environ,
+            BOT_TOKEN=FAKE_TOKEN,
+            TELEGRAM_API_URL=url,
+            DB_FILE=os.path.join(workdir, "orders.db"),
+            WORKERS="1",
+        )
+        started = time.perf_counter()
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, os.path.join(ROOT, "bot.py"),
+            cwd=workdir, env=env,
+            stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL
+        )
+        try:
+            while api.first_get_updates is None:
+                if time.perf_counter() - started > timeout or process.returncode is not None:
+                    return None
+                await asyncio.sleep(0.01)
+            return api.first_get_updates - started
+        finally:
+            process.terminate()
+            await process.wait()
+            await api.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка бюджета времени старта бота")
+    parser.add_argument("--import-budget", type=float, default=0.25,
+                        help="бюджет на import bot без сторонних библиотек, с "
+                             "(по умолчанию 0.25: замер ~0.05-0.07 с и запас)")
+    parser.add_argument("--first-update-budget", type=float, default=5.0,
+                        help="бюджет до первого getUpdates, с (по умолчанию 5.0)")
+    args = parser.parse_args()
+
+    failures = []
+
+    times, loaded_lazy, third_party = measure_imports()
+    print(f"📦 Сторонние библиотеки (вне бюджета): {third_party:8.1f} мс")
+    print("⏱️ Импорт модулей проекта (cumulative):")
+    for name in PROJECT_MODULES:
+        if name in times:
+            print(f"   {name:<12} {times[name]:8.1f} мс")
+
+    import_total = times.get("bot", 0) / 1000
+    if import_total > args.import_budget:
+        failures.append(f"import bot: {import_total:.2f} с > {args.import_budget:.2f} с")
+    if loaded_lazy:
+        failures.append(f"при старте загружены ленивые модули: {', '.join(loaded_lazy)}")
+
+    first_update = asyncio.run(measure_first_get_updates(args.first_update_budget * 2))
+    if first_update is None:
+        failures.append("бот не дошёл до getUpdates")
+    else:
+        print(f"🚀 До первого getUpdates: {first_update:.2f} с")
+        if first_update > args.first_update_budget:
+            failures.append(f"первый getUpdates: {first_update:.2f} с > {args.first_update_budget:.2f} с")
+
+    if failures:
+        print("❌ Бюджет старта превышен:")
+        for failure in failures:
+            print(f"   • {failure}")
+        sys.exit(1)
+
+    print("✅ Бюджет старта соблюдён")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,4 +4,13 @@ class TextOrderState(StatesGroup):
     """Текстовый заказ - только ввод чисел"""
     waiting_instructor = State()  # Ждём ФИО
     waiting_quantity = State()    # Ждём число (0,1,2)
+    waiting_confirm = State()     # Ждём подтверждения
+
+class InlineOrderState(StatesGroup):
+    """Заказ кнопками - вся неделя на одной клавиатуре"""
+    choosing_quantity = State()   # Ждём нажатий 0/1/2 и «Готово»
+
+class QuickOrderState(StatesGroup):
+    """Быстрый заказ одним сообщением"""
+    waiting_order = State()       # После /quick: ждём сообщение с заказом
     waiting_confirm = State()     # Ждём подтверждения
\ No newline at end of file
@@ -0,0 +1,62 @@
+import json
+import sqlite3
+
+from aiogram.exceptions import DataNotDictLikeError
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, StateType, StorageKey
+
+
+class SQLiteStorage(BaseStorage):
+    """FSM-хранилище в SQLite: общее состояние заказов для нескольких процессов бота"""
+    
+    def __init__(self, db_file="orders.db"):
+        self.db_file = db_file
+        self.key_builder = DefaultKeyBuilder(with_destiny=True)
+        
+        with sqlite3.connect(self.db_file) as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS fsm_states (
+                    key TEXT PRIMARY KEY,
+                    state TEXT,
+                    data TEXT NOT NULL DEFAULT '{}'
+                )
+            ''')
+            conn.commit()
+    
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        state = state.state if isinstance(state, State) else state
+        with sqlite3.connect(self.db_file) as conn:
+            conn.execute('''
+                INSERT INTO fsm_states (key, state) VALUES (?, ?)
+                ON CONFLICT(key) DO UPDATE SET state = excluded.state
+            ''', (self.key_builder.build(key), state))
+            conn.commit()
+    
+    async def get_state(self, key: StorageKey) -> str | None:
+        with sqlite3.connect(self.db_file) as conn:
+            row = conn.execute(
+                'SELECT state FROM fsm_states WHERE key = ?', (self.key_builder.build(key),)
+            ).fetchone()
+            return row[0] if row else None
+    
+    async def set_data(self, key: StorageKey, data) -> None:
+        if not isinstance(data, dict):
+            raise DataNotDictLikeError(
+                f"Data must be a dict or dict-like object, got {type(data).__name__}"
+            )
+        with sqlite3.connect(self.db_file) as conn:
+            conn.execute('''
+                INSERT INTO fsm_states (key, data) VALUES (?, ?)
+                ON CONFLICT(key) DO UPDATE SET data = excluded.data
+            ''', (self.key_builder.build(key), json.dumps(data, ensure_ascii=False)))
+            conn.commit()
+    
+    async def get_data(self, key: StorageKey) -> dict:
+        with sqlite3.connect(self.db_file) as conn:
+            row = conn.execute(
+                'SELECT data FROM fsm_states WHERE key = ?', (self.key_builder.build(key),)
+            ).fetchone()
+            return json.loads(row[0]) if row else {}
+    
+    async def close(self) -> None:
+        pass
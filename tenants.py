@@ -0,0 +1,352 @@
+import contextvars
+import json
+import logging
+import os
+import secrets
+import sqlite3
+import threading
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+
+from config import (
+    ADMIN_ID, COMPANY_NAME, DB_FILE, ARCHIVE_DB_FILE, EXPORT_PATH, WORKERS,
+    DEADLINE_DAY, DEADLINE_HOUR, DEADLINE_MINUTE,
+    TENANTS_FILE, TENANT_DIRECTORY_DB, TENANT_SHARDS_OPEN
+)
+from database import Database
+from orders_cache import OrdersCache
+from registry import EmployeeRegistry, SubscriberSet
+
+logger = logging.getLogger(__name__)
+
+
+class Tenant:
+    """Компания: своя БД (шард), администраторы, дедлайн и папка выгрузок"""
+    __slots__ = ("key", "name", "db_file", "archive_file", "admin_ids", "export_path", "deadline")
+
+    def __init__(self, key, name, db_file, admin_ids, export_path,
+                 deadline=(DEADLINE_DAY, DEADLINE_HOUR, DEADLINE_MINUTE), archive_file=None):
+        self.key = key
+        self.name = name
+        self.db_file = db_file
+        self.archive_file = archive_file
+        self.admin_ids = frozenset(admin_ids)
+        self.export_path = export_path
+        self.deadline = deadline  # (день недели, час, минута)
+
+    @classmethod
+    def from_dict(cls, data):
+        """Компания из TENANTS_FILE; не указанное берётся из config.py"""
+        key = data["key"]
+        deadline = data.get("deadline", {})
+        return cls(
+            key=key,
+            name=data.get("name", key),
+            db_file=data.get("db_file", os.path.join("data", f"{key}.db")),
+            archive_file=data.get("archive_file"),
+            admin_ids=data.get("admins", []),
+            export_path=data.get("export_path", os.path.join(EXPORT_PATH, key)),
+            deadline=(
+                deadline.get("day", DEADLINE_DAY),
+                deadline.get("hour", DEADLINE_HOUR),
+                deadline.get("minute", DEADLINE_MINUTE),
+            ),
+        )
+
+
+class TenantShard:
+    """Открытый шард компании: БД и данные, загруженные в память"""
+
+    def __init__(self, tenant):
+        self.tenant = tenant
+        self.db = Database(tenant.db_file, archive_file=tenant.archive_file)
+        self.registry = EmployeeRegistry(self.db)
+        self.subscribers = SubscriberSet(self.db, shared=WORKERS > 1)
+        # Заказы пишут и другие процессы - кэш только при одном процессе
+        self.orders = OrdersCache(self.db, enabled=WORKERS == 1)
+
+    def open(self, state=None):
+        """state - состояние шарда из снимка (snapshot.py). Оно берётся
+           вместо чтения БД, только если файлы БД с тех пор не менялись"""
+        directory = os.path.dirname(self.tenant.db_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        stamp = self.db.file_stamp()
+        self.db.init_db()
+        if state is not None and stamp is not None and state.get("db_stamp") == stamp and not self.subscribers.shared:
+            try:
+                self.registry.restore(state["employees"])
+                self.subscribers.restore(state["subscribers"])
+                self.orders.restore(state["orders"])
+            except (KeyError, TypeError, ValueError) as e:
+                logger.warning(f"⚠️ Шард {self.tenant.key}: снимок повреждён ({e}), читаем БД")
+                self.orders.clear()
+            else:
+                logger.info(f"♨️ Шард {self.tenant.key}: тёплый старт из снимка")
+                return True
+        self.registry.load()
+        self.subscribers.load()
+        return False
+
+    def dump(self):
+        """Состояние шарда для снимка; None - шард в процессе записи"""
+        stamp = self.db.file_stamp()
+        orders = self.orders.dump()
+        if orders is None or self.db.file_stamp() != stamp:
+            return None
+        return {
+            "db_stamp": stamp,
+            "employees": self.registry.dump(),
+            "subscribers": self.subscribers.dump(),
+            "orders": orders,
+        }
+
+
+class TenantDirectory:
+    """Компании и привязка к ним пользователей.
+       Одна компания (без TENANTS_FILE) - все пользователи в ней, как раньше.
+       Несколько - пользователь попадает в компанию по ссылке-приглашению
+       (/start <токен>): у каждой компании свой случайный токен, не равный
+       её ключу. Токены и привязки хранятся в TENANT_DIRECTORY_DB, привязки кэшируются.
+       Открытые шарды держатся в LRU не больше max_open штук; шард, с которым
+       сейчас идёт работа (use_tenant), закреплён и не закрывается."""
+
+    def __init__(self, tenants, directory_file=None, max_open=16, cache_size=10000):
+        self.tenants = OrderedDict((tenant.key, tenant) for tenant in tenants)
+        self.default = next(iter(self.tenants.values()))
+        self.multi = len(self.tenants) > 1
+        self.directory_file = directory_file
+        self.max_open = max_open
+        self.cache_size = cache_size
+
+        # Администраторы привязаны к своей компании без приглашения
+        self._admin_tenants = {
+            admin_id: tenant.key for tenant in tenants for admin_id in tenant.admin_ids
+        }
+        self._routes = OrderedDict()  # user_id -> ключ компании (None - не привязан)
+        self._shards = OrderedDict()  # ключ -> TenantShard
+        self._pins = Counter()  # ключ -> сколько блоков use_tenant с ним работают
+        self._invites = {}  # токен приглашения -> ключ компании
+        self._invite_tokens = {}  # ключ компании -> токен приглашения
+        self._lock = threading.Lock()
+        # Состояния шардов из снимка, ещё не открытых (см. restore)
+        self._warm_states = {}
+
+        self.route_hits = 0
+        self.route_misses = 0
+
+    @classmethod
+    def from_config(cls):
+        if not TENANTS_FILE:
+            return cls([Tenant(
+                key="default",
+                name=COMPANY_NAME,
+                db_file=DB_FILE,
+                archive_file=ARCHIVE_DB_FILE or None,
+                admin_ids=[ADMIN_ID] if ADMIN_ID else [],
+                export_path=EXPORT_PATH,
+            )], max_open=1)
+
+        with open(TENANTS_FILE, encoding="utf-8") as f:
+            data = json.load(f)
+        tenants = [Tenant.from_dict(item) for item in data["tenants"]]
+        return cls(tenants, directory_file=TENANT_DIRECTORY_DB, max_open=TENANT_SHARDS_OPEN)
+
+    def open(self):
+        """Фаза старта: таблицы привязок и приглашений, шард компании
+           по умолчанию (он закреплён - к нему обращаются вне use_tenant)"""
+        if self.multi:
+            os.makedirs(os.path.dirname(self.directory_file) or ".", exist_ok=True)
+            with sqlite3.connect(self.directory_file) as conn:
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS tenant_users (
+                        user_id INTEGER PRIMARY KEY,
+                        tenant TEXT NOT NULL,
+                        joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                ''')
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS tenant_invites (
+                        tenant TEXT PRIMARY KEY,
+                        token TEXT NOT NULL UNIQUE,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                ''')
+                # Новой компании - новый случайный токен, у остальных он не меняется.
+                # INSERT OR IGNORE: все процессы-воркеры получат один и тот же токен
+                conn.executemany(
+                    'INSERT OR IGNORE INTO tenant_invites (tenant, token) VALUES (?, ?)',
+                    [(key, secrets.token_urlsafe(16)) for key in self.tenants]
+                )
+                conn.commit()
+                for key, token in conn.execute('SELECT tenant, token FROM tenant_invites'):
+                    if key in self.tenants:
+                        self._invites[token] = key
+                        self._invite_tokens[key] = token
+        self.pin(self.default.key)
+
+    # ---------- маршрутизация ----------
+
+    def route(self, user_id):
+        """Ключ компании пользователя или None, если он ни к одной не привязан"""
+        if not self.multi:
+            return self.default.key
+        if user_id in self._admin_tenants:
+            return self._admin_tenants[user_id]
+
+        if user_id in self._routes:
+            self.route_hits += 1
+            self._routes.move_to_end(user_id)
+            return self._routes[user_id]
+
+        self.route_misses += 1
+        with sqlite3.connect(self.directory_file) as conn:
+            row = conn.execute('SELECT tenant FROM tenant_users WHERE user_id = ?', (user_id,)).fetchone()
+        key = row[0] if row and row[0] in self.tenants else None
+        self._remember(user_id, key)
+        return key
+
+    def invite_tenant(self, token):
+        """Ключ компании по токену приглашения или None"""
+        return self._invites.get(token)
+
+    def invite_token(self, key):
+        """Токен ссылки-приглашения компании (/start <токен>)"""
+        return self._invite_tokens.get(key)
+
+    def assign(self, user_id, key):
+        """Привязывает пользователя к компании (по приглашению)"""
+        with sqlite3.connect(self.directory_file) as conn:
+            conn.execute('''
+                INSERT INTO tenant_users (user_id, tenant) VALUES (?, ?)
+                ON CONFLICT(user_id) DO UPDATE SET tenant = excluded.tenant
+            ''', (user_id, key))
+            conn.commit()
+        self._remember(user_id, key)
+
+    def _remember(self, user_id, key):
+        self._routes[user_id] = key
+        self._routes.move_to_end(user_id)
+        if len(self._routes) > self.cache_size:
+            self._routes.popitem(last=False)
+
+    # ---------- шарды ----------
+
+    def shard(self, key):
+        """Шард компании; открывает его при первом обращении"""
+        with self._lock:
+            return self._get_shard(key)
+
+    def pin(self, key):
+        """Шард компании, закреплённый до unpin: LRU его не закроет,
+           пока с ним работает обновление или задача"""
+        with self._lock:
+            return self._get_shard(key, pin=True)
+
+    def unpin(self, key):
+        with self._lock:
+            self._pins[key] -= 1
+            if self._pins[key] <= 0:
+                del self._pins[key]
+            self._evict()
+
+    def _get_shard(self, key, pin=False):
+        shard = self._shards.get(key)
+        if shard is None:
+            shard = TenantShard(self.tenants[key])
+            shard.open(self._warm_states.pop(key, None))
+            self._shards[key] = shard
+        self._shards.move_to_end(key)
+        if pin:
+            self._pins[key] += 1
+        self._evict()
+        return shard
+
+    def _evict(self):
+        # Закрываем самые давние незакреплённые шарды. Если закреплены все,
+        # открытых временно больше max_open - лишние закроются при unpin
+        excess = len(self._shards) - self.max_open
+        if excess <= 0:
+            return
+        idle = [key for key in self._shards if not self._pins[key]][:excess]
+        for key in idle:
+            del self._shards[key]
+            logger.info(f"🗃️ Шард {key} закрыт (LRU, открыто {self.max_open})")
+
+    def restore(self, states):
+        """Состояния шардов из снимка: применяются при открытии шарда"""
+        self._warm_states = {key: state for key, state in states.items() if key in self.tenants}
+
+    def dump(self):
+        """Состояния открытых шардов для снимка"""
+        with self._lock:
+            shards = list(self._shards.values())
+        states = {shard.tenant.key: shard.dump() for shard in shards}
+        return {key: state for key, state in states.items() if state is not None}
+
+    def stats(self):
+        return {
+            'tenants': len(self.tenants),
+            'open_shards': len(self._shards),
+            'pinned_shards': len(self._pins),
+            'routes_cached': len(self._routes),
+            'route_hits': self.route_hits,
+            'route_misses': self.route_misses,
+        }
+
+
+directory = TenantDirectory.from_config()
+
+# Шард компании, которую обслуживает текущее обновление или задача
+_current_shard = contextvars.ContextVar("tenant_shard", default=None)
+
+
+def current_shard():
+    return _current_shard.get() or directory.shard(directory.default.key)
+
+
+def current_tenant():
+    return current_shard().tenant
+
+
+def is_admin(user_id):
+    """Администратор ли пользователь в текущей компании"""
+    return user_id in current_tenant().admin_ids
+
+
+@contextmanager
+def use_tenant(key):
+    """Делает шард компании key текущим внутри блока.
+       Шард закреплён на время блока: LRU не закроет его под обработчиком,
+       и второй экземпляр над той же БД не появится"""
+    token = _current_shard.set(directory.pin(key))
+    try:
+        yield current_shard()
+    finally:
+        _current_shard.reset(token)
+        directory.unpin(key)
+
+
+class ShardAttribute:
+    """db / registry / subscribers текущей компании.
+       Модули обращаются к ним как к обычным объектам, а объект
+       выбирается по компании обновления (см. TenantMiddleware)."""
+    __slots__ = ("_name",)
+
+    def __init__(self, name):
+        self._name = name
+
+    def _target(self):
+        return getattr(current_shard(), self._name)
+
+    def __getattr__(self, attr):
+        return getattr(self._target(), attr)
+
+    def __iter__(self):
+        return iter(self._target())
+
+    def __contains__(self, item):
+        return item in self._target()
+
+    def __len__(self):
+        return len(self._target())
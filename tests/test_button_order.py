@@ -0,0 +1,96 @@
+"""Заказ кнопками: вся неделя на одной клавиатуре, правка сообщения только
+   по «Готово» и при подтверждении. Бот (bot.py) против fake_bot_api"""
+import asyncio
+import os
+import sqlite3
+import sys
+import time
+from contextlib import closing
+
+from fake_bot_api import FakeBotAPI
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+USER_ID = 4242
+EMPTY_USER_ID = 4343
+
+
+async def wait_calls(api, method, count, timeout=10):
+    deadline = time.monotonic() + timeout
+    while api.calls[method] < count:
+        assert time.monotonic() < deadline, f"{method}: {api.calls[method]} из {count}"
+        await asyncio.sleep(0.01)
+
+
+def test_week_on_one_keyboard(tmp_path):
+    db_file = str(tmp_path / "orders.db")
+
+    async def scenario():
+        api = FakeBotAPI()
+        url = await api.start()
+        env = dict(
+            os.environ, BOT_TOKEN="123456:TEST", TELEGRAM_API_URL=url, DB_FILE=db_file, WORKERS="1",
+            THROTTLE_RATE="1000", THROTTLE_BURST="1000",
+            THROTTLE_EXPENSIVE_RATE="1000", THROTTLE_EXPENSIVE_BURST="1000",
+        )
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, os.path.join(ROOT, "bot.py"), cwd=str(tmp_path), env=env,
+            stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL,
+        )
+        try:
+            while api.first_get_updates is None:
+                await asyncio.sleep(0.05)
+            before = dict(api.calls)
+
+            api.push_message(USER_ID, "🔘 Заказ кнопками")
+            await api.wait_reply(USER_ID)
+            api.push_message(USER_ID, "Иванов Иван")
+            _, _, keyboard = await api.wait_reply(USER_ID)
+            assert len(keyboard["reply_markup"]["inline_keyboard"]) == 8
+
+            answered = api.calls["answerCallbackQuery"]
+            for day, qty in enumerate([1, 2, 0, 1, 1, 0, 0]):
+                api.push_callback(USER_ID, keyboard["message_id"], f"qty:{day}:{qty}")
+                answered += 1
+                await wait_calls(api, "answerCallbackQuery", answered)
+
+            api.push_callback(USER_ID, keyboard["message_id"], "qty:done")
+            _, method, summary = await api.wait_reply(USER_ID)
+            assert method == "editMessageText" and "Итого:* 4 дней, 5 обедов" in summary["text"]
+            api.push_callback(USER_ID, keyboard["message_id"], "confirm_yes")
+            await api.wait_reply(USER_ID)
+            await wait_calls(api, "answerCallbackQuery", answered + 2)
+            await asyncio.sleep(0.2)
+            calls = {
+                method: count - before.get(method, 0)
+                for method, count in api.calls.items()
+                if method != "getUpdates" and count != before.get(method, 0)
+            }
+
+            # Пустой заказ: «Готово» без отметок и «Да» - без отметки подтверждения
+            api.push_message(EMPTY_USER_ID, "🔘 Заказ кнопками")
+            await api.wait_reply(EMPTY_USER_ID)
+            api.push_message(EMPTY_USER_ID, "Петров Пётр")
+            _, _, keyboard = await api.wait_reply(EMPTY_USER_ID)
+            api.push_callback(EMPTY_USER_ID, keyboard["message_id"], "qty:done")
+            await api.wait_reply(EMPTY_USER_ID)
+            answered = api.calls["answerCallbackQuery"]
+            api.push_callback(EMPTY_USER_ID, keyboard["message_id"], "confirm_yes")
+            await wait_calls(api, "answerCallbackQuery", answered + 1)
+            return calls
+        finally:
+            process.terminate()
+            await process.wait()
+            await api.stop()
+
+    calls = asyncio.run(scenario())
+
+    # 14 вызовов Bot API; текстовый заказ и прежний заказ кнопками (правка на каждый день) - по 19
+    assert calls == {"sendMessage": 3, "answerCallbackQuery": 9, "editMessageText": 2}, calls
+    with closing(sqlite3.connect(db_file)) as conn:
+        rows = conn.execute(
+            "SELECT quantity FROM orders WHERE user_id = ? AND instructor_name = ? ORDER BY date",
+            (USER_ID, "Иванов Иван")
+        ).fetchall()
+        confirmed = conn.execute("SELECT chat_id FROM order_confirmations").fetchall()
+    assert [qty for qty, in rows if qty] == [1, 2, 1, 1]
+    assert confirmed == [(USER_ID,)]
@@ -0,0 +1,42 @@
+"""Повторное подтверждение заказа в другом процессе не сохраняет его второй раз"""
+import pytest
+
+from database import Database
+from idempotency import RecentConfirmations
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = Database(str(tmp_path / "orders.db"))
+    db.init_db()
+    return db
+
+
+def test_duplicate_in_other_worker(db):
+    first, second = RecentConfirmations(store=db), RecentConfirmations(store=db)
+
+    assert first.claim(1, 10, "v1")
+    assert not second.claim(1, 10, "v1")
+    assert not first.claim(1, 10, "v1")
+    assert second.stats()['duplicates'] == 1
+
+    # Новая версия заказа в том же сообщении (после «Изменить») - сохраняется
+    assert second.claim(1, 10, "v2")
+
+
+def test_release_allows_retry(db):
+    first, second = RecentConfirmations(store=db), RecentConfirmations(store=db)
+
+    assert first.claim(1, 10, "v1")
+    first.release(1, 10)
+    assert second.claim(1, 10, "v1")
+
+
+def test_release_without_claim_keeps_counter(db):
+    confirmations = RecentConfirmations(store=db)
+
+    assert confirmations.claim(1, 10, "v1")
+    confirmations.release(1, 10)
+    confirmations.release(1, 10)
+    confirmations.release(2, 20)
+    assert confirmations.stats()['claims'] == 0
@@ -0,0 +1,14 @@
+"""Сценарий loadtest.py получает ответы на каждом шаге"""
+import asyncio
+
+import loadtest
+
+
+def test_scenario_gets_replies():
+    args = loadtest.build_parser().parse_args(["--users", "5", "--rounds", "2", "--timeout", "5"])
+    stats_list = asyncio.run(loadtest.main_async(args))
+
+    assert sum(stats.timeouts for stats in stats_list) == 0
+    for stats in stats_list:
+        assert len(stats.latencies["quick_order"]) == 2
+        assert len(stats.latencies["quick_yes"]) == 2
@@ -0,0 +1,22 @@
+"""Распознавание быстрого заказа без /quick"""
+from database import Database
+from utils import quick_order_instructors
+
+
+def test_every_line_must_match():
+    assert quick_order_instructors("Иванов Иван: 1 1 0 2 1 0 0\nПетрова  Мария: 1 1 1 1 1 0 0") == [
+        "Иванов Иван", "Петрова Мария"
+    ]
+    assert quick_order_instructors("Вопрос: когда дедлайн?") == []
+    assert quick_order_instructors("Привет!\nИванов Иван: 1 1 0 2 1 0 0") == []
+    assert quick_order_instructors("без двоеточия 1 1 0") == []
+
+
+def test_known_instructors_of_user(tmp_path):
+    db = Database(str(tmp_path / "orders.db"))
+    db.init_db()
+    db.save_week_orders(1, ["20261019"], {"Иванов Иван": [1]})
+
+    assert db.find_user_instructors(1, ["Иванов Иван", "Петрова Мария"]) == {"Иванов Иван"}
+    assert db.find_user_instructors(2, ["Иванов Иван"]) == set()
+    assert db.find_user_instructors(1, []) == set()
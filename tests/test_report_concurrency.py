@@ -0,0 +1,98 @@
+"""Запись заказов не должна ждать выгрузку отчёта (WAL + копия через backup API)"""
+import random
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+import pytest
+
+from database import Database
+
+WEEK = ["20261019", "20261020", "20261021", "20261022", "20261023"]
+
+# Запись недели заказа заметно быстрее; ожидание блокировки - 5 с (busy timeout)
+MAX_WRITE_SECONDS = 1.0
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = Database(str(tmp_path / "orders.db"))
+    db.init_db()
+    rng = random.Random(1)
+    with closing(sqlite3.connect(db.db_file)) as conn:
+        conn.executemany(
+            'INSERT INTO orders (user_id, instructor_name, date, quantity) VALUES (?, ?, ?, ?)',
+            [(rng.randrange(200), f"Инструктор {rng.randrange(20)}", rng.choice(WEEK), 1)
+             for _ in range(20000)]
+        )
+        conn.commit()
+    return db
+
+
+def timed_write(db, user_id=1):
+    started = time.perf_counter()
+    db.save_week_orders(user_id, WEEK, {"Инструктор 0": [1, 2, 0, 1, 1]})
+    return time.perf_counter() - started
+
+
+def open_report_read(db_file):
+    """Чтение отчёта посреди выборки: пока курсор не дочитан,
+       соединение держит блокировку (снимок) чтения"""
+    cursor = sqlite3.connect(db_file).execute('SELECT * FROM orders')
+    cursor.fetchmany(100)
+    return cursor
+
+
+def test_write_during_open_report_read(db):
+    reader = open_report_read(db.db_file)
+    try:
+        assert timed_write(db) < MAX_WRITE_SECONDS
+    finally:
+        reader.connection.close()
+    assert db.get_user_week_orders(1, WEEK[0], WEEK[-1])
+
+
+def test_rollback_journal_blocks_write(db):
+    """Проверка самого теста: без WAL та же запись ждёт читателя"""
+    conn = sqlite3.connect(db.db_file)
+    conn.execute('PRAGMA journal_mode = DELETE')
+    conn.close()
+    reader = open_report_read(db.db_file)
+    try:
+        with pytest.raises(sqlite3.OperationalError, match="locked"):
+            timed_write(db)
+    finally:
+        reader.connection.close()
+
+
+def test_writes_during_concurrent_exports(db, tmp_path):
+    """Выгрузки в цикле (живая БД и копия через backup API) и запись заказов"""
+    stop = threading.Event()
+    errors = []
+
+    def export_loop(index):
+        copy_file = str(tmp_path / f"copy_{index}.db")
+        try:
+            while not stop.is_set():
+                if index % 2:
+                    db.backup_to(copy_file)
+                    Database(copy_file).get_orders_between(WEEK[0], WEEK[-1])
+                else:
+                    db.get_orders_between(WEEK[0], WEEK[-1])
+        except sqlite3.Error as e:
+            errors.append(e)
+
+    exporters = [threading.Thread(target=export_loop, args=(i,)) for i in range(2)]
+    for thread in exporters:
+        thread.start()
+    try:
+        time.sleep(0.2)
+        latencies = [timed_write(db, user_id) for user_id in range(30)]
+    finally:
+        stop.set()
+        for thread in exporters:
+            thread.join()
+
+    assert not errors
+    assert max(latencies) < MAX_WRITE_SECONDS
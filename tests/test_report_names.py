@@ -0,0 +1,48 @@
+"""Отчёт за неделю берёт ФИО сотрудников из реестра, а не JOIN с employees"""
+from datetime import datetime, timedelta
+
+from database import Database
+from matrix import WeekMatrix
+from registry import EmployeeRegistry
+
+MONDAY = datetime(2026, 10, 19)
+DATES = [MONDAY + timedelta(days=i) for i in range(7)]
+
+
+def test_week_rows_named_by_registry(tmp_path):
+    db = Database(str(tmp_path / "orders.db"))
+    db.init_db()
+    db.register_employee(1, "petrova", "Петрова Мария")
+    db.register_employee(2, "ivanov", "Иванов Иван")
+    db.save_week_orders(1, ["20261019", "20261020"], {"Сидоров": [1, 2]})
+    db.save_week_orders(2, ["20261019"], {"Сидоров": [1]})
+    db.save_week_orders(3, ["20261021"], {"Козлов": [1]})
+
+    rows = db.get_orders_between("20261019", "20261025")
+    assert all(len(row) == 4 for row in rows)
+
+    registry = EmployeeRegistry(db)
+    registry.load()
+    matrix = WeekMatrix.from_orders(rows, DATES)
+    grouped = list(matrix.grouped(registry.get_name))
+    assert [
+        (employee, [(instructor, list(matrix.row(index))) for instructor, index in instructors])
+        for employee, instructors in grouped
+    ] == [
+        ("Иванов Иван", [("Сидоров", [1, 0, 0, 0, 0, 0, 0])]),
+        ("Неизвестно", [("Козлов", [0, 0, 1, 0, 0, 0, 0])]),
+        ("Петрова Мария", [("Сидоров", [1, 2, 0, 0, 0, 0, 0])]),
+    ]
+
+
+def test_row_and_grand_totals():
+    matrix = WeekMatrix.from_orders([
+        (1, "Сидоров", "20261019", 1),
+        (1, "Сидоров", "20261020", 2),
+        (1, "Козлов", "20261025", 2),
+        (2, "Сидоров", "20261019", 1),
+    ], DATES)
+
+    assert list(matrix.row_totals()) == [3, 2, 1]
+    assert matrix.day_totals() == [2, 2, 0, 0, 0, 0, 2]
+    assert matrix.total() == sum(matrix.row_totals()) == 6
@@ -0,0 +1,47 @@
+"""Перенос старых недель в архив возвращает место файлу БД"""
+import sqlite3
+from contextlib import closing
+
+from database import Database
+
+
+def pragma(db_file, name):
+    with closing(sqlite3.connect(db_file)) as conn:
+        return conn.execute(f'PRAGMA {name}').fetchone()[0]
+
+
+def test_archive_frees_pages(tmp_path):
+    db = Database(str(tmp_path / "orders.db"))
+    db.init_db()
+    with closing(sqlite3.connect(db.db_file)) as conn:
+        conn.executemany(
+            'INSERT INTO orders (user_id, instructor_name, date, quantity) VALUES (?, ?, ?, 1)',
+            [(i, "Инструктор " * 5, f"2025{i % 12 + 1:02d}10") for i in range(30000)]
+        )
+        conn.commit()
+    pages = pragma(db.db_file, "page_count")
+
+    moved = db.archive_orders_before("20251001")
+
+    assert moved == 22500
+    assert pragma(db.db_file, "freelist_count") == 0
+    assert pragma(db.db_file, "page_count") < pages / 2
+    with closing(sqlite3.connect(db.archive_file)) as conn:
+        assert conn.execute('SELECT COUNT(*) FROM orders').fetchone()[0] == moved
+
+
+def test_batch_left_in_both_files_counted_once(tmp_path):
+    """Сбой между фиксациями пачки: строки и в основной БД, и в архиве"""
+    db = Database(str(tmp_path / "orders.db"))
+    db.init_db()
+    db.save_week_orders(1, ["20250106", "20250107"], {"Иванов Иван": [1, 2]})
+    db.archive_orders_before("20250201")
+    with closing(sqlite3.connect(db.db_file)) as conn:
+        conn.execute(f"ATTACH DATABASE '{db.archive_file}' AS archive")
+        conn.execute('INSERT INTO main.orders SELECT * FROM archive.orders WHERE date = ?', ("20250106",))
+        conn.commit()
+
+    rows = db.get_orders_between("20250106", "20250112")
+    assert sorted(rows) == [(1, "Иванов Иван", "20250106", 1), (1, "Иванов Иван", "20250107", 2)]
+    db.refresh_rollups()
+    assert db.get_rollups("week", "total", "20250106", "20250106") == [("20250106", "", 3)]
@@ -0,0 +1,53 @@
+"""Снимок состояния: запись и тёплый старт, порча содержимого"""
+import asyncio
+
+from snapshot import StateSnapshot
+from tenants import Tenant, TenantDirectory
+
+
+def make_directory(tmp_path, snapshot_path=None):
+    """Справочник с одной компанией; снимок, как в bot.py, читается до open()"""
+    tenant = Tenant("main", "Тест", str(tmp_path / "main.db"), admin_ids=[], export_path=str(tmp_path))
+    directory = TenantDirectory([tenant], max_open=1)
+    if snapshot_path:
+        assert StateSnapshot(snapshot_path, directory).restore()
+    directory.open()
+    return directory
+
+
+def test_warm_start_from_saved_snapshot(tmp_path):
+    directory = make_directory(tmp_path)
+    shard = directory.shard("main")
+    shard.registry.register(1, "ivanov", "Иванов Иван")
+    shard.orders.save_week_orders(1, ["20261019"], {"Сидоров": [1]})
+    rows = shard.orders.get_orders_between("20261019", "20261025")
+    path = str(tmp_path / "state.json")
+
+    async def save_in_background():
+        snapshot = StateSnapshot(path, directory, interval=0.01)
+        task = asyncio.create_task(snapshot.run())
+        while not snapshot.saves:
+            await asyncio.sleep(0.01)
+        snapshot.is_running = False
+        await task
+
+    asyncio.run(save_in_background())
+
+    restarted = make_directory(tmp_path, path)
+    shard = restarted.shard("main")
+    assert shard.registry.dump() == [[1, "ivanov", "Иванов Иван"]]
+    # Кэш заказов есть только после тёплого старта
+    assert [entry[1] for entry in shard.orders.dump()] == [[list(row) for row in rows]]
+
+
+def test_corrupted_body_is_ignored(tmp_path):
+    directory = make_directory(tmp_path)
+    path = tmp_path / "state.json"
+    snapshot = StateSnapshot(str(path), directory)
+    assert snapshot.save()
+
+    data = path.read_bytes()
+    path.write_bytes(data.replace(b'"shards"', b'"shardz"'))
+    assert snapshot.read() is None
+    path.write_bytes(data)
+    assert snapshot.read() is not None
@@ -0,0 +1,210 @@
+"""Несколько процессов бота (webhook, SO_REUSEPORT) с общей SQLite:
+   каждое обновление обрабатывается один раз, напоминание уходит один раз,
+   а пропускная способность растёт с числом воркеров (если есть ядра).
+   Бот запускается как есть (bot.py) против локального fake_bot_api."""
+import asyncio
+import json
+import os
+import signal
+import socket
+import sqlite3
+import sys
+import time
+from contextlib import closing
+from datetime import datetime
+
+import pytest
+import pytz
+
+from database import Database
+from fake_bot_api import FakeBotAPI
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MSK_TZ = pytz.timezone('Europe/Moscow')
+
+SUBSCRIBERS = list(range(1001, 1021))
+STARTUP_TIMEOUT = 60
+
+
+def free_port():
+    with closing(socket.socket()) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def prepare_tenant(tmp_path):
+    """Компания с дедлайном сегодня в 23:59 и подписчиками без заказов"""
+    db_file = str(tmp_path / "data" / "main.db")
+    os.makedirs(os.path.dirname(db_file))
+    db = Database(db_file)
+    db.init_db()
+    for user_id in SUBSCRIBERS:
+        db.register_employee(user_id, f"user{user_id}", f"User{user_id}")
+        db.subscribe_user(user_id)
+
+    tenants_file = tmp_path / "tenants.json"
+    tenants_file.write_text(json.dumps({"tenants": [{
+        "key": "main",
+        "name": "Тест",
+        "db_file": db_file,
+        "admins": [],
+        "deadline": {"day": datetime.now(MSK_TZ).weekday(), "hour": 23, "minute": 59},
+    }]}), encoding="utf-8")
+    return db_file, str(tenants_file)
+
+
+class BotProcess:
+    """bot.py с WORKERS воркерами; ждёт, пока все воркеры сообщат о запуске"""
+
+    def __init__(self, tmp_path, api, workers):
+        self.tmp_path = tmp_path
+        self.api = api
+        self.workers = workers
+        self.process = None
+        self.log = []
+        self._reader = None
+
+    async def start(self):
+        db_file, tenants_file = prepare_tenant(self.tmp_path)
+        port = free_port()
+        env = dict(
+            os.environ,
+            BOT_TOKEN="123456:TEST",
+            TELEGRAM_API_URL=self.api.url,
+            WORKERS=str(self.workers),
+            WEBHOOK_URL=f"http://127.0.0.1:{port}/webhook",
+            WEBHOOK_HOST="127.0.0.1",
+            WEBHOOK_PORT=str(port),
+            DB_FILE=db_file,
+            TENANTS_FILE=tenants_file,
+            REMINDER_WAVES="00:00",
+            LOG_FORMAT="json",
+        )
+        self.db_file = db_file
+        self.process = await asyncio.create_subprocess_exec(
+            sys.executable, os.path.join(ROOT, "bot.py"),
+            cwd=str(self.tmp_path), env=env,
+            stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE,
+        )
+        started = asyncio.Event()
+        self._reader = asyncio.create_task(self._read_log(started))
+        try:
+            await asyncio.wait_for(started.wait(), STARTUP_TIMEOUT)
+        except asyncio.TimeoutError:
+            await self.stop()
+            pytest.fail("воркеры не запустились:\n" + "\n".join(self.log[-30:]))
+
+    async def _read_log(self, started):
+        ready = 0
+        async for line in self.process.stderr:
+            line = line.decode("utf-8", "replace").rstrip()
+            self.log.append(line)
+            if "🧩 Воркер" in line:
+                ready += 1
+                if ready == self.workers:
+                    started.set()
+
+    async def stop(self):
+        if self.process.returncode is None:
+            self.process.send_signal(signal.SIGINT)
+            try:
+                await asyncio.wait_for(self.process.wait(), 15)
+            except asyncio.TimeoutError:
+                self.process.kill()
+                await self.process.wait()
+        if self._reader:
+            await self._reader
+
+
+async def collect_replies(api, user_ids, timeout):
+    """Ответы бота пользователям, пришедшие за timeout секунд (общий срок)"""
+    replies = {user_id: [] for user_id in user_ids}
+    deadline = time.monotonic() + timeout
+    for user_id in user_ids:
+        while True:
+            try:
+                _, _, message = await api.wait_reply(user_id, timeout=max(0.01, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                break
+            replies[user_id].append(message.get("text", ""))
+    return replies
+
+
+async def start_round(api, user_ids):
+    """Каждый пользователь шлёт /start (один раз: повтор подряд отбросил бы
+       ThrottlingMiddleware). Возвращает время до последнего ответа"""
+    started = time.perf_counter()
+    for user_id in user_ids:
+        api.push_message(user_id, "/start")
+    for user_id in user_ids:
+        await api.wait_reply(user_id, timeout=60)
+    return time.perf_counter() - started
+
+
+@pytest.fixture
+def msk_day_open():
+    if datetime.now(MSK_TZ).strftime("%H:%M") >= "23:58":
+        pytest.skip("до дедлайна 23:59 меньше двух минут - окно напоминания закрывается")
+
+
+def test_reminder_sent_once(tmp_path, msk_day_open):
+    async def scenario():
+        api = FakeBotAPI()
+        await api.start()
+        bot = BotProcess(tmp_path, api, workers=3)
+        try:
+            await bot.start()
+            # Первое напоминание каждому, затем ждём: не придёт ли второе
+            replies = {}
+            for user_id in SUBSCRIBERS:
+                _, _, message = await api.wait_reply(user_id, timeout=30)
+                replies[user_id] = [message.get("text", "")]
+            await asyncio.sleep(3)
+            for user_id, texts in (await collect_replies(api, SUBSCRIBERS, timeout=1)).items():
+                replies[user_id] += texts
+
+            # Каждое обновление - ровно один ответ, в каком бы воркере оно ни оказалось
+            users = range(5000, 5060)
+            await start_round(api, users)
+            extra = await collect_replies(api, users, timeout=2)
+        finally:
+            await bot.stop()
+            await api.stop()
+        return replies, extra, bot
+
+    replies, extra, bot = asyncio.run(scenario())
+
+    reminders = {user_id: [text for text in texts if "НАПОМИНАНИЕ" in text] for user_id, texts in replies.items()}
+    assert all(len(texts) == 1 for texts in reminders.values()), reminders
+    with closing(sqlite3.connect(bot.db_file)) as conn:
+        runs = conn.execute("SELECT COUNT(*) FROM job_runs WHERE job = 'reminder'").fetchone()[0]
+    assert runs == 1
+
+    assert not any(extra.values()), extra
+
+
+def test_throughput_scales_with_workers(tmp_path):
+    """1 воркер против 2 (оба webhook). На одном ядре второй воркер ускорить
+       не может - там проверяем только, что он не роняет пропускную способность
+       вдвое (общая SQLite; на одном ядре отношение гуляет 0.6-1.0)"""
+    async def measure(workers):
+        api = FakeBotAPI()
+        await api.start()
+        bot = BotProcess(tmp_path / f"w{workers}", api, workers=workers)
+        os.makedirs(bot.tmp_path)
+        try:
+            await bot.start()
+            await start_round(api, range(5000, 5020))  # прогрев
+            users = range(6000, 6600)
+            elapsed = await start_round(api, users)
+            extra = await collect_replies(api, users, timeout=1)
+        finally:
+            await bot.stop()
+            await api.stop()
+        assert not any(extra.values())
+        return len(users) / elapsed
+
+    one = asyncio.run(measure(1))
+    two = asyncio.run(measure(2))
+    ratio = 1.3 if (os.cpu_count() or 1) >= 2 else 0.5
+    assert two > one * ratio, f"1 воркер: {one:.0f}/с, 2 воркера: {two:.0f}/с"
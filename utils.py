@@ -1,20 +1,22 @@
 from datetime import datetime, timedelta
-import openpyxl
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-from openpyxl.utils import get_column_letter
+import logging
 import os
-import shutil
-from config import WEEKDAYS, COMPANY_NAME, EXPORT_PATH
+import re
+from aiogram.types import FSInputFile
+from aiogram.exceptions import TelegramBadRequest
+from tenants import current_tenant
+
+logger = logging.getLogger(__name__)
 
-# Константы дедлайна
-DEADLINE_DAY = 4  # Пятница
-DEADLINE_HOUR = 16
-DEADLINE_MINUTE = 0
 
 # ==================== ДАТЫ И ДЕДЛАЙНЫ ====================
 
+DEADLINE_DAY_NAMES = ["понедельник", "вторник", "среда", "четверг", "пятница", "суббота", "воскресенье"]
+
+
 def get_target_week_dates():
-    """Определяет целевую неделю для заказа"""
+    """Определяет целевую неделю для заказа (по дедлайну текущей компании)"""
+    deadline_day, deadline_hour, deadline_minute = current_tenant().deadline
     now = datetime.now()
     current_weekday = now.weekday()
     current_hour = now.hour
@@ -23,10 +25,10 @@ def get_target_week_dates():
     # Проверка дедлайна
     is_after_deadline = False
     
-    if current_weekday > DEADLINE_DAY:
+    if current_weekday > deadline_day:
         is_after_deadline = True
-    elif current_weekday == DEADLINE_DAY:
-        if current_hour > DEADLINE_HOUR or (current_hour == DEADLINE_HOUR and current_minute >= DEADLINE_MINUTE):
+    elif current_weekday == deadline_day:
+        if current_hour > deadline_hour or (current_hour == deadline_hour and current_minute >= deadline_minute):
             is_after_deadline = True
     
     # Рассчитываем целевой понедельник
@@ -47,27 +49,36 @@ def get_target_week_dates():
     
     return dates, week_type, is_after_deadline
 
+
+def get_closed_week_dates():
+    """Неделя, приём заказов на которую закрылся на последнем дедлайне"""
+    target_dates, _, _ = get_target_week_dates()
+    return [d - timedelta(days=7) for d in target_dates]
+
+
 def get_deadline_status():
     """Возвращает статус дедлайна для отображения пользователю"""
+    deadline_day, deadline_hour, deadline_minute = current_tenant().deadline
+    deadline_time = f"{deadline_hour:02d}:{deadline_minute:02d}"
     now = datetime.now()
     weekday = now.weekday()
     hour = now.hour
     minute = now.minute
     
     # До пятницы
-    if weekday < DEADLINE_DAY:
-        days_left = DEADLINE_DAY - weekday
+    if weekday < deadline_day:
+        days_left = deadline_day - weekday
         if days_left == 1:
-            return f"⏳ Дедлайн: завтра до 16:00"
+            return f"⏳ Дедлайн: завтра до {deadline_time}"
         else:
-            return f"⏳ Дедлайн: пятница 16:00 (осталось {days_left} дн.)"
+            return f"⏳ Дедлайн: {DEADLINE_DAY_NAMES[deadline_day]} {deadline_time} (осталось {days_left} дн.)"
     
     # Пятница
-    elif weekday == DEADLINE_DAY:
-        if hour < DEADLINE_HOUR:
-            hours_left = DEADLINE_HOUR - hour - 1
+    elif weekday == deadline_day:
+        if hour < deadline_hour:
+            hours_left = deadline_hour - hour - 1
             minutes_left = 60 - minute
-            return f"⏳ Сегодня до 16:00 (осталось {hours_left} ч {minutes_left} мин)"
+            return f"⏳ Сегодня до {deadline_time} (осталось {hours_left} ч {minutes_left} мин)"
         else:
             return "🔓 Приём заказов на неделю через одну"
     
@@ -80,191 +91,139 @@ def format_date_for_db(date_obj):
     """Форматирование для БД"""
     return date_obj.strftime("%Y%m%d")
 
+
 def format_date_for_display(date_obj):
     """Форматирование для показа"""
     return date_obj.strftime("%d.%m.%Y")
 
+
 def get_week_range_display(dates):
     """Диапазон недели"""
     start = dates[0].strftime("%d.%m")
     end = dates[6].strftime("%d.%m.%Y")
     return f"{start} - {end}"
 
-# ==================== EXCEL ОТЧЁТЫ ====================
 
-def create_excel_report(all_orders, dates, save_copy=True):
-    """Создаёт Excel файл со всеми заказами.
-       Каждая неделя сохраняется на отдельном листе."""
-    
-    os.makedirs(EXPORT_PATH, exist_ok=True)
-    
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    filename = f"заказы_архив_{timestamp}.xlsx"
-    temp_path = os.path.join(EXPORT_PATH, f"temp_{filename}")
-    saved_path = os.path.join(EXPORT_PATH, filename)
-    
-    # Если файл уже существует - открываем его, иначе создаём новый
-    if os.path.exists(saved_path):
-        wb = openpyxl.load_workbook(saved_path)
-    else:
-        wb = openpyxl.Workbook()
-        # Удаляем дефолтный лист
-        if "Sheet" in wb.sheetnames:
-            wb.remove(wb["Sheet"])
-    
-    # Создаём название листа на основе периода
-    week_start = dates[0].strftime("%d.%m")
-    week_end = dates[6].strftime("%d.%m")
-    sheet_name = f"Неделя {week_start}-{week_end}"
-    
-    # Если лист с таким названием уже есть - добавляем суффикс
-    original_name = sheet_name
-    counter = 1
-    while sheet_name in wb.sheetnames:
-        sheet_name = f"{original_name} ({counter})"
-        counter += 1
-    
-    # Создаём новый лист
-    ws = wb.create_sheet(title=sheet_name)
-    
-    # Стили
-    header_font = Font(bold=True, color="FFFFFF", size=11)
-    header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-    center_alignment = Alignment(horizontal="center", vertical="center")
-    border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
-    
-    # Заголовок с информацией о периоде
-    ws.merge_cells('A1:I1')
-    ws['A1'] = f"Заказы обедов • {COMPANY_NAME}"
-    ws['A1'].font = Font(bold=True, size=14)
-    ws['A1'].alignment = center_alignment
-    
-    # Период
-    ws.merge_cells('A2:I2')
-    start_date = dates[0].strftime("%d.%m.%Y")
-    end_date = dates[6].strftime("%d.%m.%Y")
-    ws['A2'] = f"Период: {start_date} - {end_date}"
-    ws['A2'].font = Font(size=11)
-    ws['A2'].alignment = center_alignment
-    
-    # Дата создания отчёта
-    ws.merge_cells('A3:I3')
-    creation_time = datetime.now().strftime('%d.%m.%Y %H:%M')
-    ws['A3'] = f"Отчёт создан: {creation_time}"
-    ws['A3'].font = Font(size=11)
-    ws['A3'].alignment = center_alignment
-    
-    # Заголовки таблицы
-    headers = ["№", "Сотрудник", "Инструктор"] + \
-              [f"{WEEKDAYS[i]}\n{d.strftime('%d.%m')}" for i, d in enumerate(dates)] + \
-              ["Всего"]
-    
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=4, column=col)
-        cell.value = header
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = center_alignment
-        cell.border = border
-    
-    # Группируем заказы по сотрудникам и инструкторам
-    from collections import defaultdict
-    employees = defaultdict(lambda: defaultdict(lambda: defaultdict(int)))
-    
-    for order in all_orders:
-        if len(order) == 5:
-            user_id, full_name, instructor_name, date, quantity = order
-        else:
-            print(f"⚠️ Неправильный формат данных: {order}")
+# ==================== БЫСТРЫЙ ЗАКАЗ ====================
+
+QUICK_ORDER_LINE_RE = re.compile(r"^\s*(?P<instructor>[^:]+?)\s*:\s*(?P<days>[\d\s,;]*)$")
+
+
+def quick_order_instructors(text):
+    """ФИО из сообщения, если каждая непустая строка похожа на строку
+       быстрого заказа («ФИО: 1 1 0 2 1 0 0»), иначе []"""
+    if not text or ":" not in text:
+        return []
+    names = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        match = QUICK_ORDER_LINE_RE.match(line)
+        if not match:
+            return []
+        names.append(" ".join(match.group('instructor').split()))
+    return names
+
+
+def parse_quick_order(text):
+    """Разбирает быстрый заказ: по строке «ФИО: 7 чисел 0/1/2» на инструктора.
+       Возвращает ({инструктор: [кол-во по дням]}, [ошибки])"""
+    orders = {}
+    errors = []
+    
+    for line_no, line in enumerate(text.splitlines(), 1):
+        if not line.strip():
             continue
         
-        employees[full_name][instructor_name][date] = quantity
-    
-    # Заполнение данных
-    row = 5
-    emp_idx = 1
-    
-    for employee, instructors in sorted(employees.items()):
-        first_row = True
-        for instructor, orders in sorted(instructors.items()):
-            # Номер сотрудника (только для первой строки)
-            if first_row:
-                ws.cell(row=row, column=1, value=emp_idx)
-                first_row = False
-            else:
-                ws.cell(row=row, column=1, value="")
-            
-            # ФИО сотрудника
-            ws.cell(row=row, column=2, value=employee)
-            
-            # Инструктор
-            ws.cell(row=row, column=3, value=instructor)
-            
-            # Заполняем дни недели
-            total = 0
-            for col, date in enumerate(dates, start=4):
-                date_key = date.strftime("%Y%m%d")
-                qty = orders.get(date_key, 0)
-                ws.cell(row=row, column=col, value=qty if qty > 0 else "-")
-                total += qty
-            
-            # Итого по строке
-            ws.cell(row=row, column=11, value=total)
-            
-            row += 1
-            if first_row:
-                emp_idx += 1
-        
-        # Пустая строка между сотрудниками
-        row += 1
-    
-    # Итоговая строка
-    if row > 5:  # Если есть данные
-        total_row = row
-        ws.cell(row=total_row, column=2, value="ИТОГО:")
-        ws.cell(row=total_row, column=2).font = Font(bold=True)
+        match = QUICK_ORDER_LINE_RE.match(line)
+        if not match:
+            errors.append(f"Строка {line_no}: нужен формат «ФИО: 1 1 0 2 1 0 0»")
+            continue
         
-        # Подсчёт итогов по дням
-        for col in range(4, 11):
-            col_total = 0
-            for r in range(5, total_row):
-                val = ws.cell(row=r, column=col).value
-                if isinstance(val, (int, float)):
-                    col_total += val
-            ws.cell(row=total_row, column=col, value=col_total)
-            ws.cell(row=total_row, column=col).font = Font(bold=True)
+        instructor = " ".join(match.group('instructor').split())
+        days = re.split(r"[\s,;]+", match.group('days').strip())
         
-        # Общий итог
-        total_all = 0
-        for r in range(5, total_row):
-            val = ws.cell(row=r, column=11).value
-            if isinstance(val, (int, float)):
-                total_all += val
-        ws.cell(row=total_row, column=11, value=total_all)
-        ws.cell(row=total_row, column=11).font = Font(bold=True)
-    
-    # Автоширина колонок
-    for col in range(1, 12):
-        max_len = 10
-        for r in range(1, row + 1):
-            val = ws.cell(row=r, column=col).value
-            if val:
-                max_len = max(max_len, len(str(val)))
-        ws.column_dimensions[openpyxl.utils.get_column_letter(col)].width = min(max_len + 2, 25)
-    
-    # Сохраняем файл
-    wb.save(temp_path)
-    
-    if save_copy:
-        # Копируем в постоянное место
-        import shutil
-        shutil.copy2(temp_path, saved_path)
-        print(f"📁 Excel файл сохранён: {saved_path} с листом '{sheet_name}'")
-        return temp_path, saved_path
+        if len(instructor) < 5:
+            errors.append(f"Строка {line_no}: слишком короткое ФИО")
+        elif len(days) != 7:
+            errors.append(f"Строка {line_no}: нужно 7 чисел (Пн-Вс), указано {len([d for d in days if d])}")
+        elif any(day not in ('0', '1', '2') for day in days):
+            errors.append(f"Строка {line_no}: количество на день - только 0, 1 или 2")
+        elif instructor in orders:
+            errors.append(f"Строка {line_no}: инструктор «{instructor}» указан дважды")
+        else:
+            orders[instructor] = [int(day) for day in days]
     
-    return temp_path, None
\ No newline at end of file
+    return orders, errors
+
+
+# ==================== АРХИВ ОТЧЁТОВ ====================
+
+ARCHIVE_PREFIX = "заказы_архив_"
+ARCHIVE_STAMP_RE = re.compile(r"^\d{8}_\d{6}$")
+
+
+def get_archive_stamp(filename):
+    """Метка времени архивного файла (заказы_архив_20260217_101519.xlsx -> 20260217_101519)"""
+    name = os.path.basename(filename)
+    if not name.startswith(ARCHIVE_PREFIX) or not name.endswith(".xlsx"):
+        return None
+    stamp = name[len(ARCHIVE_PREFIX):-len(".xlsx")]
+    return stamp if ARCHIVE_STAMP_RE.match(stamp) else None
+
+
+def get_archive_path(stamp):
+    """Путь к архивному файлу по метке времени (None, если метка некорректна)"""
+    if not ARCHIVE_STAMP_RE.match(stamp or ""):
+        return None
+    return os.path.join(current_tenant().export_path, f"{ARCHIVE_PREFIX}{stamp}.xlsx")
+
+
+def get_fresh_prebuilt_report(db, dates):
+    """Путь к готовому отчёту за неделю, если заказы с тех пор не менялись"""
+    start, end = format_date_for_db(dates[0]), format_date_for_db(dates[6])
+    prebuilt = db.get_prebuilt_report(start)
+    if not prebuilt:
+        return None
+    
+    path, signature = prebuilt
+    if signature != db.get_orders_signature(start, end) or not os.path.exists(path):
+        return None
+    return path
+
+
+def get_range_weeks(start_date, end_date):
+    """Недели (по 7 дат с понедельника), покрывающие диапазон start_date..end_date"""
+    monday = start_date - timedelta(days=start_date.weekday())
+    weeks = []
+    while monday <= end_date:
+        weeks.append([monday + timedelta(days=i) for i in range(7)])
+        monday += timedelta(days=7)
+    return weeks
+
+
+# ==================== ОТПРАВКА ОТЧЁТОВ ====================
+
+
+async def send_export_file(bot, db, chat_id, path, caption):
+    """Отправляет файл из exports/: по сохранённому file_id, а если его нет - загрузкой.
+       Возвращает False, если файла нет ни в Telegram, ни на диске."""
+    filename = os.path.basename(path)
+    
+    # Повторная отправка по file_id - без загрузки и чтения с диска
+    file_id = db.get_export_file_id(filename)
+    if file_id:
+        try:
+            await bot.send_document(chat_id, file_id, caption=caption, parse_mode="Markdown")
+            return True
+        except TelegramBadRequest as e:
+            logger.warning(f"file_id для {filename} устарел: {e}")
+            db.delete_export_file_id(filename)
+    
+    if not os.path.exists(path):
+        return False
+    
+    sent = await bot.send_document(chat_id, FSInputFile(path), caption=caption, parse_mode="Markdown")
+    if sent.document:
+        db.save_export_file_id(filename, sent.document.file_id)
+    return True